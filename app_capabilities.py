@@ -0,0 +1,304 @@
+"""
+Application Capabilities
+What installed apps need (D-Bus, sound, video, network), read from their
+.desktop files
+
+Each desktop entry is reduced to a set of capabilities:
+  dbus     DBusActivatable=true, Implements= (D-Bus interfaces), X-DBUS-*
+           and X-GNOME-UsesNotifications hints, GNOME/KDE/terminal/file
+           manager categories
+  sound    audio/video categories and audio/* or video/* MIME types
+  video    camera apps (video conferencing, recorders, browsers)
+  network  network categories and http/https/mailto/... scheme handlers
+keyed by the program in its Exec line (the app id for `flatpak run` and
+`snap run` entries, and the wrapped program or script for shell and
+interpreter entries, so wrapped apps do not share one key), merged with
+config.APP_RULES 'needs' and config.APP_CAPABILITY_OVERRIDES.
+
+The database is kept in APP_CAPABILITY_CACHE with the mtime and size of
+every desktop file, so a start only re-reads files that changed, and it
+is refreshed (at most once per RELOAD_CHECK_INTERVAL) when an
+applications directory changes. A lookup is one dict access.
+
+    default_capabilities.needs('evince')    # frozenset({'dbus'})
+"""
+
+import os
+import re
+import json
+import time
+import shlex
+import logging
+import threading
+
+from config import APP_CAPABILITY_CACHE, APP_CAPABILITY_OVERRIDES
+from mime_resolver import xdg_dirs, parse_ini, split_exec, split_list
+from metrics import METRICS
+
+CAPABILITIES = ('dbus', 'sound', 'video', 'network')
+
+# Bump when the rules below change, so cached entries are re-derived
+CACHE_VERSION = 3
+
+# Minimum seconds between checks of the applications directories
+RELOAD_CHECK_INTERVAL = 1.0
+
+DBUS_CATEGORIES = {'GNOME', 'KDE', 'TerminalEmulator', 'FileManager'}
+SOUND_CATEGORIES = {'Audio', 'AudioVideo', 'Music', 'Player', 'Recorder', 'Mixer', 'Midi',
+                    'Sequencer', 'Game', 'TV', 'Telephony', 'VideoConference', 'InstantMessaging'}
+VIDEO_CATEGORIES = {'VideoConference', 'Recorder', 'Telephony', 'WebBrowser', 'InstantMessaging'}
+NETWORK_CATEGORIES = {'Network', 'WebBrowser', 'Email', 'Chat', 'InstantMessaging', 'IRCClient',
+                      'FileTransfer', 'P2P', 'News', 'Feed', 'RemoteAccess', 'Dialup',
+                      'VideoConference', 'Telephony', 'WebDevelopment'}
+NETWORK_SCHEMES = {'http', 'https', 'ftp', 'mailto', 'irc', 'magnet', 'sftp', 'ssh', 'tg', 'matrix'}
+
+# Launchers that run another app: `<launcher> run [options] <app id> ...`
+WRAPPER_LAUNCHERS = {'flatpak', 'snap'}
+
+# Shells and interpreters never name the app; entries that run one are keyed
+# by the program of a shell's -c command or by the script (or -m module,
+# -jar archive) the interpreter runs
+SHELLS = re.compile(r'^(?:sh|bash|dash|zsh|ksh|mksh|fish|csh|tcsh)$')
+INTERPRETERS = re.compile(r'^(?:python|pypy|perl|ruby|node|nodejs|lua|luajit|php|tclsh|wish|gjs|java)[\d.]*$')
+
+# Shell -c commands with these are scripts, not one wrapped program
+SHELL_OPERATORS = ('&&', '||', ';', '|', '$(', '`')
+
+
+def entry_program(entry):
+    """
+    Program basename of a desktop entry's Exec line (past env VAR=...), the
+    app id for Flatpak/snap launchers, the program or script run by a shell
+    or interpreter, or None
+    """
+    try:
+        args = split_exec(entry.get('Exec', ''))
+    except ValueError:
+        return None
+    return _program(args)
+
+
+def _program(args, depth=0):
+    """Key for an argument list; depth counts the shell -c commands followed"""
+    if args and os.path.basename(args[0]) == 'env':
+        args = [arg for arg in args[1:] if '=' not in arg or arg.startswith('-')]
+    if args and args[0] == 'exec':
+        args = args[1:]
+    if not args:
+        return None
+    program = os.path.basename(args[0])
+    if program in WRAPPER_LAUNCHERS:
+        if len(args) < 2 or args[1] != 'run':
+            return None
+        app_ids = [arg for arg in args[2:] if not arg.startswith('-')]
+        return app_ids[0] if app_ids else None
+    if SHELLS.match(program):
+        if '-c' not in args[1:-1] or depth:
+            return _script(args[1:])
+        command = args[args.index('-c', 1) + 1]
+        if any(op in command for op in SHELL_OPERATORS):
+            return None
+        try:
+            return _program(shlex.split(command), depth + 1)
+        except ValueError:
+            return None
+    if INTERPRETERS.match(program):
+        return _script(args[1:])
+    return program
+
+
+def _script(args):
+    """Basename of the script, module or archive an interpreter runs, or None"""
+    for index, arg in enumerate(args):
+        if arg in ('-m', '-jar'):
+            return os.path.basename(args[index + 1]) if index + 1 < len(args) else None
+        if arg in ('-c', '-e', '-E', '--eval'):
+            return None         # inline code
+        if arg == '-' or arg.startswith('%'):
+            return None         # stdin or the opened file
+        if not arg.startswith('-'):
+            return os.path.basename(arg)
+    return None
+
+
+def entry_capabilities(entry):
+    """Capabilities a desktop entry asks for"""
+    categories = set(split_list(entry.get('Categories', '')))
+    mime_types = split_list(entry.get('MimeType', ''))
+    hints = {key for key, value in entry.items() if key.startswith('X-') and value.lower() != 'false'}
+    caps = set()
+
+    if (entry.get('DBusActivatable') == 'true' or entry.get('Implements')
+            or any(key.startswith(('X-DBUS-', 'X-DBus', 'X-KDE-DBUS')) for key in hints)
+            or 'X-GNOME-UsesNotifications' in hints or categories & DBUS_CATEGORIES):
+        caps.add('dbus')
+    if categories & SOUND_CATEGORIES or any(m.startswith(('audio/', 'video/')) for m in mime_types):
+        caps.add('sound')
+    if categories & VIDEO_CATEGORIES:
+        caps.add('video')
+    schemes = {m.split('/', 1)[1] for m in mime_types if m.startswith('x-scheme-handler/')}
+    if categories & NETWORK_CATEGORIES or schemes & NETWORK_SCHEMES:
+        caps.add('network')
+    return caps
+
+
+class CapabilityDatabase:
+    """
+    Program name -> capabilities, from installed desktop files
+    """
+
+    def __init__(self, cache_file=APP_CAPABILITY_CACHE, overrides=APP_CAPABILITY_OVERRIDES):
+        self.cache_file = cache_file
+        self.overrides = {program: dict(caps) for program, caps in (overrides or {}).items()}
+        self.logger = logging.getLogger('FirejailHandler')
+        self._lock = threading.Lock()
+        self._files = {}            # path -> [mtime_ns, size, program, [capability]]
+        self._by_program = {}       # program -> frozenset
+        self._signature = None
+        self._last_check = 0.0
+        self._loaded = False
+
+    # ---- persistence ----
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self._files = data.get('files', {})
+
+    def _save_cache(self):
+        """Atomically write the database"""
+        tmp = f'{self.cache_file}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'files': self._files}, f)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            self.logger.warning(f'Could not save app capabilities: {str(e)}')
+
+    # ---- scanning ----
+
+    @staticmethod
+    def _app_dirs():
+        _, data_dirs = xdg_dirs()
+        return [os.path.join(d, 'applications') for d in data_dirs]
+
+    @staticmethod
+    def _walk(directory):
+        """Desktop files and subdirectories (desktop ids may be nested) under directory"""
+        files, dirs = [], [directory]
+        stack = [directory]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                    stack.append(entry.path)
+                elif entry.name.endswith('.desktop'):
+                    files.append(entry.path)
+        return files, dirs
+
+    def _dir_signature(self, dirs):
+        signature = []
+        for directory in dirs:
+            try:
+                signature.append((directory, os.stat(directory).st_mtime_ns))
+            except OSError:
+                signature.append((directory, None))
+        return tuple(signature)
+
+    def _refresh(self):
+        """Re-read desktop files that are new or changed; caller holds the lock"""
+        if not self._loaded:
+            self._load_cache()
+            self._loaded = True
+
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+
+        # Directory mtimes change when desktop files are added, removed or
+        # replaced (package managers rename into place)
+        if self._signature is not None and self._dir_signature([d for d, _ in self._signature]) == self._signature:
+            return
+
+        with METRICS.timer('capabilities.scan'):
+            paths, dirs = [], []
+            for directory in self._app_dirs():
+                found, subdirs = self._walk(directory)
+                paths.extend(found)
+                dirs.extend(subdirs)
+
+            files = {}
+            parsed = 0
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                cached = self._files.get(path)
+                if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    files[path] = cached
+                    continue
+                try:
+                    entry = parse_ini(path).get('Desktop Entry', {})
+                except OSError:
+                    continue
+                parsed += 1
+                files[path] = [st.st_mtime_ns, st.st_size, entry_program(entry),
+                               sorted(entry_capabilities(entry))]
+
+        changed = parsed or files.keys() != self._files.keys()
+        self._files = files
+        self._signature = self._dir_signature(dirs)
+        if changed or not self._by_program:
+            self._index()
+        if changed:
+            METRICS.inc('capabilities.parsed', parsed)
+            self._save_cache()
+
+    def _index(self):
+        """Program -> union of its desktop files' capabilities"""
+        by_program = {}
+        for _, _, program, caps in self._files.values():
+            if program:
+                by_program.setdefault(program, set()).update(caps)
+        self._by_program = {program: frozenset(caps) for program, caps in by_program.items()}
+
+    # ---- lookups ----
+
+    def needs(self, program, base=()):
+        """
+        Capabilities of a program (name or path)
+        base: capabilities already known for it (APP_RULES 'needs');
+              APP_CAPABILITY_OVERRIDES is applied last
+        """
+        name = os.path.basename(program or '')
+        with self._lock:
+            self._refresh()
+            caps = set(self._by_program.get(name, ()))
+        caps.update(base)
+        for capability, allowed in self.overrides.get(name, {}).items():
+            if allowed:
+                caps.add(capability)
+            else:
+                caps.discard(capability)
+        return frozenset(caps)
+
+    def programs(self):
+        """Program -> capabilities for every installed app"""
+        with self._lock:
+            self._refresh()
+            return dict(self._by_program)
+
+
+# Shared by every handler in the process
+default_capabilities = CapabilityDatabase()
@@ -0,0 +1,206 @@
+"""
+Application Identity
+One rules table (config.APP_RULES) that names apps and says what they need,
+shared by launches and by discovery of running sandboxes
+
+All program names of all rules are compiled once into a single regular
+expression with one named group per rule, so identifying a program is one
+fullmatch on its basename instead of a chain of substring tests. Results
+are cached per program name, per launch target (path + classification
+signature + program) and per running process ((pid, starttime), which
+stays correct when PIDs are reused).
+
+    identity = default_identifier.for_process(pid)
+    identity.name     # 'Document Viewer (report.pdf)'
+    identity.app      # 'Document Viewer'
+    identity.needs    # frozenset({'dbus'})
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import procfs
+from config import APP_RULES, MIME_RESOLVER_ENABLED
+from file_classifier import EXTENSION_LABELS, MIME_LABELS
+from mime_resolver import default_mime_resolver
+
+# Cached identities per launch target / per process
+CACHE_SIZE = 1024
+
+# Version or variant suffix allowed after a program name (python3.11, signal-desktop)
+SUFFIX = r'(?:[-_.\d][\w.+-]*)?'
+
+
+class AppIdentity:
+    """What runs in a sandbox"""
+
+    __slots__ = ('app_id', 'name', 'needs', 'program', 'app')
+
+    def __init__(self, app_id, name, needs=frozenset(), program='', app=''):
+        self.app_id = app_id        # rule id, or '' when no rule matched
+        self.name = name            # display name, with the opened file
+        self.needs = needs          # e.g. frozenset({'dbus'})
+        self.program = program
+        self.app = app or name      # display name without the file (groups session history)
+
+    @property
+    def needs_dbus(self):
+        return 'dbus' in self.needs
+
+    def __repr__(self):
+        return f'AppIdentity({self.app_id!r}, {self.name!r}, needs={sorted(self.needs)})'
+
+
+def compile_rules(rules):
+    """
+    One regex for every rule: (?P<r0>a|b)|(?P<r1>c)... plus the allowed suffix
+    Returns: (compiled regex, [rule])
+    """
+    groups = []
+    for index, rule in enumerate(rules):
+        # Longest names first so 'chromium-browser' is not cut at 'chromium'
+        programs = sorted(rule['programs'], key=len, reverse=True)
+        groups.append(f'(?P<r{index}>{"|".join(re.escape(p) for p in programs)})')
+    return re.compile(f'(?:{"|".join(groups)}){SUFFIX}', re.IGNORECASE), list(rules)
+
+
+def _with_file(name, file_name):
+    return f'{name} ({file_name})' if file_name else name
+
+
+class AppIdentifier:
+    """
+    Identifies apps from launch targets and from running processes
+    """
+
+    def __init__(self, rules=APP_RULES, mime_resolver=None):
+        self.pattern, self.rules = compile_rules(rules)
+        self.mime_resolver = mime_resolver
+        self._lock = threading.Lock()
+        self._programs = {}                 # basename -> (rule index, matched name) or None
+        self._launches = OrderedDict()      # (path, signature, program) -> AppIdentity
+        self._processes = OrderedDict()     # (pid, starttime) -> AppIdentity
+
+    # ---- rules ----
+
+    def match(self, program):
+        """
+        Rule for a program name or path
+        Returns: (rule, the rule's program name it matched) or None
+        """
+        base = os.path.basename(program or '')
+        try:
+            found = self._programs[base]
+        except KeyError:
+            found = self.pattern.fullmatch(base)
+            if found is not None:
+                found = (int(found.lastgroup[1:]), found.group(found.lastgroup))
+            self._programs[base] = found
+        if found is None:
+            return None
+        return self.rules[found[0]], found[1]
+
+    def _identity(self, program, file_name, fallback, label=None):
+        """
+        Identity from the rule for program, else the handler's desktop name, else fallback
+        label: the file type, used instead of the name of a 'generic' rule (xdg-open)
+        """
+        matched = self.match(program)
+        if matched is not None:
+            rule, matched_name = matched
+            if rule.get('generic') and label:
+                name = label
+            else:
+                name = rule.get('name') or matched_name.capitalize()
+            return AppIdentity(rule['id'], _with_file(name, file_name), frozenset(rule.get('needs', ())),
+                               program, name)
+        desktop_name = None
+        if self.mime_resolver is not None and program:
+            desktop_name = self.mime_resolver.app_name(os.path.basename(program))
+        if desktop_name:
+            return AppIdentity('', _with_file(desktop_name, file_name), frozenset(), program, desktop_name)
+        app = label or os.path.basename(program or '').capitalize()
+        return AppIdentity('', fallback, frozenset(), program, app)
+
+    # ---- launches ----
+
+    def for_launch(self, path, classification, program):
+        """
+        Identity of a launch target
+        program: what will run for it (the target itself, its interpreter,
+                 its LibreOffice command or its MIME handler)
+        """
+        key = (path, classification.signature, program)
+        with self._lock:
+            identity = self._launches.get(key)
+            if identity is not None:
+                self._launches.move_to_end(key)
+                return identity
+
+        basename = os.path.basename(path.rstrip('/')) or path
+        if not classification.exists:
+            # Application command such as 'firefox'
+            identity = self._identity(program, None, path.capitalize())
+        elif classification.is_file and classification.is_executable and not classification.is_script:
+            identity = self._identity(program, basename, basename)
+        else:
+            if classification.is_dir:
+                label = 'File Manager'
+            else:
+                label = EXTENSION_LABELS.get(classification.ext) or MIME_LABELS.get(classification.mime) or 'File'
+            identity = self._identity(program, basename, _with_file(label, basename), label)
+
+        with self._lock:
+            self._launches[key] = identity
+            if len(self._launches) > CACHE_SIZE:
+                self._launches.popitem(last=False)
+        return identity
+
+    # ---- running processes ----
+
+    def for_process(self, pid):
+        """Identity of a running firejail process from its command line"""
+        stat = procfs.read_stat(pid)
+        key = (pid, stat['starttime'] if stat else None)
+        with self._lock:
+            identity = self._processes.get(key)
+            if identity is not None:
+                self._processes.move_to_end(key)
+                return identity
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                argv = [arg.decode(errors='replace') for arg in f.read().split(b'\0') if arg]
+        except OSError:
+            argv = []
+        identity = self.for_argv(argv)
+        if stat is not None:
+            with self._lock:
+                self._processes[key] = identity
+                if len(self._processes) > CACHE_SIZE:
+                    self._processes.popitem(last=False)
+        return identity
+
+    def for_argv(self, argv):
+        """
+        Identity from a firejail argv: the program is the first argument after
+        the firejail options, the file the first later argument that is a path
+        """
+        args = argv[1:] if argv and os.path.basename(argv[0]) == 'firejail' else list(argv)
+        while args and args[0].startswith('-'):
+            args = args[1:]
+        if not args:
+            return AppIdentity('', 'Sandboxed Application')
+        program = args[0]
+        paths = [arg for arg in args[1:] if '/' in arg and not arg.startswith('-')]
+        file_name = os.path.basename(paths[0]) if paths else None
+        label = None
+        if file_name:
+            label = EXTENSION_LABELS.get(os.path.splitext(file_name)[1].lower())
+        fallback = os.path.basename(program).capitalize() or 'Sandboxed Application'
+        return self._identity(program, file_name, _with_file(label or fallback, file_name), label)
+
+
+# Shared by every handler in the process
+default_identifier = AppIdentifier(APP_RULES, default_mime_resolver if MIME_RESOLVER_ENABLED else None)
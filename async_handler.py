@@ -0,0 +1,396 @@
+"""
+Async Firejail Handler
+asyncio-native launch / kill / list / watch on top of FirejailHandler
+
+Sandboxes are spawned with asyncio.create_subprocess_exec and their output
+is read by stream tasks; sandboxes adopted from other InvisVM processes are
+watched with a pidfd registered on the event loop (polling where pidfd_open
+is unavailable). No per-sandbox threads are started, so hundreds of
+launches and kills can run concurrently on one loop; the blocking parts
+(launch preparation, FirejailHandler.kill_sandbox) run in the loop's
+default executor:
+
+    async def main():
+        handler = AsyncFirejailHandler()
+        results = await asyncio.gather(*(handler.launch(p, 'restrictive') for p in paths))
+        async for change in handler.watch():
+            print(change.kind, change.pid, change.record.name)
+
+On Python < 3.12 asyncio reaps children with one thread each by default;
+call use_pidfd_child_watcher(loop) first to reap them on the loop instead
+(AsyncLoopThread does this itself).
+
+From non-async code (e.g. the Qt GUI) run coroutines on an AsyncLoopThread:
+
+    bridge = AsyncLoopThread()
+    future = bridge.submit(handler.list())      # concurrent.futures.Future
+
+Shares the registry, state file and sandbox logs with the wrapped
+FirejailHandler, so blocking and async calls can be mixed.
+"""
+
+import os
+import sys
+import asyncio
+import functools
+import threading
+
+from config import OUTPUT_SPILL_TO_LOG
+from firejail_handler import FirejailHandler
+from sandbox_pool import sandbox_in_use
+from output_capture import OutputBuffer, READ_SIZE
+from metrics import METRICS
+
+# Coalesce state file writes from bursts of launches/exits
+SAVE_DELAY = 0.05
+NETWORK_POLL_INTERVAL = 2
+
+
+def use_pidfd_child_watcher(loop):
+    """
+    Reap subprocesses through pidfds on `loop` instead of a thread per child
+    Python 3.12+ already does this; the watcher is process-wide, so only one
+    loop in the process should spawn subprocesses afterwards
+    Returns: True if installed
+    """
+    if sys.version_info >= (3, 12) or not hasattr(os, 'pidfd_open'):
+        return False
+    try:
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(loop)
+        asyncio.set_child_watcher(watcher)
+        return True
+    except Exception:
+        return False
+
+
+class AsyncFirejailHandler:
+    """
+    asyncio front end for FirejailHandler
+    All coroutines must run on the same event loop
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler or FirejailHandler()
+        self.registry = self.handler.registry
+        self._network_watch = {}    # pid -> SandboxLogger, polled by one task
+        self._network_task = None
+        self._budget_watch = set()  # throwaway sandboxes whose RAM budget is polled
+        self._budget_task = None
+        self._save_pending = False
+        self._tasks = set()
+
+    # ---- launch ----
+
+    async def launch(self, path, policy='standard', resources=None, ttl_minutes=None):
+        """
+        Launch a file or application; returns (success, pid, message)
+        resources: optional overrides of the policy's resource ceilings
+        ttl_minutes: time limit (None = the policy's, 0 = none)
+        """
+        with METRICS.timer('launch.total'):
+            result = await self._launch(path, policy, resources, ttl_minutes)
+        outcome = 'success' if result[0] else 'failure'
+        METRICS.inc(f'launch.{outcome}')
+        METRICS.inc(f'launch.{outcome}.{policy}')
+        return result
+
+    async def _launch(self, path, policy, resources=None, ttl_minutes=None):
+        handler = self.handler
+        try:
+            # Home copies, file classification and pool waits block; keep them off the loop
+            plan, error_msg = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(handler._prepare_launch, path, policy, resources,
+                                        wait_for_reuse=False, ttl_minutes=ttl_minutes))
+            if plan is None:
+                return False, None, error_msg
+
+            sandbox_logger = plan['logger']
+            try:
+                with METRICS.timer('launch.spawn'):
+                    process = await asyncio.create_subprocess_exec(
+                        *plan['cmd'],
+                        stdin=asyncio.subprocess.DEVNULL,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.STDOUT,
+                        start_new_session=True,
+                        env=plan['env'],
+                        cwd=plan['work_dir']
+                    )
+                output = OutputBuffer(spill=sandbox_logger.write_output if OUTPUT_SPILL_TO_LOG and sandbox_logger else None)
+                if plan['join_pid']:
+                    # Opened in a running sandbox, which is already watched
+                    success_msg = handler._register_join(plan, process, save=False)
+                    self._schedule_save()
+                    self._start_task(self._read_output(process.stdout, output))
+                    self._start_task(process.wait())
+                    return True, plan['join_pid'], success_msg
+
+                success_msg = handler._register_launch(plan, process, output, save=False)
+                self._schedule_save()
+
+                record = self.registry.get(process.pid)
+                reader = self._start_task(self._read_output(process.stdout, output))
+                self._start_task(self._wait_exit(process, plan['app_name'], reader, record))
+                self._watch_network(process.pid, sandbox_logger, policy)
+                if plan['usage'] is not None:
+                    self._watch_budget(process.pid)
+                return True, process.pid, success_msg
+
+            except Exception as e:
+                error_msg = f'Failed to launch process: {str(e)}'
+                handler.log(error_msg, 'ERROR')
+                if sandbox_logger:
+                    sandbox_logger.log_event('error', error_msg)
+                handler._abandon_launch(plan)
+                return False, None, error_msg
+
+        except Exception as e:
+            error_msg = f'Unexpected error: {str(e)}'
+            handler.log(error_msg, 'ERROR')
+            return False, None, error_msg
+
+    async def launch_many(self, paths, policy='standard', resources=None, ttl_minutes=None):
+        """Launch several paths concurrently; returns [(path, success, pid, message), ...]"""
+        paths = list(paths)
+        results = await asyncio.gather(*(self.launch(path, policy, resources, ttl_minutes) for path in paths))
+        return [(path,) + tuple(result) for path, result in zip(paths, results)]
+
+    async def _read_output(self, stream, output):
+        """Feed a sandbox's stdout pipe into its OutputBuffer"""
+        try:
+            while True:
+                data = await stream.read(READ_SIZE)
+                if not data:
+                    break
+                output.append(data)
+                METRICS.inc('output.bytes_captured', len(data))
+        finally:
+            output.close()
+
+    async def _wait_exit(self, process, app_name, reader, record):
+        """
+        Finalize a sandbox launched by this handler once it exits
+        asyncio's child watcher reaps the process without its rusage, so the
+        summary comes from the watchdog's last /proc sample and the exit status
+        """
+        await process.wait()
+        # Let the reader drain what is left in the pipe
+        await asyncio.wait({reader}, timeout=1)
+        await self._wait_pool_apps(record)
+        self._sandbox_exited(process.pid, app_name, record, process.returncode)
+
+    # ---- kill ----
+
+    async def kill(self, pid, reason='by user'):
+        """Kill a sandbox with FirejailHandler.kill_sandbox; returns (success, message)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.handler.kill_sandbox, pid, reason)
+
+    async def kill_many(self, pids):
+        """Kill several sandboxes concurrently; returns [(pid, success, message), ...]"""
+        pids = list(pids)
+        results = await asyncio.gather(*(self.kill(pid) for pid in pids))
+        return [(pid,) + tuple(result) for pid, result in zip(pids, results)]
+
+    # ---- discovery ----
+
+    async def list(self):
+        """
+        Async get_active_sandboxes(): reconcile with `firejail --list` and the
+        shared state file; adopted sandboxes are watched on the loop
+        """
+        with METRICS.timer('discovery.scan'):
+            try:
+                with METRICS.timer('subprocess.firejail_list'):
+                    stdout = await self._run_command(['firejail', '--list'], timeout=5, capture=True)
+                running_pids = set(self.handler._parse_firejail_list(stdout))
+            except Exception as e:
+                self.handler.log(f'Error getting firejail PIDs: {str(e)}', 'WARNING')
+                running_pids = set()
+
+            self.handler.reload_state_from_disk(adopt=self._adopt)
+            return self.handler._reconcile_sandboxes(running_pids, self._adopt)
+
+    async def watch(self):
+        """Async iterator of SandboxChange events (added / updated / removed)"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def listener(change):
+            loop.call_soon_threadsafe(queue.put_nowait, change)
+
+        self.registry.subscribe(listener)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.registry.unsubscribe(listener)
+
+    def _adopt(self, pid, app_name):
+        """Watch a sandbox started elsewhere until it exits"""
+        self._start_task(self._watch_adopted(pid, app_name))
+        record = self.registry.get(pid)
+        if record is not None and record.tmpfs_mb:
+            self._watch_budget(pid)
+
+    async def _watch_adopted(self, pid, app_name):
+        await self._wait_pid_exit(pid)
+        await self._wait_pool_apps(self.registry.get(pid))
+        self._sandbox_exited(pid, app_name)
+
+    async def _wait_pool_apps(self, record):
+        """An app opened in a pool sandbox can outlive the join process"""
+        while record is not None and record.pool_pid and sandbox_in_use(record.pool_pid, record.cgroup):
+            await asyncio.sleep(1)
+
+    async def _wait_pid_exit(self, pid, timeout=None):
+        """
+        Wait for an arbitrary PID to exit using a pidfd on the loop
+        Returns: True if it exited, False on timeout
+        """
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except (AttributeError, OSError):
+            return await self._poll_pid_exit(pid, timeout)
+
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        loop.add_reader(fd, lambda: exited.done() or exited.set_result(True))
+        try:
+            await asyncio.wait_for(exited, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+
+    async def _poll_pid_exit(self, pid, timeout=None):
+        """Fallback for kernels without pidfd_open"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self.handler._is_firejail_pid(pid):
+            if deadline is not None and loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.1 if timeout is not None else 1)
+        return True
+
+    # ---- shared helpers ----
+
+    def _sandbox_exited(self, pid, app_name, record=None, returncode=None):
+        self._network_watch.pop(pid, None)
+        self._budget_watch.discard(pid)
+        if self.handler._handle_sandbox_exit(pid, app_name, save=False, record=record,
+                                             returncode=returncode) is not None:
+            self._schedule_save()
+
+    def _watch_network(self, pid, sandbox_logger, policy):
+        """Add a sandbox to the shared `ss` poll (one subprocess per tick for all)"""
+        self.handler._log_policy_restrictions(sandbox_logger, policy)
+        if policy == 'restrictive':
+            return
+        self._network_watch[pid] = sandbox_logger
+        if self._network_task is None or self._network_task.done():
+            self._network_task = self._start_task(self._poll_network())
+
+    async def _poll_network(self):
+        loop = asyncio.get_running_loop()
+        while self._network_watch:
+            tick = loop.time()
+            await asyncio.sleep(NETWORK_POLL_INTERVAL)
+            METRICS.observe('monitor.loop_lag', loop.time() - tick - NETWORK_POLL_INTERVAL)
+            try:
+                with METRICS.timer('subprocess.ss'):
+                    ss_output = await self._run_command(['ss', '-tunp'], timeout=2, capture=True)
+            except Exception:
+                continue
+            for pid, sandbox_logger in list(self._network_watch.items()):
+                self.handler._check_network_activity(pid, sandbox_logger, ss_output)
+
+    def _watch_budget(self, pid):
+        """Add a throwaway sandbox to the shared RAM budget poll"""
+        self._budget_watch.add(pid)
+        if self._budget_task is None or self._budget_task.done():
+            self._budget_task = self._start_task(self._poll_budgets())
+
+    async def _poll_budgets(self):
+        while self._budget_watch:
+            await asyncio.sleep(NETWORK_POLL_INTERVAL)
+            for pid in list(self._budget_watch):
+                action = self.handler._check_tmpfs_budget(pid)
+                if action == 'kill':
+                    self._start_task(self.kill(pid, 'over its RAM budget'))
+                elif action == 'freeze':
+                    self.handler.freeze_sandbox(pid, 'over its RAM budget')
+
+    async def _run_command(self, cmd, timeout, capture=False):
+        """Run a short helper command; returns its stdout as text if capture"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        return stdout.decode('utf-8', errors='replace') if capture else ''
+
+    def _start_task(self, coro):
+        """Create a task and keep a reference until it finishes"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _schedule_save(self):
+        """Write sandboxes.json shortly, once per burst of changes, off the loop"""
+        if self._save_pending:
+            return
+        self._save_pending = True
+        asyncio.get_running_loop().call_later(SAVE_DELAY, self._save_now)
+
+    def _save_now(self):
+        self._save_pending = False
+        asyncio.get_running_loop().run_in_executor(None, self.handler.save_state)
+
+    async def close(self):
+        """Cancel watchers and flush state"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(None, self.handler.save_state)
+
+
+class AsyncLoopThread:
+    """
+    Event loop running in a daemon thread, for callers that are not async
+    (Qt GUI, scripts); submit() returns a concurrent.futures.Future
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='invisvm-asyncio', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        use_pidfd_child_watcher(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and block for its result"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
@@ -0,0 +1,280 @@
+"""
+Launch latency benchmark for FirejailHandler
+Runs launch_sandboxed() against a stub firejail (no root, no real sandbox)
+and reports per-phase latency and throughput
+
+Usage:
+    python3 benchmarks/bench_launch.py
+    python3 benchmarks/bench_launch.py --iterations 50 --concurrency 8 --output baseline.json
+    python3 benchmarks/bench_launch.py --compare baseline.json
+
+Phases are timed exclusively (time spent in a nested phase is not counted
+twice), so the phase means add up to the total launch time.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_firejail import install_stub_firejail, isolated_environment, summarize
+
+# Handler methods timed as each phase
+PHASES = {
+    'resolve': ['_resolve_path'],
+    'classify': ['classify'],
+    'build': ['build_firejail_command'],
+    'preflight': ['_check_firejail_installed', '_is_executable'],
+    'popen': ['_spawn'],
+    'state_save': ['save_state'],
+    'logging': ['log'],
+}
+
+POLICIES = ('restrictive', 'standard', 'permissive')
+
+
+class PhaseTimer:
+    """
+    Records exclusive time per phase for each launch, per thread
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def wrap(self, phase, func):
+        """Wrap a callable so its exclusive time is charged to phase"""
+        timer = self
+
+        def wrapper(*args, **kwargs):
+            stack = getattr(timer._local, 'stack', None)
+            if not stack:
+                # Only record inside a launch (monitor threads also log/save)
+                return func(*args, **kwargs)
+            frame = [phase, time.perf_counter(), 0.0]
+            stack.append(frame)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack.pop()
+                elapsed = time.perf_counter() - frame[1]
+                stack[-1][2] += elapsed
+                phases = timer._local.phases
+                phases[phase] = phases.get(phase, 0.0) + elapsed - frame[2]
+        return wrapper
+
+    def wrap_launch(self, func):
+        """Wrap launch_sandboxed; one sample per call"""
+        timer = self
+
+        def wrapper(*args, **kwargs):
+            timer._local.stack = [['total', time.perf_counter(), 0.0]]
+            timer._local.phases = {}
+            try:
+                return func(*args, **kwargs)
+            finally:
+                frame = timer._local.stack[0]
+                total = time.perf_counter() - frame[1]
+                phases = timer._local.phases
+                phases['other'] = total - frame[2]
+                phases['total'] = total
+                timer._local.stack = None
+                with timer._lock:
+                    timer.samples.append(phases)
+        return wrapper
+
+    def reset(self):
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def instrument(handler, timer):
+    """Install phase timers on a FirejailHandler instance"""
+    import firejail_handler
+
+    for phase, methods in PHASES.items():
+        for name in methods:
+            setattr(handler, name, timer.wrap(phase, getattr(handler, name)))
+    handler.launch_sandboxed = timer.wrap_launch(handler.launch_sandboxed)
+
+    # Per-sandbox log files are part of the logging phase too
+    logger_cls = firejail_handler.SandboxLogger
+    if not getattr(logger_cls, '_bench_wrapped', False):
+        logger_cls.log_event = timer.wrap('logging', logger_cls.log_event)
+        logger_cls._init_log_file = timer.wrap('logging', logger_cls._init_log_file)
+        logger_cls._bench_wrapped = True
+
+
+def make_targets(root):
+    """Create one sample target per file type"""
+    os.makedirs(root, exist_ok=True)
+    targets = {}
+
+    def write(name, content, mode=0o644):
+        path = os.path.join(root, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        os.chmod(path, mode)
+        return path
+
+    targets['python'] = write('script.py', b'#!/usr/bin/env python3\nprint("hi")\n')
+    targets['shell'] = write('script.sh', b'#!/bin/sh\necho hi\n')
+    targets['pdf'] = write('doc.pdf', b'%PDF-1.4\n' + b'0' * 2048)
+    targets['odt'] = write('doc.odt', b'PK\x03\x04' + b'\0' * 26 + b'mimetypeapplication/vnd.oasis.opendocument.text')
+    targets['image'] = write('pic.png', b'\x89PNG\r\n\x1a\n' + b'\0' * 512)
+    targets['executable'] = write('tool', b'\x7fELF' + b'\0' * 60, 0o755)
+    targets['directory'] = root
+    targets['app'] = 'vlc'
+    return targets
+
+
+def summarize_samples(samples, wall_time=None):
+    """Per-phase percentiles (milliseconds) for a list of samples"""
+    phases = sorted({k for s in samples for k in s})
+    result = {
+        phase: {k: (v * 1000 if k != 'count' else v)
+                for k, v in summarize([s.get(phase, 0.0) for s in samples]).items()}
+        for phase in phases
+    }
+    if wall_time:
+        result['throughput_per_s'] = len(samples) / wall_time
+    return result
+
+
+def wait_for_exit(handler, timeout=30):
+    """Wait until all stub sandboxes have exited and been cleaned up"""
+    deadline = time.monotonic() + timeout
+    while len(handler.registry) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def run_sequential(handler, timer, targets, iterations):
+    """Each policy x file type, launched one after another"""
+    results = {}
+    for policy in POLICIES:
+        for kind, path in targets.items():
+            timer.reset()
+            start = time.perf_counter()
+            for _ in range(iterations):
+                handler.launch_sandboxed(path, policy)
+            wall = time.perf_counter() - start
+            results[f'{policy}/{kind}'] = summarize_samples(timer.reset(), wall)
+            wait_for_exit(handler)
+    return results
+
+
+def run_concurrent(handler, timer, targets, launches, concurrency):
+    """Mixed file types launched from a thread pool"""
+    paths = list(targets.values())
+    work = [paths[i % len(paths)] for i in range(launches)]
+    timer.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda p: handler.launch_sandboxed(p, 'standard'), work))
+    wall = time.perf_counter() - start
+    result = summarize_samples(timer.reset(), wall)
+    wait_for_exit(handler)
+    return result
+
+
+def compare(current, baseline, threshold):
+    """Print p50/p95 changes of total latency against a baseline"""
+    print(f'\nComparison against baseline (threshold {threshold:.0f}%):')
+    regressions = 0
+    for section in ('sequential', 'concurrent'):
+        cur_section = current[section]
+        base_section = baseline.get(section, {})
+        items = cur_section.items() if section == 'sequential' else [('standard/mixed', cur_section)]
+        for name, stats in items:
+            base = base_section.get(name) if section == 'sequential' else base_section
+            if not base or 'total' not in base:
+                continue
+            for pct in ('p50', 'p95'):
+                old, new = base['total'][pct], stats['total'][pct]
+                change = (new - old) / old * 100 if old else 0.0
+                flag = ''
+                if change > threshold:
+                    flag = '  << REGRESSION'
+                    regressions += 1
+                print(f'  {section:10} {name:24} {pct}: {old:8.2f} -> {new:8.2f} ms ({change:+6.1f}%){flag}')
+    return regressions
+
+
+def print_report(results):
+    """Human-readable summary"""
+    print(f"\nSequential launches ({results['config']['iterations']} per case), milliseconds")
+    print(f"  {'case':26} {'p50':>8} {'p95':>8} {'p99':>8} {'launch/s':>9}")
+    for name, stats in results['sequential'].items():
+        t = stats['total']
+        print(f"  {name:26} {t['p50']:8.2f} {t['p95']:8.2f} {t['p99']:8.2f} {stats['throughput_per_s']:9.1f}")
+
+    concurrent = results['concurrent']
+    print(f"\nConcurrent launches ({results['config']['launches']} with {results['config']['concurrency']} threads)")
+    print(f"  throughput: {concurrent['throughput_per_s']:.1f} launches/s")
+    print(f"  {'phase':12} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for phase, stats in concurrent.items():
+        if phase == 'throughput_per_s':
+            continue
+        print(f"  {phase:12} {stats['mean']:8.2f} {stats['p50']:8.2f} {stats['p95']:8.2f} {stats['p99']:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='InvisVM launch latency benchmark (stub firejail)')
+    parser.add_argument('--iterations', type=int, default=20, help='Sequential launches per policy/file type')
+    parser.add_argument('--launches', type=int, default=200, help='Total concurrent launches')
+    parser.add_argument('--concurrency', type=int, default=8, help='Threads for concurrent launches')
+    parser.add_argument('--stub-startup', type=float, default=0.0, help='Simulated firejail setup time (s)')
+    parser.add_argument('--stub-runtime', type=float, default=0.05, help='Simulated app runtime (s)')
+    parser.add_argument('--output', help='Write machine-readable results (baseline) to this JSON file')
+    parser.add_argument('--compare', help='Compare against a previous --output file')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    home = isolated_environment()
+    install_stub_firejail(os.path.join(home, 'bin'), startup=args.stub_startup, runtime=args.stub_runtime)
+
+    from firejail_handler import FirejailHandler
+    import config
+
+    handler = FirejailHandler()
+    timer = PhaseTimer()
+    instrument(handler, timer)
+    targets = make_targets(os.path.join(home, 'targets'))
+
+    results = {
+        'config': {
+            'iterations': args.iterations,
+            'launches': args.launches,
+            'concurrency': args.concurrency,
+            'stub_startup': args.stub_startup,
+            'stub_runtime': args.stub_runtime,
+            'app_version': config.APP_VERSION,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'sequential': run_sequential(handler, timer, targets, args.iterations),
+        'concurrent': run_concurrent(handler, timer, targets, args.launches, args.concurrency),
+    }
+
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nBaseline written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
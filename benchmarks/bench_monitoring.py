@@ -0,0 +1,222 @@
+"""
+Monitoring and discovery scale benchmark for FirejailHandler
+Runs N long-lived fake "firejail" processes with a matching sandboxes.json
+and measures how state handling and monitoring scale
+
+Usage:
+    python3 benchmarks/bench_monitoring.py
+    python3 benchmarks/bench_monitoring.py --sizes 10 100 1000 --output monitoring.json
+
+Measured for each N:
+    load            FirejailHandler() start-up (load_state + monitor threads)
+    tick            one GUI refresh (reload_state_from_disk + get_active_sandboxes)
+    reload          reload_state_from_disk() alone
+    save            save_state() alone
+    threads         live Python threads after start-up
+    rss             resident memory of this process
+    idle_cpu        CPU used by monitoring while nothing happens (% of one core)
+    gui_stall       worst main-thread scheduling delay while idle (GIL contention)
+    exit_detect     time from a sandbox exiting to it leaving the registry
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+from stub_firejail import install_stub_firejail, isolated_environment, summarize
+
+
+def rss_mb():
+    """Resident set size of this process in MiB"""
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def spawn_fake_sandboxes(count):
+    """
+    Start count long-lived processes whose cmdline contains 'firejail'
+    (argv[0] is rewritten; the program is sleep)
+    """
+    sleep_bin = subprocess.check_output(['which', 'sleep'], text=True).strip()
+    procs = []
+    for i in range(count):
+        procs.append(subprocess.Popen(
+            ['firejail-stub', '3600'],
+            executable=sleep_bin,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        ))
+    return procs
+
+
+def write_state(state_file, list_file, procs):
+    """Write sandboxes.json and the stub's `firejail --list` output"""
+    now = time.strftime('%Y-%m-%dT%H:%M:%S')
+    state = {
+        str(p.pid): {
+            'name': f'Bench App {i}',
+            'path': f'/tmp/bench/file{i}.pdf',
+            'policy': ('restrictive', 'standard', 'permissive')[i % 3],
+            'timestamp': now,
+            'sandbox_id': f'{i:08x}',
+        }
+        for i, p in enumerate(procs)
+    }
+    with open(state_file, 'w') as f:
+        json.dump(state, f)
+    with open(list_file, 'w') as f:
+        for p in procs:
+            f.write(f'{p.pid}:bench::firejail-stub 3600\n')
+
+
+def stop(procs):
+    for p in procs:
+        try:
+            p.kill()
+        except OSError:
+            pass
+    for p in procs:
+        try:
+            p.wait(timeout=5)
+        except Exception:
+            pass
+
+
+def timed(func, repeat):
+    """Run func repeat times; return list of durations in ms"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def measure_idle(duration):
+    """CPU usage and worst main-thread wakeup delay over an idle period"""
+    interval = 0.01
+    worst = 0.0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    while time.perf_counter() - wall_start < duration:
+        before = time.perf_counter()
+        time.sleep(interval)
+        worst = max(worst, time.perf_counter() - before - interval)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return cpu / wall * 100, worst * 1000
+
+
+def measure_exit_detection(handler, procs, samples):
+    """Kill sandboxes one at a time and time until the handler drops them"""
+    results = []
+    for proc in procs[:samples]:
+        proc.kill()
+        proc.wait()
+        start = time.perf_counter()
+        deadline = start + 30
+        while proc.pid in handler.registry and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        results.append((time.perf_counter() - start) * 1000)
+    return results
+
+
+def run_size(n, args, home, list_file):
+    from firejail_handler import FirejailHandler
+
+    state_file = os.path.join(home, 'InvisVM', 'logs', 'sandboxes.json')
+    base_threads = threading.active_count()
+    procs = spawn_fake_sandboxes(n)
+    handler = None
+    try:
+        write_state(state_file, list_file, procs)
+
+        start = time.perf_counter()
+        handler = FirejailHandler()
+        load_ms = (time.perf_counter() - start) * 1000
+        tracked = len(handler.registry)
+
+        threads = threading.active_count() - base_threads
+
+        def tick():
+            handler.reload_state_from_disk()
+            handler.get_active_sandboxes()
+
+        tick_ms = timed(tick, args.ticks)
+        reload_ms = timed(handler.reload_state_from_disk, args.ticks)
+        save_ms = timed(handler.save_state, args.ticks)
+        idle_cpu, gui_stall = measure_idle(args.idle)
+        exit_ms = measure_exit_detection(handler, procs, min(args.exit_samples, n))
+
+        return {
+            'n': n,
+            'tracked': tracked,
+            'load_ms': load_ms,
+            'tick_ms': summarize(tick_ms),
+            'reload_ms': summarize(reload_ms),
+            'save_ms': summarize(save_ms),
+            'threads': threads,
+            'rss_mb': rss_mb(),
+            'idle_cpu_percent': idle_cpu,
+            'gui_stall_ms': gui_stall,
+            'exit_detect_ms': summarize(exit_ms),
+        }
+    finally:
+        stop(procs)
+        # Keep this handler's background threads out of later sizes
+        if handler is not None:
+            handler.watchdog.stop()
+            handler.ttl.stop()
+        # Let the previous handler's monitor threads notice and exit
+        deadline = time.monotonic() + 10
+        while threading.active_count() > base_threads and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+
+def print_report(results):
+    print(f"\n{'N':>6} {'load':>9} {'tick p50':>9} {'tick p95':>9} {'save p50':>9} "
+          f"{'threads':>8} {'RSS MiB':>8} {'idle CPU':>9} {'stall':>8} {'exit p50':>9} {'exit max':>9}")
+    for r in results:
+        print(f"{r['n']:6d} {r['load_ms']:8.1f}ms {r['tick_ms']['p50']:7.1f}ms {r['tick_ms']['p95']:7.1f}ms "
+              f"{r['save_ms']['p50']:7.2f}ms {r['threads']:8d} {r['rss_mb']:8.1f} "
+              f"{r['idle_cpu_percent']:8.1f}% {r['gui_stall_ms']:6.1f}ms "
+              f"{r['exit_detect_ms'].get('p50', 0):7.0f}ms {r['exit_detect_ms'].get('max', 0):7.0f}ms")
+    print('\ntick = GUI refresh cost on the Qt thread (runs every 2 s); '
+          'stall = worst main-thread delay caused by monitor threads')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='InvisVM monitoring/discovery scale benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='Sandbox counts')
+    parser.add_argument('--ticks', type=int, default=10, help='Refresh ticks measured per size')
+    parser.add_argument('--idle', type=float, default=5.0, help='Seconds of idle measurement per size')
+    parser.add_argument('--exit-samples', type=int, default=5, help='Exits timed per size')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    home = isolated_environment()
+    list_file = os.path.join(home, 'firejail-list.txt')
+    install_stub_firejail(os.path.join(home, 'bin'), list_file=list_file)
+
+    results = []
+    for n in args.sizes:
+        print(f'Running N={n}...', flush=True)
+        results.append(run_size(n, args, home, list_file))
+
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
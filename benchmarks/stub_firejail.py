@@ -0,0 +1,101 @@
+"""
+Stub firejail for benchmarks
+Installs a fake `firejail` executable so FirejailHandler can be exercised
+without root and without creating real sandboxes
+
+The stub's behaviour is read from environment variables at run time:
+    STUB_FIREJAIL_STARTUP   seconds to sleep before "starting" (namespace setup cost)
+    STUB_FIREJAIL_RUNTIME   seconds the "sandboxed app" runs (default 0.05)
+    STUB_FIREJAIL_LIST      file whose contents are printed for `firejail --list`
+"""
+
+import os
+import sys
+import stat
+import tempfile
+
+STUB_SCRIPT = """#!/bin/sh
+# InvisVM benchmark stub - not a real sandbox
+case "$1" in
+    --version)
+        echo "firejail version 0.0.0-stub"
+        exit 0 ;;
+    --list)
+        [ -n "$STUB_FIREJAIL_LIST" ] && [ -f "$STUB_FIREJAIL_LIST" ] && cat "$STUB_FIREJAIL_LIST"
+        exit 0 ;;
+    --shutdown=*|--shutdown)
+        exit 0 ;;
+esac
+[ -n "$STUB_FIREJAIL_STARTUP" ] && sleep "$STUB_FIREJAIL_STARTUP"
+sleep "${STUB_FIREJAIL_RUNTIME:-0.05}"
+exit 0
+"""
+
+# Application commands that should resolve through `which`
+STUB_APPS = ('vlc', 'evince', 'firefox')
+
+
+def _write_executable(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP)
+
+
+def install_stub_firejail(bin_dir, startup=None, runtime=None, list_file=None):
+    """
+    Write the stub firejail (and stub app commands) into bin_dir and put it
+    first on PATH for this process and its children
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    _write_executable(os.path.join(bin_dir, 'firejail'), STUB_SCRIPT)
+    for app in STUB_APPS:
+        _write_executable(os.path.join(bin_dir, app), '#!/bin/sh\nexit 0\n')
+
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+    if startup is not None:
+        os.environ['STUB_FIREJAIL_STARTUP'] = str(startup)
+    if runtime is not None:
+        os.environ['STUB_FIREJAIL_RUNTIME'] = str(runtime)
+    if list_file is not None:
+        os.environ['STUB_FIREJAIL_LIST'] = list_file
+    return os.path.join(bin_dir, 'firejail')
+
+
+def isolated_environment(prefix='invisvm-bench-'):
+    """
+    Point HOME at a fresh temporary directory so logs and state stay out of
+    the real ~/InvisVM; must run before firejail_handler is imported.
+    Also puts the repository root on sys.path.
+    Returns: the temporary home directory
+    """
+    home = tempfile.mkdtemp(prefix=prefix)
+    os.environ['HOME'] = home
+    os.makedirs(os.path.join(home, 'InvisVM', 'logs'), exist_ok=True)
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+    return home
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(values):
+    """p50/p95/p99/mean/max of a list of numbers"""
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': values[-1],
+    }
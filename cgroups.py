@@ -0,0 +1,240 @@
+"""
+cgroup v2 Limits
+Places each sandbox in its own cgroup with memory.max, pids.max and cpu.max
+
+Works only where cgroup v2 is mounted and the user has a delegated subtree
+(systemd gives every user one below user@<uid>.service). InvisVM creates
+<delegated>/invisvm/sandbox-<id> per sandbox; the firejail process is moved
+into it by a small `sh` wrapper before it execs, so every descendant is
+accounted and limited. When no delegation is available, launches proceed
+with only the rlimit-based ceilings.
+"""
+
+import os
+import re
+import logging
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+SUBTREE_NAME = 'invisvm'
+CPU_PERIOD_US = 100000
+
+# Joins a cgroup, then runs the real command: sh -c SCRIPT <cgroup dir> <cmd...>
+JOIN_SCRIPT = 'echo $$ > "$0/cgroup.procs" && exec "$@"'
+
+
+def current_cgroup():
+    """This process's cgroup v2 path relative to the mount, or None"""
+    try:
+        with open('/proc/self/cgroup', 'r') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+
+def find_delegated_base(root=CGROUP_ROOT):
+    """
+    Locate the user's delegated cgroup (…/user@<uid>.service)
+    Returns: absolute path or None
+    """
+    if not os.path.exists(os.path.join(root, 'cgroup.controllers')):
+        return None     # not cgroup v2
+    path = current_cgroup()
+    if not path:
+        return None
+    parts = path.strip('/').split('/')
+    for i in range(len(parts), 0, -1):
+        if re.match(r'^user@\d+\.service$', parts[i - 1]):
+            base = os.path.join(root, *parts[:i])
+            if os.access(base, os.W_OK):
+                return base
+    return None
+
+
+def _read_keyed(path):
+    """Parse a flat-keyed cgroup file (memory.events, pids.events, cpu.stat)"""
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, value = line.partition(' ')
+                if value.strip().isdigit():
+                    values[key] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+class SandboxCgroup:
+    """
+    The cgroup of one sandbox
+    """
+
+    # (file, key, description) of events reported as limit hits
+    EVENTS = (
+        ('memory.events', 'max', 'memory.max reached {n} time(s) (memory reclaimed under pressure)'),
+        ('memory.events', 'oom_kill', '{n} process(es) killed by the OOM killer (memory limit)'),
+        ('pids.events', 'max', 'pids.max reached {n} time(s) (fork/clone refused)'),
+        ('cpu.stat', 'nr_throttled', 'CPU throttled in {n} period(s) (cpu.max)'),
+    )
+
+    def __init__(self, path, limits):
+        self.path = path
+        self.limits = limits
+        self._reported = {}
+        self.removed = False
+
+    def wrap(self, cmd):
+        """Prefix a command so it starts inside this cgroup"""
+        return ['sh', '-c', JOIN_SCRIPT, self.path, *cmd]
+
+    def poll_events(self):
+        """
+        New limit hits since the last poll
+        Returns: list of messages
+        """
+        messages = []
+        cache = {}
+        for filename, key, description in self.EVENTS:
+            if filename not in cache:
+                cache[filename] = _read_keyed(os.path.join(self.path, filename))
+            count = cache[filename].get(key, 0)
+            new = count - self._reported.get((filename, key), 0)
+            if new > 0:
+                self._reported[(filename, key)] = count
+                messages.append(description.format(n=new))
+        return messages
+
+    def procs(self):
+        """Pids in the cgroup, or None if it cannot be read"""
+        try:
+            with open(os.path.join(self.path, 'cgroup.procs'), 'r') as f:
+                return [int(pid) for pid in f.read().split()]
+        except (OSError, ValueError):
+            return None
+
+    def kill(self):
+        """Kill every process in the cgroup (Linux 5.14+)"""
+        try:
+            with open(os.path.join(self.path, 'cgroup.kill'), 'w') as f:
+                f.write('1')
+            return True
+        except OSError:
+            return False
+
+    def freeze(self, frozen=True):
+        """Freeze (or thaw) every process in the cgroup"""
+        try:
+            with open(os.path.join(self.path, 'cgroup.freeze'), 'w') as f:
+                f.write('1' if frozen else '0')
+            return True
+        except OSError:
+            return False
+
+    def remove(self):
+        """Delete the cgroup once it is empty"""
+        if self.removed:
+            return True
+        try:
+            os.rmdir(self.path)
+            self.removed = True
+        except FileNotFoundError:
+            self.removed = True
+        except OSError:
+            pass
+        return self.removed
+
+
+class CgroupManager:
+    """
+    Creates per-sandbox cgroups under the delegated subtree
+    """
+
+    CONTROLLERS = ('memory', 'pids', 'cpu')
+
+    def __init__(self, base=None):
+        self.logger = logging.getLogger('FirejailHandler')
+        parent = base or find_delegated_base()
+        self.base = os.path.join(parent, SUBTREE_NAME) if parent else None
+        self.controllers = set()
+        if self.base:
+            self._setup()
+
+    @property
+    def available(self):
+        return bool(self.controllers)
+
+    def _setup(self):
+        """Create <delegated>/invisvm and enable controllers for its children"""
+        try:
+            os.makedirs(self.base, exist_ok=True)
+            with open(os.path.join(self.base, 'cgroup.controllers'), 'r') as f:
+                offered = set(f.read().split()) & set(self.CONTROLLERS)
+            if offered:
+                with open(os.path.join(self.base, 'cgroup.subtree_control'), 'w') as f:
+                    f.write(' '.join(f'+{c}' for c in sorted(offered)))
+            self.controllers = offered
+        except OSError as e:
+            self.logger.warning(f'cgroup limits unavailable: {str(e)}')
+            self.controllers = set()
+
+    def create(self, sandbox_id, resources):
+        """
+        Create a cgroup for a sandbox with the cgroup-backed limits in resources
+        (memory_mb, max_pids, cpu_percent)
+        Returns: SandboxCgroup or None if nothing applies / not available
+        """
+        limits = {}
+        if resources.get('memory_mb') and 'memory' in self.controllers:
+            limits['memory.max'] = str(int(resources['memory_mb']) * 1024 * 1024)
+        if resources.get('max_pids') and 'pids' in self.controllers:
+            limits['pids.max'] = str(int(resources['max_pids']))
+        if resources.get('cpu_percent') and 'cpu' in self.controllers:
+            quota = int(CPU_PERIOD_US * float(resources['cpu_percent']) / 100)
+            limits['cpu.max'] = f'{quota} {CPU_PERIOD_US}'
+        if not limits:
+            return None
+
+        path = os.path.join(self.base, f'sandbox-{sandbox_id}')
+        try:
+            os.mkdir(path)
+            for filename, value in limits.items():
+                with open(os.path.join(path, filename), 'w') as f:
+                    f.write(value)
+        except OSError as e:
+            self.logger.warning(f'Could not create cgroup {path}: {str(e)}')
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+            return None
+        return SandboxCgroup(path, limits)
+
+    def find(self, sandbox_id):
+        """The existing cgroup of a sandbox (e.g. one launched by another InvisVM process), or None"""
+        if not self.base:
+            return None
+        path = os.path.join(self.base, f'sandbox-{sandbox_id}')
+        if not os.path.isdir(path):
+            return None
+        return SandboxCgroup(path, {})
+
+    def cleanup_empty(self):
+        """Remove sandbox cgroups left behind by exited InvisVM processes"""
+        if not self.base:
+            return 0
+        removed = 0
+        try:
+            names = os.listdir(self.base)
+        except OSError:
+            return 0
+        for name in names:
+            if name.startswith('sandbox-'):
+                try:
+                    os.rmdir(os.path.join(self.base, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
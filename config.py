@@ -19,6 +19,8 @@ os.makedirs(ASSETS_DIR, exist_ok=True)
 
 # Files
 LOG_FILE = os.path.join(LOG_DIR, 'invisvm.log')
+# Ended sandboxes with their runtime, outcome and resource summary (session_history.py)
+SESSION_HISTORY_DB = os.path.join(LOG_DIR, 'sessions.db')
 ICON_FILE = os.path.join(ASSETS_DIR, 'invisvm.png')
 
 # Firejail settings
@@ -39,27 +41,188 @@ FIREJAIL_PROFILES = [
 # NOTE: D-Bus filtering is now handled intelligently per-application
 # Applications that require D-Bus (like LibreOffice) will use filtered D-Bus
 # Applications that don't need D-Bus will have it completely blocked
+#
+# Policies are declarative and compiled into firejail argv templates by
+# policy_compiler.py. Fields:
+#   network       True / False / 'auto'
+#   devices       True / False (False blocks DVD, TV and U2F devices)
+#   sound, video  True / False / 'auto'
+#   dbus          'auto' / 'filter' / 'none'
+#                 'auto' allows it only for apps that need it (see APP_RULES
+#                 and app_capabilities.py)
+#   capabilities  names from CAPABILITY_FLAGS
+#   resources     resource ceilings (see RESOURCE_KEYS); any of them may be
+#                 overridden per launch with launch_sandboxed(..., resources={...})
+#   home          'real' (the user's home, default) or 'template' (a throwaway
+#                 private home copied from a template, see home_templates.py)
+#                 or 'tmpfs' (a RAM-backed home and /tmp, discarded on exit;
+#                 budgeted by the tmpfs_mb resource, see throwaway.py)
+#   home_template template name to use instead of the app/policy/default lookup
+#   overlay_tmpfs True sends all other writes to a RAM overlay (--overlay-tmpfs;
+#                 needs a firejail built with overlayfs support)
+#   on_tmpfs_exceeded  'kill' or 'freeze' a sandbox that writes more than tmpfs_mb
+#   reuse         open further files for the same handler app (e.g. all PDFs)
+#                 in one running sandbox of this policy with firejail --join,
+#                 instead of one sandbox per file (not with 'home': 'tmpfs')
+#   watchdog      rules for runaway sandboxes, checked by sandbox_watchdog.py
+#                 against /proc samples of the sandbox's process tree every
+#                 WATCHDOG_INTERVAL seconds; each rule is
+#                   {'metric': 'cpu_percent' (100 = one full core) or 'rss_mb',
+#                    'above': threshold, 'for': seconds it must stay above (0 = at once),
+#                    'action': 'renice' (to WATCHDOG_RENICE_NICE), 'freeze' or 'kill'}
+#   idle_freeze_minutes  freeze sandboxes that have done no I/O (files, network,
+#                 display: user input arrives as reads from the display
+#                 socket) for this long; thaw them from the Active Sandboxes tab
+#   ttl_minutes   stop sandboxes this long after launch (triage, kiosks); a
+#                 launch can set its own time limit (ttl_minutes=, 0 = none)
+#   extra_args    additional raw firejail flags
+# Extra or modified policies can be placed in POLICY_OVERRIDES_FILE (JSON,
+# same layout); they are picked up without restarting InvisVM.
 SECURITY_POLICIES = {
     'restrictive': {
         'network': False,
         'devices': False,
+        'sound': False,
+        'video': False,
+        'dbus': 'auto',
         'capabilities': ['drop-all'],
+        'home': 'template',
+        'reuse': False,         # triage: one sandbox per file
+        'watchdog': [
+            {'metric': 'cpu_percent', 'above': 90, 'for': 60, 'action': 'renice'},
+            {'metric': 'cpu_percent', 'above': 90, 'for': 300, 'action': 'freeze'},
+        ],
+        'resources': {
+            'memory_mb': 2048,
+            'max_pids': 256,
+            'cpu_percent': 100,
+            'open_files': 1024,
+            'nice': 10,
+        },
         'description': 'Ultra-Restrictive (No network, No devices, Smart D-Bus filtering)'
     },
+    'throwaway': {
+        'network': False,
+        'devices': False,
+        'sound': False,
+        'video': False,
+        'dbus': 'auto',
+        'capabilities': ['drop-all'],
+        'home': 'tmpfs',
+        'overlay_tmpfs': False,
+        'on_tmpfs_exceeded': 'kill',
+        'watchdog': [
+            {'metric': 'cpu_percent', 'above': 90, 'for': 60, 'action': 'renice'},
+            {'metric': 'cpu_percent', 'above': 90, 'for': 300, 'action': 'freeze'},
+        ],
+        'resources': {
+            'memory_mb': 2048,
+            'max_pids': 256,
+            'cpu_percent': 100,
+            'open_files': 1024,
+            'nice': 10,
+            'tmpfs_mb': 512,
+        },
+        'description': 'Throwaway (Restrictive, home and /tmp in RAM and discarded on exit)'
+    },
     'standard': {
         'network': True,  # Unchanged - standard allows network
         'devices': False,
+        'sound': 'auto',
+        'video': 'auto',
+        'dbus': 'auto',
         'capabilities': ['drop-dangerous'],
+        'reuse': True,
+        'watchdog': [
+            {'metric': 'cpu_percent', 'above': 90, 'for': 60, 'action': 'renice'},
+            {'metric': 'rss_mb', 'above': 3072, 'for': 30, 'action': 'freeze'},
+        ],
+        'resources': {
+            'memory_mb': 4096,
+            'max_pids': 512,
+            'cpu_percent': 200,
+            'open_files': 4096,
+            'nice': 5,
+        },
         'description': 'Standard (Network allowed, Smart D-Bus filtering)'
     },
     'permissive': {
         'network': True,
         'devices': True,
+        'sound': True,
+        'video': True,
+        'dbus': 'auto',
         'capabilities': ['drop-minimal'],
+        'reuse': True,
+        'watchdog': [
+            {'metric': 'cpu_percent', 'above': 90, 'for': 120, 'action': 'renice'},
+        ],
+        'resources': {
+            'memory_mb': 8192,
+            'max_pids': 2048,
+            'open_files': 8192,
+        },
         'description': 'Permissive (Most access allowed, Smart D-Bus filtering)'
     }
 }
 
+# Firejail flags for each capability set referenced by a policy
+CAPABILITY_FLAGS = {
+    'drop-all': ['--caps.drop=all'],
+    'drop-dangerous': ['--caps'],
+    'drop-minimal': ['--caps.drop=sys_admin,sys_module,sys_rawio'],
+}
+
+# Resource ceilings a policy may set (None or missing = unlimited)
+#   memory_mb         cgroup memory.max of the whole sandbox
+#   max_pids          cgroup pids.max (processes + threads in the sandbox)
+#   cpu_percent       cgroup cpu.max, 100 = one full core
+#   address_space_mb  --rlimit-as per process (browsers reserve far more
+#                     virtual memory than they use; avoid for them)
+#   user_processes    --rlimit-nproc (counts ALL processes of the user)
+#   open_files        --rlimit-nofile
+#   cpus              --cpu, list of allowed CPU numbers
+#   nice              --nice
+#   tmpfs_mb          RAM budget for a throwaway sandbox's writes ('home': 'tmpfs')
+# The cgroup limits apply only where a delegated cgroup v2 subtree exists
+RESOURCE_KEYS = (
+    'memory_mb', 'max_pids', 'cpu_percent',
+    'address_space_mb', 'user_processes', 'open_files', 'cpus', 'nice', 'tmpfs_mb',
+)
+CGROUP_LIMITS_ENABLED = True
+
+# Resource watchdog (policy 'watchdog' rules, see sandbox_watchdog.py)
+WATCHDOG_ENABLED = True
+WATCHDOG_INTERVAL = 5               # seconds between /proc samples
+WATCHDOG_RENICE_NICE = 19           # nice value of sandboxes the watchdog renices
+WATCHDOG_METRICS = ('cpu_percent', 'rss_mb')
+WATCHDOG_ACTIONS = ('renice', 'freeze', 'kill')
+# A sandbox tree reading + writing less than this per sample counts as idle
+# (timers and keep-alives do a little I/O even when nobody uses the app)
+IDLE_IO_BYTES = 4096
+
+# Private homes for policies with 'home': 'template'
+# A template is a directory HOME_TEMPLATES_DIR/<name>, looked up by app
+# (e.g. 'libreoffice', 'firefox'), then policy name, then 'default'
+SANDBOXES_DIR = os.path.join(APP_DIR, 'sandboxes')
+HOME_TEMPLATES_DIR = os.path.join(APP_DIR, 'home-templates')
+# Copied from the real home into the 'default' template when it is first needed
+HOME_TEMPLATE_DEFAULT_ITEMS = [
+    '.config/fontconfig',
+    '.cache/fontconfig',
+    '.config/gtk-3.0',
+    '.config/gtk-4.0',
+    '.gtkrc-2.0',
+    '.config/user-dirs.dirs',
+    '.config/mimeapps.list',
+]
+
+# Firejail flags applied when a policy blocks devices
+DEVICE_BLOCK_FLAGS = ['--nodvd', '--notv', '--nou2f']
+
+# User policy overrides (JSON), hot-reloaded when the file changes
+POLICY_OVERRIDES_FILE = os.path.join(APP_DIR, 'policies.json')
+
 # Application settings
 APP_NAME = 'InvisVM'
 APP_VERSION = '1.0.2'  # Updated version with Python script fix
@@ -71,7 +234,107 @@ WINDOW_TITLE = f'{APP_NAME} v{APP_VERSION} - Security Sandbox Launcher'
 LOG_FORMAT = '[%(asctime)s] %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# Prometheus textfile exporter (node_exporter textfile collector)
+# Set to a path such as '/var/lib/node_exporter/textfile_collector/invisvm.prom'
+# or pass --prometheus-textfile; None disables the exporter
+PROMETHEUS_TEXTFILE = None
+PROMETHEUS_EXPORT_INTERVAL = 15  # seconds
+
 # Right-click menu
 CONTEXT_MENU_NAME = 'InvisVM'
 NAUTILUS_SCRIPTS_DIR = os.path.join(HOME_DIR, '.local/share/nautilus/scripts')
 SCRIPT_NAME = 'Open-with-InvisVM'
+
+# Maximum concurrent launches when several files are opened at once
+MULTI_LAUNCH_MAX_PARALLEL = 4
+
+# Launch scheduler (admission control in front of launch_sandboxed)
+# Launches wait in a queue while any limit below is reached. Interactive
+# launches (one app started from the GUI) go ahead of batch launches
+# (multi-file opens, triage) and are not held back by host load.
+SCHEDULER_MAX_SANDBOXES = 16        # running sandboxes launched by this process
+SCHEDULER_MAX_IN_FLIGHT = MULTI_LAUNCH_MAX_PARALLEL
+SCHEDULER_MIN_MEM_AVAILABLE_MB = 1024
+SCHEDULER_LAUNCH_RESERVE_MB = 256   # assumed footprint of a sandbox that is still starting up
+SCHEDULER_SETTLE_SECONDS = 10       # how long a new sandbox counts as starting up
+SCHEDULER_MAX_LOAD_PER_CPU = 1.5    # 1-minute load average / CPU count
+SCHEDULER_MAX_PSI = {               # /proc/pressure/<resource> "some avg10" in percent
+    'memory': 10.0,
+    'io': 40.0,
+    'cpu': 80.0,
+}
+SCHEDULER_RECHECK_INTERVAL = 1.0    # seconds between host load checks while blocked
+
+# Warm sandbox pool (see sandbox_pool.py): idle pre-started sandboxes that
+# launches join with `firejail --join`; enable here or with --warm-pool
+SANDBOX_POOL_ENABLED = False
+SANDBOX_POOL_SIZE = {               # idle sandboxes per policy and D-Bus variant
+    'standard': 2,
+    'restrictive': 1,
+}
+SANDBOX_POOL_MEMORY_MB = 256        # resident memory all idle pool sandboxes may use
+SANDBOX_POOL_PLACEHOLDER = ['sleep', 'infinity']
+
+# Sandbox reuse for policies with 'reuse': True
+SANDBOX_REUSE_MAX_FILES = 32        # files opened in one sandbox before starting another
+SANDBOX_REUSE_WAIT_SECONDS = 10     # wait for a sandbox of the same app that is still starting
+
+# Application identification (see app_identity.py), used to name sandboxes
+# at launch and in discovery and to decide what an app needs.
+#   programs  program names (basename; a version/variant suffix such as
+#             'python3.11' or 'signal-desktop' also matches)
+#   name      display name (default: the program name, capitalized); the
+#             opened file is appended as 'name (file)'
+#   needs     capabilities the app needs besides those in its .desktop file
+#             ('dbus', 'sound', 'video', 'network'; see APP_CAPABILITY_OVERRIDES)
+#   generic   opens any file; sandboxes are named after the file type instead
+# Earlier rules win. Recognising another app only needs a rule here.
+APP_RULES = [
+    {'id': 'python', 'programs': ['python', 'python3'], 'name': 'Python Script'},
+    {'id': 'shell', 'programs': ['bash', 'sh', 'dash', 'zsh'], 'name': 'Shell Script'},
+    {'id': 'lo-writer', 'programs': ['lowriter', 'swriter', 'writer'], 'name': 'LibreOffice Writer', 'needs': ['dbus']},
+    {'id': 'lo-calc', 'programs': ['localc', 'scalc', 'calc'], 'name': 'LibreOffice Calc', 'needs': ['dbus']},
+    {'id': 'lo-impress', 'programs': ['loimpress', 'simpress', 'impress'], 'name': 'LibreOffice Impress', 'needs': ['dbus']},
+    {'id': 'lo-draw', 'programs': ['lodraw', 'sdraw', 'draw'], 'name': 'LibreOffice Draw', 'needs': ['dbus']},
+    {'id': 'lo-math', 'programs': ['lomath', 'smath'], 'name': 'LibreOffice Math', 'needs': ['dbus']},
+    {'id': 'lo-base', 'programs': ['lobase', 'sbase'], 'name': 'LibreOffice Base', 'needs': ['dbus']},
+    {'id': 'libreoffice', 'programs': ['libreoffice', 'soffice'], 'name': 'LibreOffice', 'needs': ['dbus']},
+    {'id': 'firefox', 'programs': ['firefox'], 'name': 'Firefox'},
+    {'id': 'chrome', 'programs': ['google-chrome', 'chrome', 'chromium', 'chromium-browser'], 'name': 'Chrome'},
+    {'id': 'terminal', 'programs': ['gnome-terminal', 'konsole', 'xfce4-terminal', 'tilix'], 'name': 'Terminal', 'needs': ['dbus']},
+    {'id': 'files', 'programs': ['nautilus', 'dolphin', 'thunar', 'nemo', 'pcmanfm'], 'name': 'Files', 'needs': ['dbus']},
+    {'id': 'text-editor', 'programs': ['gedit', 'gnome-text-editor', 'kate', 'mousepad', 'pluma'], 'name': 'Text Editor', 'needs': ['dbus']},
+    {'id': 'document-viewer', 'programs': ['evince', 'okular', 'atril'], 'name': 'Document Viewer', 'needs': ['dbus']},
+    {'id': 'mail', 'programs': ['thunderbird', 'evolution'], 'needs': ['dbus']},
+    {'id': 'chat', 'programs': ['telegram', 'signal', 'discord', 'slack'], 'needs': ['dbus', 'sound', 'video']},
+    {'id': 'graphics', 'programs': ['gimp', 'inkscape', 'blender'], 'needs': ['dbus']},
+    {'id': 'media-player', 'programs': ['vlc', 'mpv', 'rhythmbox', 'totem'], 'needs': ['dbus', 'sound']},
+    {'id': 'code-editor', 'programs': ['code', 'codium', 'atom', 'sublime', 'subl'], 'name': 'Code Editor', 'needs': ['dbus']},
+    {'id': 'xdg-open', 'programs': ['xdg-open'], 'name': 'File', 'generic': True},
+]
+
+# Application capabilities (see app_capabilities.py): 'dbus', 'sound',
+# 'video' and 'network', read from installed .desktop files and kept in
+# APP_CAPABILITY_CACHE. APP_RULES 'needs' add to them; the overrides below
+# are applied last, per program name (True grants, False removes).
+APP_CAPABILITY_CACHE = os.path.join(APP_DIR, 'app_capabilities.json')
+APP_CAPABILITY_OVERRIDES = {
+    'firefox': {'network': True, 'sound': True, 'video': True},
+    'google-chrome': {'network': True, 'sound': True, 'video': True},
+    'chromium': {'network': True, 'sound': True, 'video': True},
+    'thunderbird': {'network': True},
+}
+
+# Files are opened with their MIME handler resolved on the host (see
+# mime_resolver.py) instead of xdg-open inside the sandbox; False restores xdg-open
+MIME_RESOLVER_ENABLED = True
+# Handlers that cannot run inside firejail (they start their own sandbox);
+# files of these types fall back to the next handler, then xdg-open
+MIME_HANDLER_SKIP_EXECUTABLES = ['flatpak', 'snap', 'firejail']
+
+# Sandboxed app output (stdout + stderr)
+OUTPUT_BUFFER_BYTES = 64 * 1024    # most recent output kept in memory per sandbox
+OUTPUT_SPILL_TO_LOG = True         # also copy output lines into the sandbox log
+OUTPUT_SPILL_RATE = 4096           # bytes/second copied to the log; excess is counted, not written
+OUTPUT_SPILL_BURST = 16 * 1024
+OUTPUT_TAIL_IN_LOG = 4096          # bytes of output written to the log when the sandbox exits
@@ -90,16 +90,18 @@ class ContextMenuInstaller:
 # InvisVM - Open with Firejail Sandbox
 # Generated by InvisVM Context Menu Installer
 
-# Get the selected file/folder
+# Collect every selected file/folder (one path per line)
+ARGS=()
 if [ -n "$NAUTILUS_SCRIPT_SELECTED_FILE_PATHS" ]; then
-    FILE_PATH="$NAUTILUS_SCRIPT_SELECTED_FILE_PATHS"
+    while IFS= read -r FILE_PATH; do
+        [ -n "$FILE_PATH" ] && ARGS+=(--file "$FILE_PATH")
+    done <<< "$NAUTILUS_SCRIPT_SELECTED_FILE_PATHS"
 else
-    FILE_PATH="$NAUTILUS_SCRIPT_CURRENT_URI"
+    # Convert file:// URI to path if needed
+    FILE_PATH=$(echo "$NAUTILUS_SCRIPT_CURRENT_URI" | sed 's/file:\\/\\//\\//g')
+    ARGS+=(--file "$FILE_PATH")
 fi
 
-# Convert file:// URI to path if needed
-FILE_PATH=$(echo "$FILE_PATH" | sed 's/file:\\/\\//\\//g')
-
-# Launch InvisVM with policy selection dialog
-python3 {self.app_dir}/main.py --select-policy --file "$FILE_PATH" &
+# Launch InvisVM once for the whole selection (one policy dialog)
+python3 {self.app_dir}/main.py --select-policy "${{ARGS[@]}}" &
 """
\ No newline at end of file
@@ -0,0 +1,372 @@
+"""
+File Classifier Module
+Single-read classification of launch targets with a content-signature cache
+
+A launch used to stat and reopen the same file several times (script
+detection, LibreOffice detection, D-Bus checks, naming). The classifier
+stats the path once, reads a small header once, and returns one
+FileClassification that every launch step reuses. Results are cached by
+(dev, inode, mode, mtime, ctime, size) so repeated and bulk opens are
+almost free, while a chmod or rewrite invalidates the entry.
+"""
+
+import os
+import re
+import stat
+import mimetypes
+import threading
+from collections import OrderedDict
+
+# Bytes read from the start of a file for magic/shebang sniffing
+HEADER_SIZE = 512
+
+# Maximum number of cached classifications
+CACHE_SIZE = 2048
+
+# Display labels per extension (used by get_app_name)
+EXTENSION_LABELS = {
+    '.pdf': 'PDF',
+    '.txt': 'Text',
+    '.html': 'Browser',
+    '.htm': 'Browser',
+    '.mp4': 'Video',
+    '.avi': 'Video',
+    '.mkv': 'Video',
+    '.webm': 'Video',
+    '.mp3': 'Audio',
+    '.wav': 'Audio',
+    '.flac': 'Audio',
+    '.jpg': 'Image',
+    '.jpeg': 'Image',
+    '.png': 'Image',
+    '.gif': 'Image',
+    '.bmp': 'Image',
+    '.webp': 'Image',
+    '.svg': 'Image',
+    '.doc': 'Document',
+    '.docx': 'Document',
+    '.odt': 'Document',
+    '.xls': 'Spreadsheet',
+    '.xlsx': 'Spreadsheet',
+    '.ods': 'Spreadsheet',
+    '.ppt': 'Presentation',
+    '.pptx': 'Presentation',
+    '.odp': 'Presentation',
+}
+
+# Display labels for files whose type is only known from their content
+MIME_LABELS = {
+    'application/pdf': 'PDF',
+    'text/html': 'Browser',
+    'text/plain': 'Text',
+    'application/vnd.oasis.opendocument.text': 'Document',
+    'application/vnd.oasis.opendocument.spreadsheet': 'Spreadsheet',
+    'application/vnd.oasis.opendocument.presentation': 'Presentation',
+}
+
+# LibreOffice launcher per extension
+LIBREOFFICE_COMMANDS = {
+    '.odt': 'lowriter',
+    '.doc': 'lowriter',
+    '.docx': 'lowriter',
+    '.rtf': 'lowriter',
+    '.txt': 'lowriter',
+    '.ods': 'localc',
+    '.xls': 'localc',
+    '.xlsx': 'localc',
+    '.odp': 'loimpress',
+    '.ppt': 'loimpress',
+    '.pptx': 'loimpress',
+    '.odg': 'lodraw',
+    '.odf': 'lomath',
+    '.odb': 'lobase',
+}
+
+LIBREOFFICE_EXTENSIONS = frozenset(LIBREOFFICE_COMMANDS)
+
+# Interpreters for script types detected by extension only
+SCRIPT_EXTENSIONS = {
+    '.py': 'python3',
+    '.sh': 'bash',
+    '.bash': 'bash',
+    '.rb': 'ruby',
+    '.pl': 'perl',
+    '.js': 'node',
+    '.lua': 'lua',
+    '.tcl': 'tclsh',
+}
+
+# Interpreter name (from shebang) -> script kind; versioned names such as
+# python3.11 or perl5.36 are accepted
+_INTERPRETER_KINDS = (
+    (re.compile(r'^python[\d.]*$'), 'python'),
+    (re.compile(r'^(?:ba|da|z|k|mk)?sh$'), 'shell'),
+    (re.compile(r'^(?:ruby|perl|node|nodejs|lua|tclsh)[\d.]*$'), 'script'),
+)
+
+# (offset, signature, mime type)
+_MAGIC = (
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'\x7fELF', 'application/x-executable'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'fLaC', 'audio/flac'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'\x1aE\xdf\xa3', 'video/x-matroska'),
+    (4, b'ftyp', 'video/mp4'),
+    (0, b'{\\rtf', 'application/rtf'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (0, b'PK\x03\x04', 'application/zip'),
+)
+
+# Container formats shared by many file types: when the content only shows
+# the container, the extension is more specific (.docx, .xlsx, .msi, ...)
+_GENERIC_MIMES = frozenset({'application/zip', 'application/x-ole-storage'})
+
+# BITMAPINFOHEADER and its variants: DIB header sizes at offset 14
+_BMP_HEADER_SIZES = frozenset({12, 40, 52, 56, 64, 108, 124})
+
+_RIFF_TYPES = {
+    b'WEBP': 'image/webp',
+    b'WAVE': 'audio/x-wav',
+    b'AVI ': 'video/x-msvideo',
+}
+
+
+class FileClassification:
+    """
+    Result of classifying one launch target. Treat as read-only.
+    """
+    __slots__ = (
+        'path', 'exists', 'is_dir', 'is_file', 'is_executable', 'ext',
+        'mime', 'kind', 'interpreter', 'interpreter_args', 'signature',
+    )
+
+    def __init__(self, path, exists=False, is_dir=False, is_file=False,
+                 is_executable=False, ext='', mime=None, kind='missing',
+                 interpreter=None, interpreter_args=(), signature=None):
+        self.path = path
+        self.exists = exists
+        self.is_dir = is_dir
+        self.is_file = is_file
+        self.is_executable = is_executable
+        self.ext = ext
+        self.mime = mime
+        self.kind = kind
+        self.interpreter = interpreter
+        self.interpreter_args = tuple(interpreter_args)
+        self.signature = signature
+
+    @property
+    def basename(self):
+        return os.path.basename(self.path)
+
+    @property
+    def is_script(self):
+        return self.kind in ('python', 'shell', 'script')
+
+    @property
+    def is_libreoffice(self):
+        return self.is_file and self.ext in LIBREOFFICE_EXTENSIONS
+
+    def interpreter_command(self):
+        """Return the argv that runs this script, or None"""
+        if not self.is_script:
+            return None
+        return [self.interpreter, *self.interpreter_args, self.path]
+
+    def __repr__(self):
+        return f'FileClassification({self.path!r}, kind={self.kind!r}, mime={self.mime!r})'
+
+
+def parse_shebang(header):
+    """
+    Parse a shebang line from a file header
+    Returns: (interpreter_name, args) or (None, ())
+    """
+    if not header.startswith(b'#!'):
+        return None, ()
+
+    line = header[2:].split(b'\n', 1)[0].strip()
+    try:
+        tokens = line.decode('utf-8', errors='replace').split()
+    except Exception:
+        return None, ()
+    if not tokens:
+        return None, ()
+
+    program = os.path.basename(tokens[0])
+    args = tokens[1:]
+
+    if program == 'env':
+        # env [-S] [-i] [NAME=value ...] interpreter [args]
+        rest = []
+        for i, token in enumerate(args):
+            if token.startswith('-S') and len(token) > 2:
+                rest = [token[2:]] + args[i + 1:]
+                break
+            if token.startswith('-') or '=' in token:
+                continue
+            rest = args[i:]
+            break
+        if not rest:
+            return None, ()
+        program = os.path.basename(rest[0])
+        args = rest[1:]
+
+    return program, tuple(args)
+
+
+def interpreter_kind(interpreter):
+    """Map an interpreter name to a script kind ('python', 'shell', 'script') or None"""
+    if not interpreter:
+        return None
+    for pattern, kind in _INTERPRETER_KINDS:
+        if pattern.match(interpreter):
+            return kind
+    return None
+
+
+def sniff_mime(header):
+    """Detect a MIME type from magic bytes, or None"""
+    for offset, magic, mime in _MAGIC:
+        if header[offset:offset + len(magic)] == magic:
+            if mime == 'application/zip':
+                return _sniff_zip(header)
+            return mime
+
+    if header[:4] == b'RIFF' and header[8:12] in _RIFF_TYPES:
+        return _RIFF_TYPES[header[8:12]]
+
+    # 'BM' alone matches text; also require the zero reserved words and a known DIB header
+    if (header[:2] == b'BM' and header[6:10] == b'\0\0\0\0'
+            and int.from_bytes(header[14:18], 'little') in _BMP_HEADER_SIZES):
+        return 'image/bmp'
+
+    lowered = header[:256].lstrip().lower()
+    if lowered.startswith((b'<!doctype html', b'<html')):
+        return 'text/html'
+    if lowered.startswith(b'<?xml') and b'<svg' in header.lower():
+        return 'image/svg+xml'
+    return None
+
+
+def _sniff_zip(header):
+    """ODF containers store their MIME type uncompressed as the first entry"""
+    if header[30:38] == b'mimetype':
+        mime = header[38:].split(b'PK', 1)[0]
+        try:
+            return mime.decode('ascii')
+        except UnicodeDecodeError:
+            pass
+    return 'application/zip'
+
+
+class FileClassifier:
+    """
+    Classifies launch targets with a single stat and header read,
+    caching results by (dev, inode, mode, mtime, ctime, size)
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, path):
+        """Classify a path; returns a FileClassification"""
+        try:
+            st = os.stat(path)
+        except (OSError, ValueError):
+            return FileClassification(path, ext=os.path.splitext(path)[1].lower())
+
+        signature = (st.st_dev, st.st_ino, st.st_mode, st.st_mtime_ns, st.st_ctime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached.signature == signature:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        result = self._classify_stat(path, st, signature)
+
+        with self._lock:
+            self._cache[path] = result
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def invalidate(self, path=None):
+        """Drop one cached path, or the whole cache"""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
+
+    def _classify_stat(self, path, st, signature):
+        """Build a classification from an existing stat result"""
+        ext = os.path.splitext(path)[1].lower()
+
+        if stat.S_ISDIR(st.st_mode):
+            return FileClassification(
+                path, exists=True, is_dir=True, ext=ext,
+                mime='inode/directory', kind='directory', signature=signature
+            )
+
+        is_file = stat.S_ISREG(st.st_mode)
+        is_executable = is_file and os.access(path, os.X_OK)
+
+        header = b''
+        if is_file:
+            try:
+                with open(path, 'rb') as f:
+                    header = f.read(HEADER_SIZE)
+            except OSError:
+                pass
+
+        interpreter, interpreter_args = parse_shebang(header)
+        shebang_kind = interpreter_kind(interpreter)
+        mime = sniff_mime(header)
+        if mime is None or mime in _GENERIC_MIMES:
+            mime = mimetypes.guess_type(path, strict=False)[0] or mime
+
+        kind = 'file'
+        if not is_file:
+            kind = 'other'
+        elif ext == '.py' or shebang_kind == 'python':
+            kind = 'python'
+            if shebang_kind != 'python':
+                interpreter, interpreter_args = 'python3', ()
+        elif ext in ('.sh', '.bash') or shebang_kind == 'shell':
+            kind = 'shell'
+            if shebang_kind != 'shell':
+                interpreter, interpreter_args = 'bash', ()
+        elif ext in SCRIPT_EXTENSIONS:
+            kind = 'script'
+            interpreter, interpreter_args = SCRIPT_EXTENSIONS[ext], ()
+        elif shebang_kind == 'script':
+            kind = 'script'
+        elif mime == 'application/x-executable' or (is_executable and header.startswith(b'#!')):
+            kind = 'executable'
+
+        if kind not in ('python', 'shell', 'script'):
+            interpreter, interpreter_args = None, ()
+
+        return FileClassification(
+            path, exists=True, is_file=is_file, is_executable=is_executable,
+            ext=ext, mime=mime, kind=kind, interpreter=interpreter,
+            interpreter_args=interpreter_args, signature=signature
+        )
+
+
+# Shared classifier used by FirejailHandler instances in this process
+default_classifier = FileClassifier()
@@ -21,6 +21,34 @@ import time
 import uuid
 import shutil
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from file_classifier import default_classifier, LIBREOFFICE_COMMANDS, LIBREOFFICE_EXTENSIONS
+from policy_compiler import default_compiler, describe_resources
+from cgroups import CgroupManager
+import procfs
+import resource_summary
+from session_history import default_history, outcome_of
+from home_templates import default_home_templates
+from throwaway import TmpfsUsage
+from mime_resolver import default_mime_resolver
+from app_identity import default_identifier
+from app_capabilities import default_capabilities
+from sandbox_watchdog import Watchdog
+from ttl_scheduler import TTLScheduler
+from sandbox_pool import SandboxPool, is_pool_sandbox, sandbox_in_use, shutdown_sandbox
+from metrics import METRICS
+from sandbox_registry import SandboxRegistry, SandboxRecord
+from output_capture import default_capture
+from config import (
+    OUTPUT_SPILL_TO_LOG, OUTPUT_TAIL_IN_LOG, CGROUP_LIMITS_ENABLED, SANDBOXES_DIR,
+    SANDBOX_REUSE_MAX_FILES, SANDBOX_REUSE_WAIT_SECONDS, MIME_RESOLVER_ENABLED, WATCHDOG_ENABLED
+)
+
+# Exit summaries of ended sandboxes kept for wait_exit()
+EXITS_KEPT = 256
 
 class SandboxLogger:
     """
@@ -59,10 +87,22 @@ class SandboxLogger:
         self.events.append(event)
         
         # Write to file
-        with open(self.log_file, 'a') as f:
-            f.write(f"[{timestamp.strftime('%H:%M:%S')}] {event_type.upper()}: {message}\n")
-            if details:
-                f.write(f"  Details: {details}\n")
+        line = f"[{timestamp.strftime('%H:%M:%S')}] {event_type.upper()}: {message}\n"
+        if details:
+            line += f"  Details: {details}\n"
+        with METRICS.timer('log.sandbox_write'):
+            with open(self.log_file, 'a') as f:
+                f.write(line)
+        METRICS.inc('log.bytes_written', len(line.encode('utf-8')))
+    
+    def write_output(self, text):
+        """Append captured app output to the log file (not kept in memory)"""
+        timestamp = datetime.now().strftime('%H:%M:%S')
+        block = ''.join(f"[{timestamp}] OUTPUT | {line}\n" for line in text.splitlines())
+        with METRICS.timer('log.sandbox_write'):
+            with open(self.log_file, 'a') as f:
+                f.write(block)
+        METRICS.inc('log.bytes_written', len(block.encode('utf-8')))
     
     def get_formatted_log(self):
         """Get formatted, colorized log for display"""
@@ -114,45 +154,65 @@ class FirejailHandler:
     Handles launching and monitoring firejailed applications
     """
     
-    def __init__(self, log_callback=None):
+    def __init__(self, log_callback=None, adopt=True):
         """
         Initialize Firejail handler
         
         Args:
             log_callback: Function to call for logging messages
+            adopt: Also watch sandboxes loaded from the state file (exit
+                   handling, watchdog rules, time limits); False for
+                   short-lived processes that only look after their own
+                   launches, so one long-running process (the GUI) does it
         """
         self.log_callback = log_callback
-        self.active_sandboxes = {}
-        self.sandbox_loggers = {}
+        self.adopt = adopt
+        self.registry = SandboxRegistry()
+        # Stops sandboxes whose time limit (record.deadline) has passed
+        self.ttl = TTLScheduler(self._sandbox_expired)
+        self.registry.subscribe(self._on_registry_change)
+        self.output_capture = default_capture
+        self.cgroups = CgroupManager() if CGROUP_LIMITS_ENABLED else None
+        if self.cgroups is not None:
+            self.cgroups.cleanup_empty()
+        self.home_templates = default_home_templates
+        self.home_templates.purge_trash()
+        self.pool = None                # sandbox_pool.SandboxPool, set by start_pool()
+        self.reuse_sandboxes = True     # False: one sandbox per file whatever the policy says
+        self._killed = set()            # pids stopped by kill_sandbox, until their exit is handled
+        self._launched = set()          # pids launched (not adopted) by this handler, until their exit is handled
+        self._exits = OrderedDict()     # pid -> exit summary of recently ended sandboxes
+        self._exit_cond = threading.Condition()
+        self._affinity_lock = threading.Lock()
+        self._affinity_pending = {}     # (policy, affinity) -> (since, Event) while its sandbox starts
+        self._state_lock = threading.RLock()
         self.state_file = os.path.expanduser('~/InvisVM/logs/sandboxes.json')
+        self.history = default_history
         self.runtime_log_file = os.path.expanduser('~/InvisVM/logs/runtime.log')
         self.setup_logging()
         self.load_state()
         self._ensure_runtime_log()
         
-        # Applications that REQUIRE D-Bus to function
-        self.dbus_required_apps = {
-            'libreoffice', 'lowriter', 'localc', 'loimpress', 'lodraw', 'lomath', 'lobase',
-            'soffice', 'writer', 'calc', 'impress', 'draw', 'math', 'base',
-            'gnome-terminal', 'konsole', 'xfce4-terminal', 'tilix',
-            'nautilus', 'dolphin', 'thunar', 'nemo', 'pcmanfm',
-            'gedit', 'kate', 'mousepad', 'pluma',
-            'evince', 'okular', 'atril',
-            'thunderbird', 'evolution',
-            'telegram', 'signal', 'discord', 'slack',
-            'gimp', 'inkscape', 'blender',
-            'vlc', 'mpv', 'rhythmbox', 'totem',
-            'code', 'codium', 'atom', 'sublime',
-        }
-        
         # LibreOffice file extensions
-        self.libreoffice_extensions = {
-            '.odt', '.ods', '.odp', '.odg', '.odf', '.odb',
-            '.doc', '.docx',
-            '.xls', '.xlsx',
-            '.ppt', '.pptx',
-            '.rtf', '.txt',
-        }
+        self.libreoffice_extensions = LIBREOFFICE_EXTENSIONS
+        
+        # Shared single-read file classifier (cached by dev/inode/mtime/size)
+        self.classifier = default_classifier
+        
+        # Compiled security policy templates (hot-reloaded from policies.json)
+        self.policy_compiler = default_compiler
+        
+        # Host-side MIME type -> app lookup (None: open files with xdg-open)
+        self.mime_resolver = default_mime_resolver if MIME_RESOLVER_ENABLED else None
+        
+        # Names apps (config.APP_RULES) and looks up what they need (.desktop files)
+        self.identifier = default_identifier
+        self.capabilities = default_capabilities
+        
+        # Samples every sandbox for its exit summary, and renices, freezes or
+        # kills runaway ones (policy 'watchdog' rules)
+        self.watchdog = Watchdog(self, enforce=WATCHDOG_ENABLED)
+        self.watchdog.start()
     
     def _ensure_runtime_log(self):
         """Ensure runtime log exists and append session separator"""
@@ -171,87 +231,51 @@ class FirejailHandler:
     def _log_to_runtime(self, message, level='INFO'):
         """Log to runtime log file (append mode)"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with open(self.runtime_log_file, 'a') as f:
-            f.write(f"[{timestamp}] {level}: {message}\n")
+        line = f"[{timestamp}] {level}: {message}\n"
+        with METRICS.timer('log.runtime_write'):
+            with open(self.runtime_log_file, 'a') as f:
+                f.write(line)
+        METRICS.inc('log.bytes_written', len(line.encode('utf-8')))
+    
+    # ========== SCRIPT DETECTION METHODS ==========
     
-    # ========== NEW SCRIPT DETECTION METHODS ==========
+    @METRICS.timed('launch.classify')
+    def classify(self, path):
+        """
+        Classify a launch target once (stat + header read)
+        Returns: FileClassification, cached until the file changes
+        """
+        return self.classifier.classify(path)
     
-    def _is_python_script(self, path):
+    def _is_python_script(self, path, classification=None):
         """Check if the file is a Python script"""
-        if not os.path.isfile(path):
-            return False
-        
-        # Check extension
-        ext = os.path.splitext(path)[1].lower()
-        if ext == '.py':
-            return True
-        
-        # Check shebang
-        try:
-            with open(path, 'rb') as f:
-                first_line = f.readline()
-                if first_line.startswith(b'#!/usr/bin/env python') or \
-                   first_line.startswith(b'#!/usr/bin/python'):
-                    return True
-        except:
-            pass
-        
-        return False
+        classification = classification or self.classify(path)
+        return classification.kind == 'python'
     
-    def _is_shell_script(self, path):
+    def _is_shell_script(self, path, classification=None):
         """Check if the file is a shell script"""
-        if not os.path.isfile(path):
-            return False
-        
-        # Check extension
-        ext = os.path.splitext(path)[1].lower()
-        if ext in ['.sh', '.bash']:
-            return True
-        
-        # Check shebang
-        try:
-            with open(path, 'rb') as f:
-                first_line = f.readline()
-                if first_line.startswith(b'#!/bin/bash') or \
-                   first_line.startswith(b'#!/bin/sh') or \
-                   first_line.startswith(b'#!/usr/bin/env bash'):
-                    return True
-        except:
-            pass
-        
-        return False
+        classification = classification or self.classify(path)
+        return classification.kind == 'shell'
     
-    def _get_script_interpreter(self, path):
+    def _get_script_interpreter(self, path, classification=None):
         """
         Get the appropriate interpreter for a script file
         Returns: (interpreter_command, True) if script detected, (None, False) otherwise
         """
-        if self._is_python_script(path):
-            self.log(f'Detected Python script: {os.path.basename(path)}', 'INFO')
-            return (['python3', path], True)
-        
-        elif self._is_shell_script(path):
-            self.log(f'Detected shell script: {os.path.basename(path)}', 'INFO')
-            return (['bash', path], True)
-        
-        # Support for other script types
-        ext = os.path.splitext(path)[1].lower()
-        interpreters = {
-            '.rb': 'ruby',
-            '.pl': 'perl',
-            '.js': 'node',
-            '.lua': 'lua',
-            '.tcl': 'tclsh',
-        }
-        
-        if ext in interpreters:
-            interpreter = interpreters[ext]
-            self.log(f'Detected {interpreter} script: {os.path.basename(path)}', 'INFO')
-            return ([interpreter, path], True)
+        classification = classification or self.classify(path)
+        if not classification.is_script:
+            return (None, False)
+        
+        if classification.kind == 'python':
+            self.log(f'Detected Python script: {classification.basename}', 'INFO')
+        elif classification.kind == 'shell':
+            self.log(f'Detected shell script: {classification.basename}', 'INFO')
+        else:
+            self.log(f'Detected {classification.interpreter} script: {classification.basename}', 'INFO')
         
-        return (None, False)
+        return (classification.interpreter_command(), True)
     
-    # ========== END OF NEW METHODS ==========
+    # ========== END OF SCRIPT DETECTION ==========
     
     def setup_logging(self):
         """Setup logging for firejail operations"""
@@ -275,11 +299,14 @@ class FirejailHandler:
         Clean up orphaned sandbox instance directories
         Returns: (cleaned_count, total_size_mb)
         """
-        sandboxes_dir = os.path.expanduser('~/InvisVM/sandboxes')
+        sandboxes_dir = SANDBOXES_DIR
         if not os.path.exists(sandboxes_dir):
             return 0, 0
         
         running_pids = set(self._get_firejail_pids())
+        tracked_ids = {record.sandbox_id for record in self.registry.snapshot().values()}
+        if self.pool is not None:
+            tracked_ids |= self.pool.sandbox_ids()
         cleaned_count = 0
         total_size = 0
         
@@ -298,7 +325,7 @@ class FirejailHandler:
                     pass
                 
                 # Check if instance is still active
-                instance_active = False
+                instance_active = item[len('instance-'):] in tracked_ids
                 for pid in running_pids:
                     try:
                         with open(f'/proc/{pid}/cwd', 'r') as f:
@@ -321,6 +348,7 @@ class FirejailHandler:
         self._log_to_runtime(f'Cleanup: Removed {cleaned_count} instances, freed {total_size_mb:.2f} MB')
         return cleaned_count, total_size_mb
     
+    @METRICS.timed('state.load')
     def load_state(self):
         """Load sandbox state from file"""
         try:
@@ -330,27 +358,23 @@ class FirejailHandler:
                     for pid_str, info in data.items():
                         pid = int(pid_str)
                         if self._is_firejail_pid(pid):
-                            info['process'] = None
-                            info['timestamp'] = datetime.fromisoformat(info['timestamp'])
-                            self.active_sandboxes[pid] = info
-                            self._monitor_process(pid, info['name'])
+                            record = SandboxRecord.from_state(pid, info)
+                            if self.registry.add(record) and self.adopt:
+                                self._monitor_process(pid, record.name)
         except Exception as e:
             self.log(f'Could not load state: {str(e)}', 'WARNING')
     
+    @METRICS.timed('state.save')
     def save_state(self):
         """Save sandbox state to file"""
         try:
-            data = {}
-            for pid, info in self.active_sandboxes.items():
-                data[str(pid)] = {
-                    'name': info['name'],
-                    'path': info['path'],
-                    'policy': info['policy'],
-                    'timestamp': info['timestamp'].isoformat(),
-                    'sandbox_id': info.get('sandbox_id', '')
+            with self._state_lock:
+                data = {
+                    str(pid): record.to_state()
+                    for pid, record in self.registry.snapshot().items()
                 }
-            with open(self.state_file, 'w') as f:
-                json.dump(data, f, indent=2)
+                with open(self.state_file, 'w') as f:
+                    json.dump(data, f, indent=2)
         except Exception as e:
             self.log(f'Could not save state: {str(e)}', 'WARNING')
     
@@ -362,6 +386,7 @@ class FirejailHandler:
         except (OSError, ProcessLookupError):
             return False
     
+    @METRICS.timed('proc.cmdline_read')
     def _is_firejail_pid(self, pid):
         """Check if PID is actually a firejail process"""
         try:
@@ -371,6 +396,7 @@ class FirejailHandler:
         except:
             return False
     
+    @METRICS.timed('subprocess.firejail_list')
     def _get_firejail_pids(self):
         """Get all firejail PIDs using firejail --list"""
         try:
@@ -381,19 +407,22 @@ class FirejailHandler:
                 text=True,
                 timeout=5
             )
-            
-            pids = []
-            for line in result.stdout.split('\n'):
-                match = re.match(r'^\s*(\d+):', line)
-                if match:
-                    pid = int(match.group(1))
-                    if 'zombie' not in line.lower():
-                        pids.append(pid)
-            return pids
+            return self._parse_firejail_list(result.stdout)
         except Exception as e:
             self.log(f'Error getting firejail PIDs: {str(e)}', 'WARNING')
             return []
     
+    def _parse_firejail_list(self, output):
+        """PIDs from `firejail --list` output, skipping zombies and idle pool sandboxes"""
+        pids = []
+        for line in output.split('\n'):
+            match = re.match(r'^\s*(\d+):', line)
+            if match and not is_pool_sandbox(line):
+                pid = int(match.group(1))
+                if 'zombie' not in line.lower():
+                    pids.append(pid)
+        return pids
+    
     def log(self, message, level='INFO'):
         """Log message both to file and callback"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -413,102 +442,58 @@ class FirejailHandler:
         
         self._log_to_runtime(message, level)
     
-    def get_app_name(self, path):
-        """Determine application name from path - ENHANCED VERSION"""
-        
-        # ADDED: Check for Python scripts first
-        if self._is_python_script(path):
-            basename = os.path.basename(path)
-            return f'Python Script ({basename})'
-        
-        # ADDED: Check for shell scripts
-        if self._is_shell_script(path):
-            basename = os.path.basename(path)
-            return f'Shell Script ({basename})'
-        
-        if not '/' in path and not os.path.exists(path):
-            return path.capitalize()
-        
-        if os.path.isdir(path):
-            return f'File Manager ({os.path.basename(path)})'
-        
-        if os.path.isfile(path) and os.access(path, os.X_OK):
-            return os.path.basename(path)
-        
-        basename = os.path.basename(path)
-        _, ext = os.path.splitext(path)
-        
-        ext_map = {
-            '.pdf': f'PDF ({basename})',
-            '.txt': f'Text ({basename})',
-            '.html': f'Browser ({basename})',
-            '.htm': f'Browser ({basename})',
-            '.mp4': f'Video ({basename})',
-            '.avi': f'Video ({basename})',
-            '.mkv': f'Video ({basename})',
-            '.webm': f'Video ({basename})',
-            '.mp3': f'Audio ({basename})',
-            '.wav': f'Audio ({basename})',
-            '.flac': f'Audio ({basename})',
-            '.jpg': f'Image ({basename})',
-            '.jpeg': f'Image ({basename})',
-            '.png': f'Image ({basename})',
-            '.gif': f'Image ({basename})',
-            '.bmp': f'Image ({basename})',
-            '.webp': f'Image ({basename})',
-            '.svg': f'Image ({basename})',
-            '.doc': f'Document ({basename})',
-            '.docx': f'Document ({basename})',
-            '.odt': f'Document ({basename})',
-            '.xls': f'Spreadsheet ({basename})',
-            '.xlsx': f'Spreadsheet ({basename})',
-            '.ods': f'Spreadsheet ({basename})',
-            '.ppt': f'Presentation ({basename})',
-            '.pptx': f'Presentation ({basename})',
-            '.odp': f'Presentation ({basename})',
-        }
-        
-        return ext_map.get(ext.lower(), f'File ({basename})')
+    def get_app_name(self, path, classification=None):
+        """Determine application name from path (see app_identity.py)"""
+        return self._identify(path, classification).name
+    
+    def _identify(self, path, classification=None):
+        """Identity of what a launch of path runs"""
+        classification = classification or self.classify(path)
+        return self.identifier.for_launch(path, classification, self._launch_program(path, classification))
+    
+    def _launch_program(self, path, classification):
+        """The program a launch of path runs (what _build_launch_tail starts)"""
+        if classification.is_file and classification.is_script:
+            return classification.interpreter_command()[0]
+        if classification.is_file and classification.is_libreoffice:
+            return self._get_libreoffice_command(path)
+        if classification.is_dir or (classification.is_file and not classification.is_executable):
+            handler = self._mime_handler(classification)
+            return handler.executable if handler else 'xdg-open'
+        return os.path.basename(path)
     
-    def _is_libreoffice_file(self, path):
+    def _is_libreoffice_file(self, path, classification=None):
         """Check if the file should be opened with LibreOffice"""
-        if not os.path.isfile(path):
-            return False
-        ext = os.path.splitext(path)[1].lower()
-        return ext in self.libreoffice_extensions
+        classification = classification or self.classify(path)
+        return classification.is_libreoffice
     
     def _get_libreoffice_command(self, file_path):
         """Get the appropriate LibreOffice command for a file"""
         ext = os.path.splitext(file_path)[1].lower()
-        
-        if ext in ['.odt', '.doc', '.docx', '.rtf', '.txt']:
-            return 'lowriter'
-        elif ext in ['.ods', '.xls', '.xlsx']:
-            return 'localc'
-        elif ext in ['.odp', '.ppt', '.pptx']:
-            return 'loimpress'
-        elif ext in ['.odg']:
-            return 'lodraw'
-        elif ext in ['.odf']:
-            return 'lomath'
-        elif ext in ['.odb']:
-            return 'lobase'
-        else:
-            return 'libreoffice'
+        return LIBREOFFICE_COMMANDS.get(ext, 'libreoffice')
     
-    def _requires_dbus(self, path):
+    def _mime_handler(self, classification):
+        """
+        App that opens a file or directory that is not launched itself
+        Returns: mime_resolver.DesktopHandler or None (xdg-open decides)
+        """
+        if self.mime_resolver is None:
+            return None
+        if classification.is_dir:
+            return self.mime_resolver.resolve('inode/directory')
+        if (not classification.is_file or classification.is_script
+                or classification.is_libreoffice or classification.is_executable):
+            return None
+        return self.mime_resolver.resolve(classification.mime)
+    
+    def _requires_dbus(self, path, classification=None):
         """Check if the application requires D-Bus to function properly"""
-        # Check if it's a LibreOffice file
-        if os.path.isfile(path) and self._is_libreoffice_file(path):
-            return True
-        
-        # Check app name against D-Bus required apps
-        app_name = os.path.basename(path).lower()
-        for dbus_app in self.dbus_required_apps:
-            if dbus_app in app_name:
-                return True
-        
-        return False
+        return 'dbus' in self._app_needs(path, classification)
+    
+    def _app_needs(self, path, classification=None):
+        """Capabilities ('dbus', 'sound', 'video', 'network') of the app a launch runs"""
+        identity = self._identify(path, classification)
+        return self.capabilities.needs(identity.program, identity.needs)
     
     def _create_firefox_profile(self, instance_id):
         """Create a unique Firefox profile for this instance"""
@@ -538,31 +523,46 @@ class FirejailHandler:
         
         return profile_path, profile_name
     
+    def _log_policy_restrictions(self, sandbox_logger, policy):
+        """Note policy restrictions at the start of a sandbox log"""
+        if policy == 'restrictive':
+            sandbox_logger.log_event('restricted', 'Network access blocked by policy')
+            sandbox_logger.log_event('info', 'Application is running in restricted mode')
+    
+    def _check_network_activity(self, pid, sandbox_logger, ss_output):
+        """Log a network event if `ss -tunp` output mentions the sandbox"""
+        if str(pid) in ss_output:
+            sandbox_logger.log_event('network', 'Network connection established')
+    
     def _monitor_sandbox_activity(self, pid, sandbox_logger, policy):
         """Monitor sandbox for specific activities"""
         def monitor():
             try:
                 # Monitor network attempts
-                if policy == 'restrictive':
-                    sandbox_logger.log_event('restricted', 'Network access blocked by policy')
-                    sandbox_logger.log_event('info', 'Application is running in restricted mode')
+                self._log_policy_restrictions(sandbox_logger, policy)
                 
                 # Monitor process status
                 while self._is_firejail_pid(pid):
+                    tick = time.monotonic()
                     time.sleep(2)
+                    METRICS.observe('monitor.loop_lag', time.monotonic() - tick - 2)
+                    
+                    # Report resource limit hits as they happen
+                    self._report_limit_hits(self.registry.get(pid))
+                    self._enforce_tmpfs_budget(pid)
                     
                     # Check for network activity (if allowed)
                     if policy != 'restrictive':
                         try:
-                            net_result = subprocess.run(
-                                ['ss', '-tunp'],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True,
-                                timeout=2
-                            )
-                            if str(pid) in net_result.stdout:
-                                sandbox_logger.log_event('network', 'Network connection established')
+                            with METRICS.timer('subprocess.ss'):
+                                net_result = subprocess.run(
+                                    ['ss', '-tunp'],
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    text=True,
+                                    timeout=2
+                                )
+                            self._check_network_activity(pid, sandbox_logger, net_result.stdout)
                         except:
                             pass
             
@@ -571,198 +571,157 @@ class FirejailHandler:
         
         thread = threading.Thread(target=monitor, daemon=True)
         thread.start()
-    def build_firejail_command(self, path, policy='standard'):
-        """Build firejail command with security policy - CORRECTED VERSION"""
-        cmd = ['firejail']
-        
-        # CRITICAL: Disable default firejail profiles that may block network
-        cmd.append('--noprofile')
-        
-        # D-Bus configuration
-        needs_dbus = self._requires_dbus(path)
-        if needs_dbus:
-            cmd.append('--dbus-user=filter')
-            cmd.append('--dbus-system=none')
+    
+    @METRICS.timed('launch.build')
+    def build_firejail_command(self, path, policy='standard', classification=None, resources=None,
+                               private_home=None):
+        """
+        Build firejail command with security policy
+        The policy part comes from a pre-compiled template (see policy_compiler.py);
+        only the app-specific tail is built per launch
+        resources: optional per-launch overrides of the policy's resource ceilings
+        private_home: optional directory mounted as the sandbox's home (--private=);
+                      policies with 'home': 'tmpfs' get a RAM-backed home instead
+        """
+        classification = classification or self.classify(path)
+        
+        # The app's capabilities select the template variant
+        needs = self._app_needs(path, classification)
+        compiled = self.policy_compiler.get(policy, needs)
+        if 'dbus' in needs:
             self.log(f'Using filtered D-Bus (app requires it)', 'INFO')
         else:
-            cmd.append('--dbus-user=none')
-            cmd.append('--dbus-system=none')
             self.log(f'Blocking D-Bus (app does not require it)', 'INFO')
+        self.log(f'Policy: {policy.capitalize()} ({compiled.summary})', 'INFO')
         
-        # Network policy: ONLY restrictive blocks network
-        if policy == 'restrictive':
-            cmd.extend([
-                '--net=none',
-                '--nosound',
-                '--novideo',
-            ])
-            self.log('Policy: Restrictive (network, sound, video blocked)', 'INFO')
-        
-        elif policy == 'standard':
-            # Standard allows network - explicitly allow it
-            # No --net=none, and allow protocols
-            cmd.append('--protocol=unix,inet,inet6,netlink')
-            if not needs_dbus:
-                cmd.extend(['--nosound', '--novideo'])
-            self.log('Policy: Standard (network ALLOWED, basic restrictions)', 'INFO')
-        
-        elif policy == 'permissive':
-            # Permissive allows everything - explicitly allow network
-            cmd.append('--protocol=unix,inet,inet6,netlink')
-            self.log('Policy: Permissive (network ALLOWED, most access allowed)', 'INFO')
+        if private_home:
+            home_argv = [f'--private={private_home}']
+        elif compiled.home == 'tmpfs':
+            home_argv = self._tmpfs_home_flags(path, classification)
+        else:
+            home_argv = []
         
+        return compiled.command(self._build_launch_tail(path, classification), resources, home_argv)
+    
+    def _tmpfs_home_flags(self, path, classification):
+        """
+        Flags for a RAM-backed home; a file opened from the real home is
+        copied into it at the same path (--private-home takes home-relative paths)
+        """
+        if classification.is_file:
+            real_home = os.path.realpath(os.path.expanduser('~'))
+            target = os.path.realpath(path)
+            if os.path.commonpath([real_home, target]) == real_home and ',' not in target:
+                return [f'--private-home={os.path.relpath(target, real_home)}']
+            self.log('File is outside the home directory; opening it from its original location', 'INFO')
+        return ['--private']
+    
+    def _build_launch_tail(self, path, classification):
+        """Build the app-specific part of the command (what runs inside the sandbox)"""
         # FIXED: Determine how to launch the file
-        if os.path.isdir(path):
+        handler = self._mime_handler(classification)
+        if classification.is_dir:
             # Directory: open with file manager
-            cmd.extend(['xdg-open', path])
+            if handler is not None:
+                self.log(f'Opening directory with {handler.name} ({handler.desktop_id})', 'INFO')
+                return handler.command(path)
             self.log('Opening directory with file manager', 'INFO')
+            return ['xdg-open', path]
         
-        elif os.path.isfile(path):
+        if classification.is_file:
             # Check if it's a script that needs an interpreter
-            interpreter_cmd, is_script = self._get_script_interpreter(path)
+            interpreter_cmd, is_script = self._get_script_interpreter(path, classification)
             
             if is_script:
                 # FIXED: Launch script with explicit interpreter
-                cmd.extend(interpreter_cmd)
                 self.log(f'Launching script with interpreter: {interpreter_cmd[0]}', 'SUCCESS')
+                return interpreter_cmd
             
-            elif self._is_libreoffice_file(path):
+            if classification.is_libreoffice:
                 # LibreOffice documents
                 lo_command = self._get_libreoffice_command(path)
-                cmd.extend([lo_command, path])
                 self.log(f'Launching LibreOffice directly with {lo_command}', 'INFO')
+                return [lo_command, path]
             
-            elif os.access(path, os.X_OK):
+            if classification.is_executable:
                 # Executable file
-                cmd.append(path)
                 self.log('Launching executable directly', 'INFO')
+                return [path]
             
-            else:
-                # Other files: use default handler
-                cmd.extend(['xdg-open', path])
-                self.log('Opening file with default handler', 'INFO')
+            # Other files: the MIME type's default app, started directly
+            if handler is not None:
+                self.log(f'Opening file with {handler.name} ({handler.desktop_id})', 'INFO')
+                return handler.command(path)
+            self.log('Opening file with default handler', 'INFO')
+            return ['xdg-open', path]
+        
+        # Application command (not a file path)
+        app_binary = os.path.basename(path).lower()
+        tail = [path]
+        
+        # Special handling for Firefox
+        if 'firefox' in app_binary:
+            instance_id = str(uuid.uuid4())[:8]
+            profile_path, profile_name = self._create_firefox_profile(instance_id)
+            tail.extend([
+                '-P', profile_name,
+                '--new-instance',
+                '--no-remote'
+            ])
+            self.log(f'Firefox: Using unique profile {profile_name}', 'INFO')
         
-        else:
-            # Application command (not a file path)
-            app_binary = os.path.basename(path).lower()
-            cmd.append(path)
-            
-            # Special handling for Firefox
-            if 'firefox' in app_binary:
-                instance_id = str(uuid.uuid4())[:8]
-                profile_path, profile_name = self._create_firefox_profile(instance_id)
-                cmd.extend([
-                    '-P', profile_name,
-                    '--new-instance',
-                    '--no-remote'
-                ])
-                self.log(f'Firefox: Using unique profile {profile_name}', 'INFO')
-        
-        return cmd
-    
-    def launch_sandboxed(self, path, policy='standard'):
-        """Launch application in firejail sandbox"""
+        return tail
+    
+    @METRICS.timed('launch.total')
+    def launch_sandboxed(self, path, policy='standard', resources=None, ttl_minutes=None):
+        """
+        Launch application in firejail sandbox
+        resources: optional overrides of the policy's resource ceilings,
+                   e.g. {'memory_mb': 512, 'nice': None}
+        ttl_minutes: stop the sandbox this long after launch (None = the
+                     policy's ttl_minutes, 0 = no time limit)
+        """
+        result = self._launch_sandboxed(path, policy, resources, ttl_minutes)
+        outcome = 'success' if result[0] else 'failure'
+        METRICS.inc(f'launch.{outcome}')
+        METRICS.inc(f'launch.{outcome}.{policy}')
+        return result
+    
+    def _launch_sandboxed(self, path, policy, resources=None, ttl_minutes=None):
+        """Launch implementation; returns (success, pid, message)"""
         try:
-            sandbox_id = str(uuid.uuid4())[:8]
-            self.log(f'Preparing to launch: {path}', 'INFO')
-            self.log(f'Security policy: {policy}', 'INFO')
-            
-            # Handle file:// URLs and clean path
-            if path.startswith('file://'):
-                path = path.replace('file://', '')
-                import urllib.parse
-                path = urllib.parse.unquote(path)
-            
-            path = path.strip()
-            
-            if path.startswith('~'):
-                path = os.path.expanduser(path)
-            
-            if os.path.exists(path):
-                path = os.path.abspath(path)
-            
-            self.log(f'Resolved path: {path}', 'INFO')
-            
-            # Check if path exists
-            if not os.path.exists(path) and not self._is_executable(path):
-                error_msg = f'Path not found: {path}'
-                self.log(error_msg, 'ERROR')
-                return False, None, error_msg
-            
-            app_name = self.get_app_name(path)
-            self.log(f'Application: {app_name}', 'INFO')
-            
-            # Create sandbox logger
-            sandbox_logger = SandboxLogger(sandbox_id, app_name, policy)
-            sandbox_logger.log_event('startup', f'Initializing sandbox with {policy} policy')
-            
-            # Build firejail command
-            cmd = self.build_firejail_command(path, policy)
-            self.log(f'Command: {" ".join(cmd)}', 'INFO')
-            
-            # Check if firejail is installed
-            if not self._check_firejail_installed():
-                error_msg = 'Firejail is not installed'
-                self.log(error_msg, 'ERROR')
-                sandbox_logger.log_event('error', error_msg)
+            plan, error_msg = self._prepare_launch(path, policy, resources, ttl_minutes=ttl_minutes)
+            if plan is None:
                 return False, None, error_msg
             
+            sandbox_logger = plan['logger']
             try:
-                # Set up environment
-                env = os.environ.copy()
-                
-                # Determine working directory
-                if os.path.isfile(path):
-                    work_dir = os.path.dirname(path)
-                elif os.path.isdir(path):
-                    work_dir = path
-                else:
-                    work_dir = os.path.expanduser('~')
-                
-                sandbox_logger.log_event('launch', f'Starting application in {policy} sandbox')
-                
-                # Launch the process
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.DEVNULL,     # ← Discards all output
-                    stderr=subprocess.DEVNULL,     # ← Discards all errors
-                    start_new_session=True,
-                    env=env,
-                    cwd=work_dir
+                # Launch the process; its output goes to a bounded buffer
+                process = self._spawn(plan['cmd'], plan['env'], plan['work_dir'])
+                output = self.output_capture.attach(
+                    process.stdout,
+                    spill=sandbox_logger.write_output if OUTPUT_SPILL_TO_LOG and sandbox_logger else None
                 )
-
-                pid = process.pid
-
-
-                
-                # Track the sandbox
-                self.active_sandboxes[pid] = {
-                    'name': app_name,
-                    'path': path,
-                    'policy': policy,
-                    'timestamp': datetime.now(),
-                    'process': process,
-                    'sandbox_id': sandbox_id
-                }
-                
-                self.sandbox_loggers[pid] = sandbox_logger
-                sandbox_logger.log_event('success', f'Application started successfully (PID: {pid})')
                 
-                self.save_state()
+                if plan['join_pid']:
+                    # Opened in a running sandbox, which is already monitored
+                    threading.Thread(target=process.wait, daemon=True).start()
+                    return True, plan['join_pid'], self._register_join(plan, process)
                 
-                success_msg = f'Successfully launched {app_name} (PID: {pid}) in {policy} sandbox'
-                self.log(success_msg, 'SUCCESS')
+                success_msg = self._register_launch(plan, process, output)
                 
                 # Start monitoring
-                self._monitor_process(pid, app_name)
-                self._monitor_sandbox_activity(pid, sandbox_logger, policy)
+                self._monitor_process(process.pid, plan['app_name'])
+                self._monitor_sandbox_activity(process.pid, sandbox_logger, policy)
                 
-                return True, pid, success_msg
+                return True, process.pid, success_msg
             
             except Exception as e:
                 error_msg = f'Failed to launch process: {str(e)}'
                 self.log(error_msg, 'ERROR')
-                sandbox_logger.log_event('error', error_msg)
+                if sandbox_logger:
+                    sandbox_logger.log_event('error', error_msg)
+                self._abandon_launch(plan)
                 return False, None, error_msg
         
         except Exception as e:
@@ -772,55 +731,476 @@ class FirejailHandler:
             self.log(traceback.format_exc(), 'ERROR')
             return False, None, error_msg
     
+    def _prepare_launch(self, path, policy, resources=None, wait_for_reuse=True, ttl_minutes=None):
+        """
+        Everything before the spawn: resolve, classify, name, sandbox log, command
+        Shared by the blocking and asyncio launch paths; runs no subprocesses
+        wait_for_reuse: wait for a reusable sandbox that another launch is
+                        still starting (the asyncio path cannot block)
+        ttl_minutes: time limit of this launch (None = the policy's)
+        Returns: (plan dict, None) or (None, error message)
+        """
+        started = time.perf_counter()
+        sandbox_id = str(uuid.uuid4())[:8]
+        self.log(f'Preparing to launch: {path}', 'INFO')
+        self.log(f'Security policy: {policy}', 'INFO')
+        
+        path = self._resolve_path(path)
+        self.log(f'Resolved path: {path}', 'INFO')
+        
+        # Classify once; every later step reuses this result
+        classification = self.classify(path)
+        
+        # Check if path exists
+        if not classification.exists and not self._is_executable(path):
+            error_msg = f'Path not found: {path}'
+            self.log(error_msg, 'ERROR')
+            return None, error_msg
+        
+        identity = self._identify(path, classification)
+        app_name = identity.name
+        self.log(f'Application: {app_name}', 'INFO')
+        
+        compiled = self.policy_compiler.get(policy)
+        work_dir = self._work_dir(path, classification)
+        ttl = compiled.ttl if ttl_minutes is None else float(ttl_minutes) * 60
+        deadline = time.time() + ttl if ttl > 0 else 0.0
+        
+        # Reuse: open the file in a running sandbox of the same policy and handler app
+        # (a launch with its own time limit gets a sandbox of its own)
+        affinity = None
+        if compiled.reuse and self.reuse_sandboxes and not resources and ttl_minutes is None:
+            affinity = self._affinity_key(path, classification)
+        if affinity:
+            target = self._reusable_sandbox(policy, affinity, wait_for_reuse)
+            if target is not None:
+                plan = self._prepare_join_launch(target, path, policy, classification)
+                plan.update(app_name=app_name, work_dir=work_dir, started=started)
+                return plan, None
+        
+        # Create sandbox logger
+        sandbox_logger = SandboxLogger(sandbox_id, app_name, policy)
+        sandbox_logger.log_event('startup', f'Initializing sandbox with {policy} policy')
+        
+        # Check if firejail is installed
+        if not self._check_firejail_installed():
+            error_msg = 'Firejail is not installed'
+            self.log(error_msg, 'ERROR')
+            sandbox_logger.log_event('error', error_msg)
+            self._affinity_settled(policy, affinity)
+            return None, error_msg
+        
+        # Warm pool: join an idle pre-started sandbox (its policy and limits
+        # are fixed, so launches with resource overrides start their own)
+        if self.pool is not None and not resources and compiled.home != 'tmpfs':
+            member = self.pool.take(policy, self._app_needs(path, classification))
+            if member is not None:
+                plan = self._prepare_pooled_launch(member, path, policy, classification, sandbox_logger)
+                plan.update(sandbox_id=sandbox_id, app_name=app_name, app=identity.app,
+                            work_dir=work_dir, affinity=affinity, deadline=deadline, started=started)
+                return plan, None
+        
+        # Throwaway private home from a template
+        home = None
+        if compiled.home == 'template':
+            home, error_msg = self._prepare_private_home(sandbox_id, path, classification, compiled, sandbox_logger)
+            if home is None:
+                self._affinity_settled(policy, affinity)
+                return None, error_msg
+        
+        # Build firejail command
+        cmd = self.build_firejail_command(path, policy, classification, resources, home)
+        
+        # Resource ceilings: rlimits are in cmd; memory/pids/CPU need a cgroup
+        limits = compiled.merged_resources(resources)
+        usage = None
+        if compiled.home == 'tmpfs':
+            usage = TmpfsUsage(limits.get('tmpfs_mb'), compiled.tmpfs_action)
+        cgroup = None
+        if self.cgroups is not None and self.cgroups.available:
+            cgroup = self.cgroups.create(sandbox_id, limits)
+        if cgroup is not None:
+            cmd = cgroup.wrap(cmd)
+            enforcement = f'cgroup {cgroup.path}'
+        elif any(limits.get(key) for key in ('memory_mb', 'max_pids', 'cpu_percent')):
+            enforcement = 'no delegated cgroup v2: memory/pids/CPU ceilings not enforced'
+        else:
+            enforcement = None
+        sandbox_logger.log_event('limits', f'Resource limits: {describe_resources(limits)}', enforcement)
+        self.log(f'Command: {" ".join(cmd)}', 'INFO')
+        
+        sandbox_logger.log_event('launch', f'Starting application in {policy} sandbox')
+        
+        return {
+            'path': path,
+            'policy': policy,
+            'sandbox_id': sandbox_id,
+            'app_name': app_name,
+            'app': identity.app,
+            'logger': sandbox_logger,
+            'cmd': cmd,
+            'env': os.environ.copy(),
+            'work_dir': work_dir,
+            'cgroup': cgroup,
+            'home': home,
+            'usage': usage,
+            'pool_pid': 0,
+            'join_pid': 0,
+            'affinity': affinity,
+            'deadline': deadline,
+            'started': started,
+        }, None
+    
+    def _work_dir(self, path, classification):
+        """Working directory for a launch"""
+        if classification.is_file:
+            return os.path.dirname(path)
+        if classification.is_dir:
+            return path
+        return os.path.expanduser('~')
+    
+    def _prepare_pooled_launch(self, member, path, policy, classification, sandbox_logger):
+        """
+        Plan for running the app inside a warm pool sandbox with --join
+        The pool sandbox's home and cgroup become the launch's
+        """
+        if member.home and classification.is_file:
+            try:
+                self.home_templates.stage_file(member.home, path)
+            except OSError as e:
+                self.log(f'Could not copy {os.path.basename(path)} into pooled home: {str(e)}', 'WARNING')
+        
+        cmd = ['firejail', f'--join={member.name}', *self._build_launch_tail(path, classification)]
+        if member.cgroup is not None:
+            cmd = member.cgroup.wrap(cmd)
+        
+        waited = time.monotonic() - member.started
+        self.log(f'Joining warm pool sandbox {member.name} (PID: {member.pid})', 'INFO')
+        self.log(f'Command: {" ".join(cmd)}', 'INFO')
+        sandbox_logger.log_event(
+            'pool',
+            f'Using pre-started {policy} sandbox (PID: {member.pid}, started {waited:.0f}s ago)',
+            member.home or None
+        )
+        sandbox_logger.log_event('launch', f'Starting application in {policy} sandbox')
+        return {
+            'path': path,
+            'policy': policy,
+            'logger': sandbox_logger,
+            'cmd': cmd,
+            'env': os.environ.copy(),
+            'cgroup': member.cgroup,
+            'home': member.home or None,
+            'usage': None,
+            'pool_pid': member.pid,
+            'join_pid': 0,
+        }
+    
+    def _affinity_key(self, path, classification):
+        """
+        What decides the app a file opens with, or None if it is not reusable
+        LibreOffice documents share one instance (a second soffice call hands
+        the file to the running one); other files share their MIME handler
+        """
+        if not classification.is_file or classification.is_script:
+            return None
+        if classification.is_libreoffice:
+            return 'libreoffice'
+        if classification.is_executable or not classification.mime:
+            return None
+        handler = self._mime_handler(classification)
+        if handler is not None:
+            return f'app:{handler.desktop_id}'
+        return f'mime:{classification.mime}'
+    
+    def _find_reusable(self, policy, affinity):
+        """Oldest running sandbox of this policy and handler app with room for another file"""
+        candidates = [
+            record for record in self.registry.snapshot().values()
+            if record.policy == policy and record.affinity == affinity
+            and len(record.files) < SANDBOX_REUSE_MAX_FILES
+            and self._is_sandbox_running(record)
+        ]
+        return min(candidates, key=lambda r: r.timestamp) if candidates else None
+    
+    def _reusable_sandbox(self, policy, affinity, wait=True):
+        """
+        Running sandbox to open a file in; when none exists, the first caller
+        starts one and concurrent callers wait for it
+        Returns: SandboxRecord or None (start a new sandbox)
+        """
+        key = (policy, affinity)
+        with self._affinity_lock:
+            target = self._find_reusable(policy, affinity)
+            if target is not None:
+                return target
+            pending = self._affinity_pending.get(key)
+            if pending is None or time.monotonic() - pending[0] > SANDBOX_REUSE_WAIT_SECONDS:
+                # This launch starts the sandbox
+                self._affinity_pending[key] = (time.monotonic(), threading.Event())
+                return None
+        if not wait:
+            return None
+        pending[1].wait(SANDBOX_REUSE_WAIT_SECONDS)
+        return self._find_reusable(policy, affinity)
+    
+    def _affinity_settled(self, policy, affinity):
+        """The sandbox for (policy, affinity) started or failed; let waiting launches go on"""
+        if not affinity:
+            return
+        with self._affinity_lock:
+            pending = self._affinity_pending.pop((policy, affinity), None)
+        if pending is not None:
+            pending[1].set()
+    
+    def _prepare_join_launch(self, target, path, policy, classification):
+        """Plan for opening a file inside a running sandbox with --join"""
+        if target.home and classification.is_file:
+            try:
+                self.home_templates.stage_file(target.home, path)
+            except OSError as e:
+                self.log(f'Could not copy {os.path.basename(path)} into private home: {str(e)}', 'WARNING')
+        
+        cmd = ['firejail', f'--join={target.pool_pid or target.pid}', *self._build_launch_tail(path, classification)]
+        if target.cgroup is not None:
+            cmd = target.cgroup.wrap(cmd)
+        
+        self.log(f'Reusing {target.name} sandbox (PID: {target.pid}) with {len(target.files)} file(s)', 'INFO')
+        self.log(f'Command: {" ".join(cmd)}', 'INFO')
+        return {
+            'path': path,
+            'policy': policy,
+            'logger': target.logger,
+            'cmd': cmd,
+            'env': os.environ.copy(),
+            'cgroup': None,
+            'home': None,
+            'usage': None,
+            'pool_pid': 0,
+            'join_pid': target.pid,
+            'affinity': None,
+        }
+    
+    def _prepare_private_home(self, sandbox_id, path, classification, compiled, sandbox_logger):
+        """
+        Materialize a private home for a sandbox and copy the target file into it
+        Returns: (home path, None) or (None, error message)
+        """
+        # Template lookup: explicit, app, policy, default
+        if classification.is_libreoffice:
+            app_key = 'libreoffice'
+        elif not classification.exists:
+            app_key = os.path.basename(path).lower()
+        else:
+            app_key = None
+        names = [compiled.home_template, app_key, compiled.name, 'default']
+        
+        try:
+            home, template = self.home_templates.materialize(sandbox_id, names)
+            # Files from the real home are not visible in a private one
+            staged = classification.is_file and self.home_templates.stage_file(home, path)
+        except Exception as e:
+            error_msg = f'Could not create private home: {str(e)}'
+            self.log(error_msg, 'ERROR')
+            sandbox_logger.log_event('error', error_msg)
+            return None, error_msg
+        
+        self.log(f'Private home from template {template}: {home}', 'INFO')
+        details = f'{home} (copy of {os.path.basename(path)} staged; changes are discarded)' if staged else home
+        sandbox_logger.log_event('home', f'Throwaway private home from template "{template}"', details)
+        return home, None
+    
+    def _abandon_launch(self, plan):
+        """Release what _prepare_launch set up for a launch that did not start"""
+        self._affinity_settled(plan['policy'], plan['affinity'])
+        if plan['join_pid']:
+            return
+        if plan['pool_pid']:
+            self._release_pool_sandbox(plan['pool_pid'])
+            return
+        if plan['cgroup'] is not None:
+            plan['cgroup'].remove()
+        if plan['home']:
+            self.home_templates.discard(plan['home'])
+    
+    def _register_launch(self, plan, process, output, save=True):
+        """
+        Track a freshly spawned sandbox
+        Returns: success message
+        """
+        pid = process.pid
+        with self._exit_cond:
+            self._exits.pop(pid, None)     # an earlier sandbox with this pid
+        self._launched.add(pid)
+        self.registry.add(SandboxRecord(
+            pid=pid,
+            name=plan['app_name'],
+            app=plan['app'],
+            path=plan['path'],
+            policy=plan['policy'],
+            sandbox_id=plan['sandbox_id'],
+            home=plan['home'] or '',
+            tmpfs_mb=plan['usage'].budget_bytes // (1024 * 1024) if plan['usage'] else 0,
+            tmpfs_action=plan['usage'].action if plan['usage'] else '',
+            pool_pid=plan['pool_pid'],
+            affinity=plan['affinity'] or '',
+            files=(plan['path'],),
+            deadline=plan['deadline'],
+            process=process,
+            logger=plan['logger'],
+            output=output,
+            cgroup=plan['cgroup'],
+            usage=plan['usage'],
+        ), replace_existing=True)
+        self._affinity_settled(plan['policy'], plan['affinity'])
+        plan['logger'].log_event('success', f'Application started successfully (PID: {pid})')
+        if plan['deadline']:
+            expires = datetime.fromtimestamp(plan['deadline']).strftime('%H:%M:%S')
+            plan['logger'].log_event('ttl', f'Sandbox will be stopped at {expires}')
+        METRICS.observe('launch.pooled' if plan['pool_pid'] else 'launch.cold', time.perf_counter() - plan['started'])
+        
+        if save:
+            self.save_state()
+        
+        success_msg = f'Successfully launched {plan["app_name"]} (PID: {pid}) in {plan["policy"]} sandbox'
+        self.log(success_msg, 'SUCCESS')
+        return success_msg
+    
+    def _register_join(self, plan, process, save=True):
+        """
+        Add a file opened with --join to its sandbox's record
+        Returns: success message
+        """
+        pid = plan['join_pid']
+        name = os.path.basename(plan['path'])
+        with self._affinity_lock:
+            record = self.registry.get(pid)
+            if record is not None:
+                record = self.registry.update(pid, files=record.files + (plan['path'],)) or record
+        if plan['logger']:
+            plan['logger'].log_event('reuse', f'Opened {name} in this sandbox (PID: {process.pid})', plan['path'])
+        METRICS.observe('launch.joined', time.perf_counter() - plan['started'])
+        
+        if save:
+            self.save_state()
+        
+        holder = f'{record.name}, {len(record.files)} files' if record is not None else 'exited'
+        success_msg = f'Opened {name} in running {plan["policy"]} sandbox PID {pid} ({holder})'
+        self.log(success_msg, 'SUCCESS')
+        return success_msg
+    
+    @METRICS.timed('launch.resolve')
+    def _resolve_path(self, path):
+        """Normalize a launch target: file:// URLs, whitespace, ~ and relative paths"""
+        # Handle file:// URLs and clean path
+        if path.startswith('file://'):
+            path = path.replace('file://', '')
+            import urllib.parse
+            path = urllib.parse.unquote(path)
+        
+        path = path.strip()
+        
+        if path.startswith('~'):
+            path = os.path.expanduser(path)
+        
+        if os.path.exists(path):
+            path = os.path.abspath(path)
+        
+        return path
+    
+    @METRICS.timed('launch.spawn')
+    def _spawn(self, cmd, env, work_dir):
+        """Start the firejail process"""
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,        # read by output_capture
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            env=env,
+            cwd=work_dir
+        )
+    
+    def launch_many(self, paths, policy='standard', max_parallel=4, progress_callback=None, resources=None,
+                    ttl_minutes=None):
+        """
+        Launch several files/applications concurrently in separate sandboxes
+        
+        Args:
+            paths: Iterable of paths or application commands
+            policy: Security policy applied to every launch
+            max_parallel: Maximum number of launches in flight
+            progress_callback: Optional function(path, success, pid, message)
+            resources: Optional resource overrides applied to every launch
+            ttl_minutes: Optional time limit of every launch (see launch_sandboxed)
+        
+        Returns:
+            List of (path, success, pid, message) in input order
+        """
+        paths = list(paths)
+        if not paths:
+            return []
+        
+        def launch_one(path):
+            success, pid, message = self.launch_sandboxed(path, policy, resources, ttl_minutes)
+            if progress_callback:
+                progress_callback(path, success, pid, message)
+            return (path, success, pid, message)
+        
+        self.log(f'Launching {len(paths)} item(s) with up to {max_parallel} in parallel', 'INFO')
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(paths)))) as pool:
+            return list(pool.map(launch_one, paths))
+    
+    @METRICS.timed('launch.which')
     def _check_firejail_installed(self):
         """Check if firejail is installed"""
-        try:
-            result = subprocess.run(
-                ['which', 'firejail'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=5
-            )
-            return result.returncode == 0
-        except:
-            return False
+        return shutil.which('firejail') is not None
     
+    @METRICS.timed('launch.which')
     def _is_executable(self, path):
         """Check if path is an executable in PATH"""
         try:
-            result = subprocess.run(
-                ['which', path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=5
-            )
-            return result.returncode == 0
+            return shutil.which(path) is not None
         except:
             return False
     
-    def kill_sandbox(self, pid):
+    @METRICS.timed('kill.duration')
+    def kill_sandbox(self, pid, reason='by user'):
         """Kill a sandboxed process"""
         try:
-            if pid not in self.active_sandboxes:
+            record = self.registry.get(pid)
+            if record is None:
                 if self._is_process_running(pid):
                     app_name = f"Process {pid}"
                 else:
                     return False, f'Process {pid} not found'
             else:
-                app_name = self.active_sandboxes[pid]['name']
+                app_name = record.name
+            
+            # The exit handler records the session as killed
+            if record is not None:
+                self._killed.add(pid)
             
             # Log termination
-            if pid in self.sandbox_loggers:
-                self.sandbox_loggers[pid].log_event('shutdown', 'Sandbox terminated by user')
+            if record is not None and record.logger:
+                record.logger.log_event('shutdown', f'Sandbox terminated {reason}')
+            
+            # Stopped processes only act on SIGTERM once they run again
+            if record is not None and record.frozen:
+                self._set_frozen(record, False)
             
+            METRICS.inc('kill.count')
             try:
                 # Try graceful shutdown first
-                subprocess.run(
-                    ['firejail', '--shutdown', str(pid)],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    timeout=5
-                )
+                # A pooled app is stopped with the pool sandbox it joined
+                target = record.pool_pid if record is not None and record.pool_pid else pid
+                with METRICS.timer('subprocess.firejail_shutdown'):
+                    subprocess.run(
+                        ['firejail', '--shutdown', str(target)],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        timeout=5
+                    )
                 self.log(f'Sent shutdown to {app_name} (PID: {pid})', 'INFO')
                 
                 time.sleep(0.5)
@@ -830,34 +1210,70 @@ class FirejailHandler:
                     os.kill(pid, signal.SIGKILL)
                     self.log(f'Sent SIGKILL to {app_name} (PID: {pid})', 'INFO')
                 
+                # Also kill anything that escaped the firejail process tree
+                if record is not None and record.cgroup is not None:
+                    record.cgroup.kill()
+                
                 # Clean up tracking
-                if pid in self.active_sandboxes:
-                    del self.active_sandboxes[pid]
-                if pid in self.sandbox_loggers:
-                    del self.sandbox_loggers[pid]
+                self.registry.remove(pid)
                 
                 self.save_state()
                 return True, f'Terminated {app_name} (PID: {pid})'
             
             except ProcessLookupError:
                 # Already dead
-                if pid in self.active_sandboxes:
-                    del self.active_sandboxes[pid]
-                if pid in self.sandbox_loggers:
-                    del self.sandbox_loggers[pid]
+                self.registry.remove(pid)
                 self.save_state()
                 return True, f'Process {pid} already terminated'
             
         except Exception as e:
+            self._killed.discard(pid)
             return False, f'Failed to kill: {str(e)}'
     
+    def watches(self, pid):
+        """True if this process enforces the limits of a tracked sandbox"""
+        return self.adopt or pid in self._launched
+    
+    def _on_registry_change(self, change):
+        """Schedule time limits of the sandboxes this process watches"""
+        if change.kind == 'removed' or self.watches(change.pid):
+            self.ttl.on_registry_change(change)
+    
+    def launched_count(self):
+        """
+        Sandboxes this handler launched that are still tracked; ones adopted
+        from the state file or discovered running are not counted
+        """
+        return sum(1 for pid in tuple(self._launched) if pid in self.registry)
+    
+    def has_enforced_limits(self, pid):
+        """
+        True if this process enforces limits of a sandbox that the kernel does
+        not: a time limit, a RAM budget, or watchdog rules
+        """
+        record = self.registry.get(pid)
+        if record is None:
+            return False
+        return bool(record.deadline or record.tmpfs_mb) or self.watchdog.enforces(record.policy)
+    
+    def _sandbox_expired(self, pid):
+        """TTL scheduler callback: stop a sandbox whose time limit has passed"""
+        record = self.registry.get(pid)
+        if record is None:
+            return
+        self.log(f'Time limit reached: {record.name} (PID: {pid})', 'INFO')
+        METRICS.inc('ttl.expired')
+        # Graceful shutdown takes a while; keep the scheduler free for other deadlines
+        threading.Thread(target=self.kill_sandbox, args=(pid, 'after its time limit'), daemon=True).start()
+    
     def get_sandbox_log(self, pid):
         """Get formatted log for a specific sandbox"""
-        if pid in self.sandbox_loggers:
-            return self.sandbox_loggers[pid].get_formatted_log()
+        record = self.registry.get(pid)
+        if record is not None and record.logger:
+            return record.logger.get_formatted_log()
         else:
             # Try to load from file
-            sandbox_id = self.active_sandboxes.get(pid, {}).get('sandbox_id', '')
+            sandbox_id = record.sandbox_id if record is not None else ''
             log_file = os.path.expanduser(f'~/InvisVM/logs/sandbox_{sandbox_id}.log')
             if os.path.exists(log_file):
                 with open(log_file, 'r') as f:
@@ -865,6 +1281,32 @@ class FirejailHandler:
         
         return "No log available for this sandbox."
     
+    def get_sandbox_output(self, pid):
+        """
+        Get the live output buffer of a sandbox launched by this process
+        Returns: OutputBuffer (stays readable after exit) or None
+        """
+        record = self.registry.get(pid)
+        return record.output if record is not None else None
+    
+    def get_metrics(self):
+        """
+        Get timing histograms and counters for handler operations
+        Returns: dict of metric name -> snapshot (durations in seconds)
+        """
+        return METRICS.snapshot()
+    
+    def get_session_stats(self, since=None, until=None, by=('app', 'policy')):
+        """
+        Launch counts, median runtime, failure rate etc. of ended sandboxes
+        per app and/or policy (see SessionHistory.stats)
+        """
+        return self.history.stats(since, until, by)
+    
+    def get_sessions(self, since=None, until=None, app=None, policy=None, limit=100):
+        """Most recent ended sandboxes, newest first"""
+        return self.history.sessions(since, until, app, policy, limit)
+    
     def get_runtime_log(self):
         """Get current runtime log"""
         if os.path.exists(self.runtime_log_file):
@@ -878,51 +1320,309 @@ class FirejailHandler:
         
         def monitor():
             try:
-                if pid not in self.active_sandboxes:
+                record = self.registry.get(pid)
+                if record is None:
                     return
                 
-                process = self.active_sandboxes[pid].get('process')
+                process = record.process
+                summary = None
                 
                 if process:
-                    process.wait()
-                    try:
-                        process.communicate(timeout=1)
-                    except:
-                        pass
+                    summary = self._reap(process)
+                    # Let the I/O loop drain what is left in the pipe
+                    if record.output is not None:
+                        record.output.wait_closed(timeout=1)
                 else:
                     # No process object, poll PID
                     while self._is_firejail_pid(pid):
+                        tick = time.monotonic()
                         time.sleep(1)
+                        METRICS.observe('monitor.loop_lag', time.monotonic() - tick - 1)
+                        self._enforce_tmpfs_budget(pid)
+                
+                # An app opened in a pool sandbox can outlive the join process
+                while record.pool_pid and sandbox_in_use(record.pool_pid, record.cgroup):
+                    time.sleep(1)
                 
                 # Process ended
-                if pid in self.active_sandboxes:
-                    timestamp = self.active_sandboxes[pid]['timestamp']
-                    elapsed = (datetime.now() - timestamp).total_seconds()
-                    msg = f'Application closed: {app_name} (ran for {elapsed:.1f}s)'
-                    self.log(msg, 'INFO')
-                    
-                    if pid in self.sandbox_loggers:
-                        self.sandbox_loggers[pid].log_event('shutdown', f'Application closed after {elapsed:.1f}s')
-                    
-                    del self.active_sandboxes[pid]
-                    if pid in self.sandbox_loggers:
-                        del self.sandbox_loggers[pid]
-                    self.save_state()
+                self._handle_sandbox_exit(pid, app_name, record=record, summary=summary)
             
             except Exception as e:
                 self.log(f'Error monitoring process: {str(e)}', 'ERROR')
-                if pid in self.active_sandboxes:
-                    del self.active_sandboxes[pid]
+                self.registry.remove(pid)
                 self.save_state()
         
         thread = threading.Thread(target=monitor, daemon=True)
         thread.start()
     
-    def reload_state_from_disk(self):
+    def _reap(self, process):
+        """
+        Wait for a launched sandbox with os.wait4 for its resource usage
+        Returns: resource_summary dict, or None if it was reaped elsewhere
+        """
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            process.wait()
+            return None
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return resource_summary.from_rusage(status, rusage)
+    
+    def _handle_sandbox_exit(self, pid, app_name, save=True, record=None, summary=None, returncode=None):
+        """
+        Untrack a sandbox whose process has ended and write its final log entries
+        Does nothing if a kill (or discovery) already removed it, except
+        releasing the pool sandbox, cgroup and private home of `record` (the
+        record as seen at launch) and recording its session
+        summary: resource_summary from wait4; without one, the watchdog's
+                 last /proc sample and returncode (if known) are used
+        Returns: the removed record or None
+        """
+        if summary is None:
+            summary = resource_summary.from_sample(self.watchdog.last_sample(pid), returncode)
+        removed = self.registry.remove(pid)
+        killed = pid in self._killed
+        self._killed.discard(pid)
+        self._launched.discard(pid)
+        with self._exit_cond:
+            self._exits[pid] = summary
+            if len(self._exits) > EXITS_KEPT:
+                self._exits.popitem(last=False)
+            self._exit_cond.notify_all()
+        launched = removed or record
+        if launched is not None and launched.pool_pid:
+            # The pool owns its sandboxes' cgroups and homes
+            self._report_limit_hits(launched)
+            self._release_pool_sandbox(launched.pool_pid)
+        else:
+            self._release_cgroup(launched)
+            self._release_home(launched)
+        if removed is None:
+            if record is not None:
+                self._record_session(record, summary, killed)
+            return None
+        record = replace(removed, summary=summary)
+        
+        elapsed = (datetime.now() - record.timestamp).total_seconds()
+        described = resource_summary.describe(summary)
+        self.log(f'Application closed: {app_name} (ran for {elapsed:.1f}s; {described})', 'INFO')
+        self._record_session(record, summary, killed)
+        
+        if record.logger:
+            record.logger.log_event('shutdown', f'Application closed after {elapsed:.1f}s')
+            record.logger.log_event('summary', described)
+            if record.output is not None and record.output.total_bytes:
+                record.logger.log_event(
+                    'output',
+                    f'Captured {record.output.summary()}',
+                    record.output.tail(OUTPUT_TAIL_IN_LOG)
+                )
+        
+        if save:
+            self.save_state()
+        return record
+    
+    def wait_exit(self, pid, timeout=None):
+        """
+        Wait until this handler has handled the exit of a sandbox it watches
+        (its monitor reaps launched sandboxes; don't wait for them elsewhere)
+        Returns: the exit summary (see resource_summary.py), or None on timeout
+        """
+        with self._exit_cond:
+            if self._exit_cond.wait_for(lambda: pid in self._exits, timeout):
+                return self._exits[pid]
+        return None
+    
+    def _record_session(self, record, summary, killed=False):
+        """Add an ended sandbox to the session history (see session_history.py)"""
+        ended = datetime.now()
+        network_events = 0
+        if record.logger:
+            network_events = sum(1 for event in record.logger.events if event['type'] == 'network')
+        session = {
+            'sandbox_id': record.sandbox_id or None,
+            'pid': record.pid,
+            'app': record.app or record.name,
+            'name': record.name,
+            'path': record.path,
+            'policy': record.policy,
+            'started': record.timestamp,
+            'ended': ended,
+            'runtime': (ended - record.timestamp).total_seconds(),
+            'outcome': outcome_of(summary['exit_code'], killed),
+            'files': len(record.files),
+            'network_events': network_events,
+            'watchdog': record.watchdog,
+        }
+        session.update(summary)
+        try:
+            self.history.add(session)
+        except Exception as e:
+            self.log(f'Could not record session: {str(e)}', 'WARNING')
+    
+    def _report_limit_hits(self, record):
+        """Write new cgroup limit hits (memory.max, OOM kills, pids.max, throttling) to the sandbox log"""
+        if record is None or record.cgroup is None or not record.logger:
+            return
+        for message in record.cgroup.poll_events():
+            record.logger.log_event('limit', message)
+    
+    def _release_cgroup(self, record):
+        """Report final limit hits and remove the sandbox's cgroup"""
+        if record is None or record.cgroup is None:
+            return
+        self._report_limit_hits(record)
+        if not record.cgroup.remove():
+            # Something inside outlived the sandbox; stop it so the cgroup can go
+            record.cgroup.kill()
+    
+    def _check_tmpfs_budget(self, pid):
+        """
+        Measure the RAM-backed writes of a throwaway sandbox
+        Returns: 'kill' or 'freeze' when its budget has just been exceeded, else None
+        """
+        record = self.registry.get(pid)
+        if record is None:
+            return None
+        usage = record.usage
+        if usage is None:
+            if not record.tmpfs_mb:
+                return None
+            # Launched by another InvisVM process; measure it here too
+            usage = TmpfsUsage(record.tmpfs_mb, record.tmpfs_action or 'kill')
+            if self.registry.update(pid, usage=usage) is None:
+                return None
+        
+        if not usage.refresh(pid):
+            return None
+        
+        outcome = 'frozen' if usage.action == 'freeze' else 'killed'
+        message = f'RAM budget exceeded: {usage.describe()} written'
+        self.log(f'{record.name} (PID: {pid}): {message}, sandbox {outcome}', 'WARNING')
+        if record.logger:
+            record.logger.log_event('limit', message, f'Sandbox {outcome}')
+        METRICS.inc('tmpfs.budget_exceeded')
+        return usage.action
+    
+    def _enforce_tmpfs_budget(self, pid):
+        """Kill or freeze a throwaway sandbox that went over its RAM budget"""
+        action = self._check_tmpfs_budget(pid)
+        if action == 'kill':
+            self.kill_sandbox(pid, 'over its RAM budget')
+        elif action == 'freeze':
+            self.freeze_sandbox(pid, 'over its RAM budget')
+    
+    def freeze_sandbox(self, pid, reason='by user'):
+        """
+        Suspend every process of a sandbox (cgroup.freeze, else SIGSTOP to its process tree)
+        Returns: (success, message)
+        """
+        record = self.registry.get(pid)
+        if record is None:
+            return False, f'Process {pid} not found'
+        if record.frozen:
+            return True, f'{record.name} is already frozen'
+        if not self._set_frozen(record, True):
+            return False, f'Could not freeze {record.name} (PID: {pid})'
+        
+        self.registry.update(pid, frozen=True)
+        if record.logger:
+            record.logger.log_event('freeze', f'Sandbox frozen {reason}')
+        self.log(f'Froze {record.name} (PID: {pid}) {reason}', 'INFO')
+        METRICS.inc('freeze.count')
+        self.save_state()
+        return True, f'Froze {record.name} (PID: {pid})'
+    
+    def thaw_sandbox(self, pid):
+        """
+        Resume a frozen sandbox
+        Returns: (success, message)
+        """
+        record = self.registry.get(pid)
+        if record is None:
+            return False, f'Process {pid} not found'
+        if not self._set_frozen(record, False) and record.frozen:
+            return False, f'Could not thaw {record.name} (PID: {pid})'
+        
+        self.registry.update(pid, frozen=False)
+        if record.frozen:
+            if record.logger:
+                record.logger.log_event('freeze', 'Sandbox thawed')
+            self.log(f'Thawed {record.name} (PID: {pid})', 'INFO')
+            METRICS.inc('thaw.count')
+            self.save_state()
+        return True, f'Thawed {record.name} (PID: {pid})'
+    
+    def freeze_sandboxes(self, pids=None):
+        """Freeze several sandboxes (default: all running ones); returns [(pid, success, message), ...]"""
+        if pids is None:
+            pids = [pid for pid, record in self.registry.snapshot().items() if not record.frozen]
+        return [(pid,) + self.freeze_sandbox(pid) for pid in pids]
+    
+    def thaw_sandboxes(self, pids=None):
+        """Thaw several sandboxes (default: all frozen ones); returns [(pid, success, message), ...]"""
+        if pids is None:
+            pids = [pid for pid, record in self.registry.snapshot().items() if record.frozen]
+        return [(pid,) + self.thaw_sandbox(pid) for pid in pids]
+    
+    def _set_frozen(self, record, frozen):
+        """
+        Freeze or thaw the processes of a sandbox (for a pooled app, the pool
+        sandbox it joined): cgroup.freeze where the sandbox has a cgroup,
+        else SIGSTOP / SIGCONT to its process tree
+        """
+        cgroup = record.cgroup
+        if cgroup is None and record.sandbox_id and self.cgroups is not None:
+            # Launched by another InvisVM process
+            cgroup = self.cgroups.find(record.sandbox_id)
+        cgroup_done = cgroup is not None and cgroup.freeze(frozen)
+        if cgroup_done and frozen:
+            return True
+        
+        # Thawing always sends SIGCONT too, in case it was stopped by signal
+        _, children = procfs.scan_processes()
+        delivered = False
+        for member in procfs.process_tree(record.pool_pid or record.pid, children):
+            try:
+                os.kill(member, signal.SIGSTOP if frozen else signal.SIGCONT)
+                delivered = True
+            except OSError:
+                pass    # the firejail process itself runs as root
+        return delivered or cgroup_done
+    
+    def start_pool(self, sizes=None):
+        """Start keeping warm pre-started sandboxes (see sandbox_pool.py)"""
+        if self.pool is None:
+            self.pool = SandboxPool(self, sizes)
+            self.pool.start()
+            self.log(f'Warm sandbox pool started: {self.pool.sizes}', 'INFO')
+        return self.pool
+    
+    def _release_pool_sandbox(self, pool_pid):
+        """Shut down the pool sandbox a pooled app ran in (in the background); it is never reused"""
+        if self.pool is not None:
+            self.pool.release(pool_pid)
+        else:
+            # Handed out by another InvisVM process, which reaps it
+            threading.Thread(target=shutdown_sandbox, args=(pool_pid,), daemon=True).start()
+    
+    def _release_home(self, record):
+        """Delete a sandbox's throwaway private home in the background"""
+        if record is None or not record.home:
+            return
+        self.home_templates.discard(record.home)
+    
+    @METRICS.timed('state.reload')
+    def reload_state_from_disk(self, adopt=None):
         """
         Force reload state from disk
         CRITICAL: This catches sandboxes launched from other processes (right-click)
+        
+        Args:
+            adopt: Called as adopt(pid, app_name) to watch each newly found
+                   sandbox (default: a _monitor_process thread)
         """
+        adopt = adopt or self._monitor_process
         try:
             if os.path.exists(self.state_file):
                 with open(self.state_file, 'r') as f:
@@ -933,16 +1633,16 @@ class FirejailHandler:
                     pid = int(pid_str)
                     
                     # Only add if not already tracking and process is still running
-                    if pid not in self.active_sandboxes and self._is_firejail_pid(pid):
-                        info['process'] = None
-                        info['timestamp'] = datetime.fromisoformat(info['timestamp'])
-                        self.active_sandboxes[pid] = info
-                        self._monitor_process(pid, info['name'])
-                        self.log(f'Detected external sandbox: {info["name"]} (PID: {pid})', 'INFO')
+                    if pid not in self.registry and self._is_firejail_pid(pid):
+                        record = SandboxRecord.from_state(pid, info)
+                        if self.registry.add(record):
+                            adopt(pid, record.name)
+                            self.log(f'Detected external sandbox: {record.name} (PID: {pid})', 'INFO')
         
         except Exception as e:
             self.log(f'Could not reload state: {str(e)}', 'WARNING')
     
+    @METRICS.timed('discovery.scan')
     def get_active_sandboxes(self):
         """
         Get list of active sandboxes with ROBUST detection
@@ -954,16 +1654,25 @@ class FirejailHandler:
         # First, reload state from disk to catch external launches
         self.reload_state_from_disk()
         
+        return self._reconcile_sandboxes(running_pids, self._monitor_process)
+    
+    def _reconcile_sandboxes(self, running_pids, adopt):
+        """
+        Drop dead sandboxes, adopt untracked firejail PIDs, and list the rest
+        
+        Args:
+            running_pids: Set of PIDs reported by `firejail --list`
+            adopt: Called as adopt(pid, app_name) to watch each adopted sandbox
+        """
         # Clean up finished processes
         finished_pids = []
-        for pid in list(self.active_sandboxes.keys()):
-            if pid not in running_pids and not self._is_firejail_pid(pid):
+        for pid, record in self.registry.snapshot().items():
+            if pid not in running_pids and not self._is_sandbox_running(record):
                 finished_pids.append(pid)
         
         for pid in finished_pids:
-            if pid in self.active_sandboxes:
+            if self.registry.remove(pid) is not None:
                 self.log(f'Cleaning up dead process: {pid}', 'INFO')
-                del self.active_sandboxes[pid]
         
         if finished_pids:
             self.save_state()
@@ -971,114 +1680,40 @@ class FirejailHandler:
         # Now detect any firejail PIDs not in our tracking
         # This catches right-click launches that haven't been loaded yet
         for pid in running_pids:
-            if pid not in self.active_sandboxes:
+            if pid not in self.registry:
                 # This is a firejail process we're not tracking
                 # Try to get info about it
                 try:
-                    with open(f'/proc/{pid}/cmdline', 'r') as f:
-                        cmdline = f.read().replace('\x00', ' ').strip()
-                    
-                    # Extract app name from command line
-                    app_name = self._extract_app_name_from_cmdline(cmdline)
+                    # Name the app from its command line
+                    identity = self.identifier.for_process(pid)
+                    app_name = identity.name
                     
                     # Add to tracking
-                    self.active_sandboxes[pid] = {
-                        'name': app_name,
-                        'path': 'Unknown',
-                        'policy': 'unknown',
-                        'timestamp': datetime.now(),
-                        'process': None
-                    }
-                    
-                    self.log(f'Detected untracked firejail: {app_name} (PID: {pid})', 'INFO')
-                    self._monitor_process(pid, app_name)
+                    if self.registry.add(SandboxRecord(pid=pid, name=app_name, app=identity.app)):
+                        self.log(f'Detected untracked firejail: {app_name} (PID: {pid})', 'INFO')
+                        adopt(pid, app_name)
                 
                 except Exception as e:
                     # If we can't read cmdline, just use PID
-                    self.active_sandboxes[pid] = {
-                        'name': f'Firejail Process (PID {pid})',
-                        'path': 'Unknown',
-                        'policy': 'unknown',
-                        'timestamp': datetime.now(),
-                        'process': None
-                    }
-                    self._monitor_process(pid, f'Process {pid}')
+                    if self.registry.add(SandboxRecord(pid=pid, name=f'Firejail Process (PID {pid})')):
+                        adopt(pid, f'Process {pid}')
         
         return [
-            {
-                'pid': pid,
-                'name': info['name'],
-                'policy': info['policy'],
-                'path': info['path'],
-                'timestamp': info['timestamp']
-            }
-            for pid, info in self.active_sandboxes.items()
-            if pid in running_pids or self._is_firejail_pid(pid)
+            record.to_dict()
+            for pid, record in self.registry.snapshot().items()
+            if pid in running_pids or self._is_sandbox_running(record)
         ]
     
-    def _extract_app_name_from_cmdline(self, cmdline):
-        """
-        Extract application name from firejail command line
-        """
-        # Common patterns in firejail cmdline
-        if 'python3' in cmdline.lower():
-            # Extract Python script name
-            parts = cmdline.split()
-            for i, part in enumerate(parts):
-                if part == 'python3' and i + 1 < len(parts):
-                    script_path = parts[i + 1]
-                    basename = os.path.basename(script_path)
-                    return f'Python Script ({basename})'
-            return 'Python Script'
-        
-        elif 'bash' in cmdline.lower():
-            # Extract shell script name
-            parts = cmdline.split()
-            for i, part in enumerate(parts):
-                if part == 'bash' and i + 1 < len(parts):
-                    script_path = parts[i + 1]
-                    basename = os.path.basename(script_path)
-                    return f'Shell Script ({basename})'
-            return 'Shell Script'
-        
-        elif 'firefox' in cmdline.lower():
-            return 'Firefox (firefox)'
-        elif 'chrome' in cmdline.lower():
-            return 'Chrome (google-chrome)'
-        elif 'lowriter' in cmdline.lower():
-            return 'LibreOffice Writer'
-        elif 'localc' in cmdline.lower():
-            return 'LibreOffice Calc'
-        elif 'loimpress' in cmdline.lower():
-            return 'LibreOffice Impress'
-        elif 'libreoffice' in cmdline.lower():
-            return 'LibreOffice'
-        elif 'nautilus' in cmdline.lower():
-            return 'Files (nautilus)'
-        elif 'gnome-terminal' in cmdline.lower():
-            return 'Terminal'
-        elif 'evince' in cmdline.lower():
-            return 'Document Viewer'
-        elif 'xdg-open' in cmdline.lower():
-            # Try to extract filename
-            parts = cmdline.split()
-            for part in parts:
-                if '/' in part and not part.startswith('-'):
-                    basename = os.path.basename(part)
-                    if basename:
-                        return f'File ({basename})'
-            return 'File Viewer'
-        else:
-            # Try to extract any recognizable binary name
-            parts = cmdline.split()
-            for part in parts:
-                if '/' in part or part.startswith('-'):
-                    continue
-                if len(part) > 2 and part.isalnum():
-                    return f'{part.capitalize()}'
-        
-        return 'Sandboxed Application'
+    def _is_sandbox_running(self, record):
+        """
+        True while the sandbox's firejail process runs, or for a pooled app,
+        while anything besides the placeholder runs in its pool sandbox
+        """
+        if self._is_firejail_pid(record.pid):
+            return True
+        return bool(record.pool_pid) and sandbox_in_use(record.pool_pid, record.cgroup)
     
+    @METRICS.timed('subprocess.firejail_version')
     def get_firejail_version(self):
         """Get installed firejail version"""
         try:
@@ -0,0 +1,334 @@
+"""
+Private Home Templates
+Pre-built home directories handed to firejail with --private=<dir>
+
+A template is a directory in HOME_TEMPLATES_DIR holding what an app needs
+to start warm (fontconfig cache, GTK settings, an app's first-run config).
+Templates are looked up by app, then policy, then 'default'; 'default' is
+created from HOME_TEMPLATE_DEFAULT_ITEMS of the real home when first needed.
+
+For each sandbox the template is materialized into
+~/InvisVM/sandboxes/instance-<id>/home with `cp --reflink=auto`, which
+shares data blocks copy-on-write on btrfs/XFS and copies elsewhere. One
+copy of each template is prepared ahead of time, so a launch only renames
+a directory. On exit the home is renamed aside and deleted by a
+background thread.
+
+A spare is only used if the template has not changed since it was made.
+The template's change stamp comes from a full walk, which is cached and
+redone only when the mtime of one of its directories changes (entries
+added, removed or renamed into place), checked at most once per
+SIGNATURE_CHECK_INTERVAL. Call refresh() after editing a template file
+in place.
+
+Templates are never hardlinked into a sandbox: the sandboxed app could
+write through the link into the template.
+"""
+
+import os
+import time
+import queue
+import shutil
+import logging
+import threading
+import subprocess
+import uuid
+
+from config import HOME_DIR, SANDBOXES_DIR, HOME_TEMPLATES_DIR, HOME_TEMPLATE_DEFAULT_ITEMS
+from metrics import METRICS
+
+SPARE_PREFIX = '.spare-'
+TRASH_PREFIX = '.trash-'
+
+# Seconds between checks of a template's directory mtimes
+SIGNATURE_CHECK_INTERVAL = 1.0
+
+
+def copy_tree(src, dst):
+    """
+    Copy a directory tree, sharing blocks (reflink) where the filesystem can
+    dst must not exist
+    """
+    try:
+        subprocess.run(
+            ['cp', '-a', '--reflink=auto', src, dst],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        return
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst, symlinks=True)
+
+
+def copy_file(src, dst):
+    """Copy one file, reflinked where possible"""
+    try:
+        subprocess.run(
+            ['cp', '--reflink=auto', '--preserve=mode,timestamps', src, dst],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        shutil.copy2(src, dst)
+
+
+def tree_signature(path):
+    """
+    Change stamp of a template from (relpath, mtime, size) of every entry
+    Returns: (signature, directories of the tree including path)
+    """
+    entries = []
+    dirs = [path]
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirs.extend(os.path.join(dirpath, name) for name in dirnames)
+        for name in dirnames + filenames:
+            full = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(full)
+            except OSError:
+                continue
+            entries.append((os.path.relpath(full, path), st.st_mtime_ns, st.st_size))
+    return hash(tuple(sorted(entries))), dirs
+
+
+def dir_stamp(dirs):
+    """(directory, mtime) of each directory; None for missing ones"""
+    stamp = []
+    for directory in dirs:
+        try:
+            stamp.append((directory, os.stat(directory).st_mtime_ns))
+        except OSError:
+            stamp.append((directory, None))
+    return tuple(stamp)
+
+
+class HomeTemplates:
+    """
+    Materializes and discards template-based private homes
+    """
+
+    def __init__(self, templates_dir=HOME_TEMPLATES_DIR, sandboxes_dir=SANDBOXES_DIR,
+                 default_items=HOME_TEMPLATE_DEFAULT_ITEMS, keep_spare=True):
+        self.templates_dir = templates_dir
+        self.sandboxes_dir = sandboxes_dir
+        self.default_items = list(default_items)
+        self.keep_spare = keep_spare
+        self.logger = logging.getLogger('FirejailHandler')
+        self._lock = threading.Lock()
+        self._spares = {}       # template name -> (signature, spare dir)
+        self._signatures = {}   # template path -> (dir stamp, signature, last check)
+        self._refilling = set()
+        self._trash = queue.Queue()
+        self._remover = None
+
+    # ---- templates ----
+
+    def find(self, names):
+        """
+        First existing template among names (None entries are skipped)
+        Returns: (name, path); 'default' is created if it is requested and missing
+        """
+        for name in names:
+            if not name:
+                continue
+            path = os.path.join(self.templates_dir, name)
+            if os.path.isdir(path):
+                return name, path
+            if name == 'default':
+                return name, self.create_template('default', self.default_items)
+        raise FileNotFoundError(f'No home template among: {", ".join(n for n in names if n)}')
+
+    def create_template(self, name, items, source=HOME_DIR):
+        """
+        Build a template from selected paths of a home directory
+        items: paths relative to source; missing ones are skipped
+        Returns: template path
+        """
+        path = os.path.join(self.templates_dir, name)
+        staging = f'{path}.tmp-{uuid.uuid4().hex[:8]}'
+        os.makedirs(staging)
+        for item in items:
+            src = os.path.join(source, item)
+            if not os.path.lexists(src):
+                continue
+            dst = os.path.join(staging, item)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.isdir(src) and not os.path.islink(src):
+                copy_tree(src, dst)
+            else:
+                copy_file(src, dst)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # Created concurrently by another launch
+            shutil.rmtree(staging, ignore_errors=True)
+        self.logger.info(f'Created home template {name} at {path}')
+        return path
+
+    def signature(self, template):
+        """Cached change stamp of a template (see the module docstring)"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._signatures.get(template)
+        if cached is not None:
+            stamp, signature, checked = cached
+            if now - checked < SIGNATURE_CHECK_INTERVAL:
+                return signature
+            if dir_stamp([d for d, _ in stamp]) == stamp:
+                with self._lock:
+                    self._signatures[template] = (stamp, signature, now)
+                return signature
+
+        # Stamp the directories the last walk found before walking again, so
+        # a change during the walk shows up at the next check
+        previous = [d for d, _ in cached[0]] if cached is not None else [template]
+        stamp = dir_stamp(previous)
+        signature, dirs = tree_signature(template)
+        if dirs != previous:
+            stamp = dir_stamp(dirs)
+        with self._lock:
+            self._signatures[template] = (stamp, signature, now)
+        return signature
+
+    def refresh(self, name=None):
+        """Forget cached template stamps (all, or one template's) after in-place edits"""
+        with self._lock:
+            if name is None:
+                self._signatures.clear()
+            else:
+                self._signatures.pop(os.path.join(self.templates_dir, name), None)
+
+    # ---- per-sandbox homes ----
+
+    @METRICS.timed('launch.home')
+    def materialize(self, sandbox_id, names):
+        """
+        Create the private home of a sandbox from the first matching template
+        Returns: (home path, template name); raises OSError on failure
+        """
+        name, template = self.find(names)
+        instance = os.path.join(self.sandboxes_dir, f'instance-{sandbox_id}')
+        home = os.path.join(instance, 'home')
+        os.makedirs(instance, exist_ok=True)
+
+        signature = self.signature(template)
+        spare = self._take_spare(name, signature)
+        try:
+            if spare is None:
+                raise FileNotFoundError(template)
+            os.rename(spare, home)
+            METRICS.inc('home.spare_hit')
+        except OSError:
+            copy_tree(template, home)
+            METRICS.inc('home.spare_miss')
+
+        if self.keep_spare:
+            self._refill(name, template, signature)
+        return home, name
+
+    def stage_file(self, home, path):
+        """
+        Make a file from the real home visible at the same path inside a
+        private home (a copy; changes are not written back)
+        Returns: True if staged, False if path is not a file under the real home
+        """
+        real_home = os.path.realpath(HOME_DIR)
+        target = os.path.realpath(path)
+        if not os.path.isfile(target) or os.path.commonpath([real_home, target]) != real_home:
+            return False
+        dst = os.path.join(home, os.path.relpath(target, real_home))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if not os.path.exists(dst):
+            copy_file(target, dst)
+        return True
+
+    def discard(self, home):
+        """Remove a sandbox's private home (and instance dir) in the background"""
+        instance = os.path.dirname(home)
+        if not os.path.basename(instance).startswith('instance-'):
+            return
+        trash = os.path.join(self.sandboxes_dir, f'{TRASH_PREFIX}{os.path.basename(instance)}-{uuid.uuid4().hex[:8]}')
+        try:
+            os.rename(instance, trash)
+        except FileNotFoundError:
+            return
+        except OSError:
+            trash = instance
+        self._remove_later(trash)
+
+    def purge_trash(self):
+        """Queue removal of leftovers from earlier sessions (trash and stale spares)"""
+        try:
+            names = os.listdir(self.sandboxes_dir)
+        except OSError:
+            return 0
+        count = 0
+        for name in names:
+            if name.startswith(SPARE_PREFIX):
+                # Spares are .spare-<pid>-...; keep those of running InvisVM processes
+                owner = name[len(SPARE_PREFIX):].split('-', 1)[0]
+                if owner.isdigit() and os.path.exists(f'/proc/{owner}'):
+                    continue
+            elif not name.startswith(TRASH_PREFIX):
+                continue
+            self._remove_later(os.path.join(self.sandboxes_dir, name))
+            count += 1
+        return count
+
+    # ---- spares ----
+
+    def _take_spare(self, name, signature):
+        with self._lock:
+            entry = self._spares.pop(name, None)
+        if entry is None:
+            return None
+        spare_signature, spare = entry
+        if spare_signature != signature:
+            # Template changed since the spare was made
+            self._remove_later(spare)
+            return None
+        return spare
+
+    def _refill(self, name, template, signature):
+        """Prepare the next home for this template in the background"""
+        with self._lock:
+            if name in self._spares or name in self._refilling:
+                return
+            self._refilling.add(name)
+
+        def build():
+            spare = os.path.join(self.sandboxes_dir, f'{SPARE_PREFIX}{os.getpid()}-{name}-{uuid.uuid4().hex[:8]}')
+            try:
+                copy_tree(template, spare)
+            except Exception as e:
+                self.logger.warning(f'Could not prepare home from template {name}: {str(e)}')
+                shutil.rmtree(spare, ignore_errors=True)
+                spare = None
+            with self._lock:
+                self._refilling.discard(name)
+                if spare is not None:
+                    self._spares[name] = (signature, spare)
+
+        threading.Thread(target=build, name='home-template', daemon=True).start()
+
+    # ---- background removal ----
+
+    def _remove_later(self, path):
+        with self._lock:
+            if self._remover is None:
+                self._remover = threading.Thread(target=self._remove_loop, name='home-remover', daemon=True)
+                self._remover.start()
+        self._trash.put(path)
+
+    def _remove_loop(self):
+        while True:
+            path = self._trash.get()
+            with METRICS.timer('home.remove'):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+# Shared by every handler in the process
+default_home_templates = HomeTemplates()
@@ -0,0 +1,361 @@
+"""
+Launch Scheduler
+Admission control and a priority queue in front of FirejailHandler.launch_sandboxed()
+
+Launches are submitted as tickets and started by one dispatcher thread
+when all of these allow it:
+  - fewer than max_sandboxes sandboxes are running (plus launches in flight)
+  - fewer than max_in_flight launches are in progress
+  - the host is not under pressure: MemAvailable (minus a reserve for
+    sandboxes still starting up), 1-minute load average per CPU, and PSI
+    "some avg10" from /proc/pressure
+Interactive tickets (a single app started by the user) are dispatched
+before batch tickets and skip the host pressure check. Queued tickets can
+be listed and cancelled.
+
+    scheduler = LaunchScheduler(handler)
+    tickets = scheduler.submit_many(paths, 'standard')
+    for ticket in tickets:
+        success, pid, message = ticket.wait()
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import procfs
+from config import (
+    SCHEDULER_MAX_SANDBOXES, SCHEDULER_MAX_IN_FLIGHT, SCHEDULER_MIN_MEM_AVAILABLE_MB,
+    SCHEDULER_LAUNCH_RESERVE_MB, SCHEDULER_SETTLE_SECONDS, SCHEDULER_MAX_LOAD_PER_CPU,
+    SCHEDULER_MAX_PSI, SCHEDULER_RECHECK_INTERVAL
+)
+from metrics import METRICS
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BATCH: 'batch'}
+
+MB = 1024 * 1024
+
+
+class LaunchTicket:
+    """
+    One queued launch
+    state: 'queued', 'launching', 'done' or 'cancelled'
+    result: (success, pid, message) once done or cancelled
+    """
+
+    def __init__(self, ticket_id, path, policy, priority, resources=None, callback=None, ttl_minutes=None):
+        self.id = ticket_id
+        self.path = path
+        self.policy = policy
+        self.priority = priority
+        self.resources = resources
+        self.ttl_minutes = ttl_minutes
+        self.callback = callback
+        self.state = 'queued'
+        self.waiting_for = ''
+        self.submitted = time.monotonic()
+        self.result = None
+        self._scheduler = None
+        self._done = threading.Event()
+
+    @property
+    def name(self):
+        return os.path.basename(self.path.rstrip('/')) or self.path
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the ticket is launched or cancelled
+        Returns: (success, pid, message), or None on timeout
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def cancel(self):
+        """Withdraw the ticket if it has not started; returns True if cancelled"""
+        return self._scheduler is not None and self._scheduler.cancel(self)
+
+    def to_dict(self):
+        """Plain dict for UI tables"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'path': self.path,
+            'policy': self.policy,
+            'priority': PRIORITY_NAMES.get(self.priority, str(self.priority)),
+            'state': self.state,
+            'waiting_for': self.waiting_for,
+            'queued_seconds': time.monotonic() - self.submitted,
+        }
+
+    def _finish(self, state, result):
+        self.state = state
+        self.result = result
+        self._done.set()
+
+
+class LaunchScheduler:
+    """
+    Priority launch queue with concurrency limits and host-load backpressure
+    """
+
+    def __init__(self, handler, max_sandboxes=SCHEDULER_MAX_SANDBOXES,
+                 max_in_flight=SCHEDULER_MAX_IN_FLIGHT,
+                 min_mem_available_mb=SCHEDULER_MIN_MEM_AVAILABLE_MB,
+                 launch_reserve_mb=SCHEDULER_LAUNCH_RESERVE_MB,
+                 settle_seconds=SCHEDULER_SETTLE_SECONDS,
+                 max_load_per_cpu=SCHEDULER_MAX_LOAD_PER_CPU,
+                 max_psi=None, recheck_interval=SCHEDULER_RECHECK_INTERVAL):
+        """
+        Args:
+            handler: FirejailHandler that performs the launches
+            max_sandboxes: Running sandboxes launched by the handler allowed at once
+            max_in_flight: Launches allowed in progress at once
+            min_mem_available_mb: Hold batch launches below this MemAvailable
+            launch_reserve_mb: Memory assumed for each sandbox started within
+                               the last settle_seconds, which MemAvailable
+                               does not show yet
+            max_load_per_cpu: Hold batch launches above this load average per CPU
+            max_psi: {resource: percent} PSI "some avg10" ceilings
+            recheck_interval: Seconds between host checks while held back
+        """
+        self.handler = handler
+        self.max_sandboxes = max(1, max_sandboxes)
+        self.max_in_flight = max(1, max_in_flight)
+        self.min_mem_available_mb = min_mem_available_mb
+        self.launch_reserve_mb = launch_reserve_mb
+        self.settle_seconds = settle_seconds
+        self.max_load_per_cpu = max_load_per_cpu
+        self.max_psi = dict(SCHEDULER_MAX_PSI if max_psi is None else max_psi)
+        self.recheck_interval = recheck_interval
+        self.cpu_count = os.cpu_count() or 1
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count(1)
+        self._in_flight = 0
+        self._recent = deque()
+        self._listeners = []
+        self._thread = None
+        self._stopped = False
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='launch')
+
+        # A sandbox exiting may free a slot
+        handler.registry.subscribe(self._on_registry_change)
+
+    # ---- submitting ----
+
+    def submit(self, path, policy='standard', priority=PRIORITY_BATCH, resources=None, callback=None,
+               ttl_minutes=None):
+        """
+        Queue a launch
+        callback(ticket) runs on a worker thread once it is done or cancelled
+        ttl_minutes: time limit of the sandbox (see FirejailHandler.launch_sandboxed)
+        Returns: LaunchTicket
+        """
+        return self.submit_many([path], policy, priority, resources, callback, ttl_minutes)[0]
+
+    def submit_many(self, paths, policy='standard', priority=PRIORITY_BATCH, resources=None, callback=None,
+                    ttl_minutes=None):
+        """Queue several launches with the same settings; returns tickets in input order"""
+        tickets = []
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError('Launch scheduler is stopped')
+            for path in paths:
+                seq = next(self._seq)
+                ticket = LaunchTicket(seq, path, policy, priority, resources, callback, ttl_minutes)
+                ticket._scheduler = self
+                heapq.heappush(self._heap, (priority, seq, ticket))
+                tickets.append(ticket)
+            self._ensure_thread()
+            self._cond.notify_all()
+        METRICS.inc('scheduler.submitted', len(tickets))
+        self._notify()
+        return tickets
+
+    def cancel(self, ticket):
+        """Cancel a queued ticket (or ticket id); returns True if it was still queued"""
+        with self._cond:
+            ticket_id = getattr(ticket, 'id', ticket)
+            found = None
+            for entry in self._heap:
+                if entry[2].id == ticket_id:
+                    found = entry
+                    break
+            if found is None:
+                return False
+            self._heap.remove(found)
+            heapq.heapify(self._heap)
+            self._cond.notify_all()
+        self._cancelled([found[2]])
+        return True
+
+    def cancel_all(self):
+        """Cancel every queued ticket; returns how many were cancelled"""
+        with self._cond:
+            tickets = [entry[2] for entry in self._heap]
+            self._heap = []
+            self._cond.notify_all()
+        self._cancelled(tickets)
+        return len(tickets)
+
+    def _cancelled(self, tickets):
+        for ticket in tickets:
+            ticket._finish('cancelled', (False, None, 'Launch cancelled'))
+            self._run_callback(ticket)
+        if tickets:
+            METRICS.inc('scheduler.cancelled', len(tickets))
+            self.handler.log(f'Cancelled {len(tickets)} queued launch(es)', 'INFO')
+            self._notify()
+
+    # ---- reading ----
+
+    def queued(self):
+        """Queued tickets in dispatch order"""
+        with self._cond:
+            return [entry[2] for entry in sorted(self._heap, key=lambda e: e[:2])]
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def subscribe(self, callback):
+        """Call callback() after the queue changes (any thread; keep it short)"""
+        self._listeners = self._listeners + [callback]
+
+    def unsubscribe(self, callback):
+        self._listeners = [cb for cb in self._listeners if cb is not callback]
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def stop(self, cancel_queued=True):
+        """Stop dispatching; launches in progress finish"""
+        if cancel_queued:
+            self.cancel_all()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.handler.registry.unsubscribe(self._on_registry_change)
+        self._pool.shutdown(wait=False)
+
+    # ---- dispatching ----
+
+    def _ensure_thread(self):
+        """Start the dispatcher on first use; caller holds the lock"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='launch-scheduler', daemon=True)
+            self._thread.start()
+
+    def _on_registry_change(self, change):
+        if change.kind == 'removed':
+            with self._cond:
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            changed = False
+            with self._cond:
+                if self._stopped:
+                    return
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                ticket = self._heap[0][2]
+                reason = self._blocked_by(ticket)
+                if reason:
+                    # Show the same reason on every queued ticket
+                    for _, _, queued in self._heap:
+                        if queued.waiting_for != reason:
+                            queued.waiting_for = reason
+                            changed = True
+                    if changed:
+                        METRICS.inc('scheduler.held_back')
+                    self._cond.wait(self.recheck_interval)
+                else:
+                    heapq.heappop(self._heap)
+                    ticket.state = 'launching'
+                    ticket.waiting_for = ''
+                    self._in_flight += 1
+                    self._recent.append(time.monotonic())
+                    self._pool.submit(self._launch, ticket)
+                    changed = True
+            if changed:
+                self._notify()
+
+    def _blocked_by(self, ticket):
+        """
+        Why the ticket cannot start yet; caller holds the lock
+        Returns: reason string or None
+        """
+        if self._in_flight >= self.max_in_flight:
+            return f'{self._in_flight} launch(es) in progress'
+        # Sandboxes of other processes (adopted from the state file) are
+        # never reaped here, so counting them could hold tickets forever
+        running = self.handler.launched_count() + self._in_flight
+        if running >= self.max_sandboxes:
+            return f'{running} of {self.max_sandboxes} sandboxes running'
+        if ticket.priority == PRIORITY_INTERACTIVE:
+            return None
+        return self._host_pressure()
+
+    def _host_pressure(self):
+        """Reason the host is too busy for another batch launch, or None"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > self.settle_seconds:
+            self._recent.popleft()
+
+        available = procfs.mem_available_bytes()
+        if available is not None and self.min_mem_available_mb:
+            usable = available - len(self._recent) * self.launch_reserve_mb * MB
+            if usable < self.min_mem_available_mb * MB:
+                return f'low memory ({available // MB} MB available)'
+
+        if self.max_load_per_cpu:
+            try:
+                load = os.getloadavg()[0]
+            except OSError:
+                load = None
+            if load is not None and load / self.cpu_count > self.max_load_per_cpu:
+                return f'load average {load:.1f} on {self.cpu_count} CPU(s)'
+
+        for resource, limit in self.max_psi.items():
+            stalled = procfs.pressure(resource)
+            if stalled is not None and limit is not None and stalled > limit:
+                return f'{resource} pressure {stalled:.0f}%'
+        return None
+
+    def _launch(self, ticket):
+        """Runs on a pool thread"""
+        METRICS.observe('scheduler.queue_wait', time.monotonic() - ticket.submitted)
+        try:
+            result = self.handler.launch_sandboxed(ticket.path, ticket.policy, ticket.resources, ticket.ttl_minutes)
+        except Exception as e:
+            result = (False, None, f'Unexpected error: {str(e)}')
+        ticket._finish('done', result)
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+        self._run_callback(ticket)
+        self._notify()
+
+    def _run_callback(self, ticket):
+        if ticket.callback is not None:
+            try:
+                ticket.callback(ticket)
+            except Exception as e:
+                self.handler.log(f'Launch callback failed: {str(e)}', 'WARNING')
@@ -6,22 +6,31 @@ ROBUST DETECTION: Shared state file for cross-process sandbox tracking
 
 import sys
 import os
+import time
 import argparse
 import logging
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QMessageBox, QFileDialog, QTabWidget, QDialog, QLabel,
-    QPushButton, QComboBox
+    QPushButton, QComboBox, QProgressDialog, QSpinBox
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 from pathlib import Path
 
 # Import custom modules
 from config import *
 from firejail_handler import FirejailHandler
+from async_handler import AsyncFirejailHandler, AsyncLoopThread
+from launch_scheduler import LaunchScheduler, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from policy_compiler import get_security_policies
 from context_menu_installer import ContextMenuInstaller
-from ui import LauncherTab, AppSearchLauncher, PoliciesTab, SandboxesTab, AboutTab, COLORS
+from ui import (
+    LauncherTab, AppSearchLauncher, PoliciesTab, SandboxesTab, AboutTab, DiagnosticsTab, HistoryTab,
+    OutputViewerDialog, COLORS
+)
+from metrics import install_sigusr1_dump
+from prometheus_exporter import PrometheusExporter
 
 
 class PolicySelectionDialog(QDialog):
@@ -29,10 +38,14 @@ class PolicySelectionDialog(QDialog):
     Dialog for selecting security policy when opening from context menu
     """
     
-    def __init__(self, file_path, parent=None):
+    def __init__(self, file_paths, parent=None):
         super().__init__(parent)
-        self.file_path = file_path
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        self.file_paths = list(file_paths)
+        self.file_path = self.file_paths[0] if self.file_paths else ''
         self.selected_policy = None
+        self.selected_ttl = None
         self.setup_ui()
         
         # Make dialog stay on top
@@ -41,7 +54,7 @@ class PolicySelectionDialog(QDialog):
     def setup_ui(self):
         """Setup dialog UI"""
         self.setWindowTitle('InvisVM - Select Security Policy')
-        self.setGeometry(300, 300, 550, 350)
+        self.setGeometry(300, 300, 550, 400)
         self.setModal(True)
         
         # Modern styling - FIXED dropdown hover issue
@@ -129,8 +142,13 @@ class PolicySelectionDialog(QDialog):
         layout.addWidget(title)
         
         # File info
-        file_name = os.path.basename(self.file_path)
-        file_label = QLabel(f'📁 File: {file_name}')
+        if len(self.file_paths) == 1:
+            file_label = QLabel(f'📁 File: {os.path.basename(self.file_path)}')
+        else:
+            names = ', '.join(os.path.basename(p) for p in self.file_paths[:5])
+            if len(self.file_paths) > 5:
+                names += f', … (+{len(self.file_paths) - 5} more)'
+            file_label = QLabel(f'📁 {len(self.file_paths)} files: {names}')
         file_label.setStyleSheet('color: #666; font-size: 11pt; padding: 10px; background-color: #e3f2fd; border-radius: 5px;')
         file_label.setWordWrap(True)
         layout.addWidget(file_label)
@@ -141,7 +159,7 @@ class PolicySelectionDialog(QDialog):
         layout.addWidget(policy_label)
         
         self.policy_combo = QComboBox()
-        self.policy_combo.addItems(SECURITY_POLICIES.keys())
+        self.policy_combo.addItems(get_security_policies().keys())
         self.policy_combo.setCurrentText('standard')
         self.policy_combo.currentTextChanged.connect(self.update_description)
         self.policy_combo.setMinimumHeight(45)
@@ -151,9 +169,23 @@ class PolicySelectionDialog(QDialog):
         self.desc_label = QLabel()
         self.desc_label.setWordWrap(True)
         self.desc_label.setStyleSheet('color: #1976D2; font-style: italic; font-size: 10pt; padding: 10px; background-color: white; border-radius: 5px;')
-        self.update_description('standard')
         layout.addWidget(self.desc_label)
         
+        # Time limit (0 = none); starts at the policy's ttl_minutes
+        ttl_layout = QHBoxLayout()
+        ttl_label = QLabel('Stop sandbox after:')
+        ttl_label.setStyleSheet('font-weight: bold; font-size: 11pt; color: #424242;')
+        ttl_layout.addWidget(ttl_label)
+        self.ttl_spin = QSpinBox()
+        self.ttl_spin.setRange(0, 24 * 60)
+        self.ttl_spin.setSuffix(' min')
+        self.ttl_spin.setSpecialValueText('No time limit')
+        self.ttl_spin.setMinimumHeight(36)
+        ttl_layout.addWidget(self.ttl_spin)
+        ttl_layout.addStretch()
+        layout.addLayout(ttl_layout)
+        self.update_description('standard')
+        
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.setSpacing(15)
@@ -200,17 +232,26 @@ class PolicySelectionDialog(QDialog):
     
     def update_description(self, policy):
         """Update policy description"""
-        desc = SECURITY_POLICIES[policy]['description']
+        definition = get_security_policies()[policy]
+        desc = definition.get('description', policy)
         self.desc_label.setText(f"ℹ️ {desc}")
+        self.ttl_spin.setValue(int(definition.get('ttl_minutes') or 0))
     
     def accept(self):
         """User clicked Launch"""
         self.selected_policy = self.policy_combo.currentText()
+        # Unchanged: let the policy decide
+        default = int(get_security_policies()[self.selected_policy].get('ttl_minutes') or 0)
+        self.selected_ttl = self.ttl_spin.value() if self.ttl_spin.value() != default else None
         super().accept()
     
     def get_selected_policy(self):
         """Get the selected policy"""
         return self.selected_policy
+    
+    def get_selected_ttl(self):
+        """Time limit in minutes the user chose (None = the policy's)"""
+        return self.selected_ttl
 
 
 class InvisVMMainWindow(QMainWindow):
@@ -219,17 +260,48 @@ class InvisVMMainWindow(QMainWindow):
     Handles logic, events, and UI integration
     """
     
-    def __init__(self, file_path=None):
+    # Emitted from any thread when the sandbox registry changes
+    sandbox_changed = pyqtSignal(object)
+    # Emitted from the asyncio thread with the result of a background refresh
+    sandboxes_listed = pyqtSignal(object)
+    # Emitted from scheduler threads when the launch queue changes
+    launch_queue_changed = pyqtSignal()
+    # Emitted from scheduler threads with (ticket, show_dialog) when a launch ends
+    launch_finished = pyqtSignal(object, bool)
+    
+    def __init__(self, file_path=None, prometheus_textfile=PROMETHEUS_TEXTFILE,
+                 warm_pool=SANDBOX_POOL_ENABLED):
         """
         Initialize main window
         
         Args:
-            file_path: Optional file path to open immediately
+            file_path: Optional file path (or list of paths) to open immediately
+            prometheus_textfile: Optional .prom path to export fleet metrics to
+            warm_pool: Keep pre-started sandboxes for faster launches
         """
         super().__init__()
-        self.file_path = file_path
+        file_paths = [file_path] if isinstance(file_path, str) else list(file_path or [])
+        self.file_path = file_paths[0] if file_paths else None
         self.firejail_handler = FirejailHandler(log_callback=self.log_message)
         
+        # Background discovery runs on an asyncio loop, off the Qt thread
+        self.async_loop = AsyncLoopThread()
+        self.async_handler = AsyncFirejailHandler(self.firejail_handler)
+        self._refresh_future = None
+        
+        # Launches go through admission control so bulk opens cannot swamp the host
+        self.launch_scheduler = LaunchScheduler(self.firejail_handler)
+        
+        # Pre-started sandboxes that launches join (see sandbox_pool.py)
+        if warm_pool:
+            self.firejail_handler.start_pool()
+        
+        # Optional node_exporter textfile export
+        self.prometheus_exporter = None
+        if prometheus_textfile:
+            self.prometheus_exporter = PrometheusExporter(self.firejail_handler, prometheus_textfile)
+            self.prometheus_exporter.start()
+        
         # Setup logging
         self.setup_logging()
         
@@ -243,12 +315,23 @@ class InvisVMMainWindow(QMainWindow):
         self.refresh_timer.timeout.connect(self.auto_refresh_sandboxes)
         self.refresh_timer.start(2000)
         
+        # Repaint the table as soon as a sandbox starts or exits
+        self._shown_registry_version = -1
+        self.sandbox_changed.connect(self.on_sandbox_changed)
+        self.sandboxes_listed.connect(self.show_sandboxes)
+        self.firejail_handler.registry.subscribe(self.sandbox_changed.emit)
+        self.launch_queue_changed.connect(self.update_launch_queue)
+        self.launch_finished.connect(self.on_launch_finished)
+        self.launch_scheduler.subscribe(self.launch_queue_changed.emit)
+        
         # Initial refresh of sandboxes
         self.refresh_sandboxes()
         
-        # If file path provided, open it immediately (without dialog)
-        if file_path:
-            self.open_file_with_default_policy(file_path)
+        # If file paths provided, open them immediately (without dialog)
+        if len(file_paths) == 1:
+            self.open_file_with_default_policy(file_paths[0])
+        elif file_paths:
+            self.open_files_with_default_policy(file_paths)
     
     def setup_logging(self):
         """Setup logging configuration"""
@@ -277,7 +360,7 @@ class InvisVMMainWindow(QMainWindow):
         self.tabs = QTabWidget()
         
         # Import all UI components
-        from ui import LauncherTab, AppSearchLauncher, PoliciesTab, SandboxesTab, AboutTab
+        from ui import LauncherTab, AppSearchLauncher, PoliciesTab, SandboxesTab, AboutTab, DiagnosticsTab, HistoryTab
         
         # Create UI components from ui.py
         self.launcher_tab = LauncherTab(self)
@@ -285,12 +368,16 @@ class InvisVMMainWindow(QMainWindow):
         self.policies_tab = PoliciesTab()
         self.sandboxes_tab = SandboxesTab(self)
         self.about_tab = AboutTab(self.firejail_handler)
+        self.diagnostics_tab = DiagnosticsTab(self.firejail_handler)
+        self.history_tab = HistoryTab(self.firejail_handler)
         
         # Add tabs
         self.tabs.addTab(self.launcher_tab, '🚀 Launcher')
         self.tabs.addTab(self.search_launcher_tab, '🔍 Search Apps')  # NEW
         self.tabs.addTab(self.policies_tab, '🔒 Security Policies')
         self.tabs.addTab(self.sandboxes_tab, '📊 Active Sandboxes')
+        self.tabs.addTab(self.history_tab, '🕘 History')
+        self.tabs.addTab(self.diagnostics_tab, '🩺 Diagnostics')
         self.tabs.addTab(self.about_tab, 'ℹ️ About')
         
         layout.addWidget(self.tabs)
@@ -355,16 +442,7 @@ class InvisVMMainWindow(QMainWindow):
         self.launcher_tab.set_file_path(app_cmd)
         
         policy = self.launcher_tab.get_selected_policy()
-        success, pid, message = self.firejail_handler.launch_sandboxed(
-            app_cmd,
-            policy
-        )
-        
-        if success:
-            QMessageBox.information(self, '✓ Sandbox Started', message)
-            self.refresh_sandboxes()
-        else:
-            QMessageBox.critical(self, '✗ Error', message)
+        self.submit_launch(app_cmd, policy)
     
     def launch_sandboxed(self):
         """Launch selected file in sandbox"""
@@ -377,29 +455,63 @@ class InvisVMMainWindow(QMainWindow):
             return
         
         policy = self.launcher_tab.get_selected_policy()
-        success, pid, message = self.firejail_handler.launch_sandboxed(
-            self.file_path,
-            policy
-        )
-        
-        if success:
-            QMessageBox.information(self, '✓ Sandbox Started', message)
-            self.refresh_sandboxes()
-        else:
-            QMessageBox.critical(self, '✗ Error', message)
+        self.submit_launch(self.file_path, policy)
     
     def open_file_with_default_policy(self, file_path):
         """Open file with default (standard) policy"""
         self.file_path = file_path
         self.launcher_tab.set_file_path(os.path.basename(file_path))
         
-        policy = 'standard'
-        success, pid, message = self.firejail_handler.launch_sandboxed(
-            file_path,
-            policy
-        )
+        self.submit_launch(file_path, 'standard', show_dialog=False)
+    
+    def open_files_with_default_policy(self, file_paths):
+        """Open several files concurrently with default (standard) policy"""
+        self.launcher_tab.set_file_path(f'{len(file_paths)} files')
         
-        self.log_message(f'Opened: {message}')
+        self.launch_scheduler.submit_many(
+            file_paths,
+            'standard',
+            priority=PRIORITY_BATCH,
+            callback=lambda ticket: self.launch_finished.emit(ticket, False)
+        )
+        self.log_message(f'Queued {len(file_paths)} file(s) for launch')
+    
+    def submit_launch(self, path, policy, show_dialog=True):
+        """Queue an interactive launch; the result arrives in on_launch_finished"""
+        self.launch_scheduler.submit(
+            path,
+            policy,
+            priority=PRIORITY_INTERACTIVE,
+            callback=lambda ticket: self.launch_finished.emit(ticket, show_dialog)
+        )
+    
+    def on_launch_finished(self, ticket, show_dialog):
+        """Report a finished or cancelled launch (Qt thread)"""
+        success, pid, message = ticket.result
+        if ticket.state == 'cancelled':
+            self.log_message(f'Cancelled: {ticket.name}')
+        elif not show_dialog:
+            self.log_message(f'Opened: {message}')
+        elif success:
+            QMessageBox.information(self, '✓ Sandbox Started', message)
+            self.refresh_sandboxes()
+        else:
+            QMessageBox.critical(self, '✗ Error', message)
+    
+    def update_launch_queue(self):
+        """Show the scheduler's queued launches"""
+        tickets = self.launch_scheduler.queued()
+        self.sandboxes_tab.populate_queue([ticket.to_dict() for ticket in tickets])
+    
+    def cancel_queued_launch(self, ticket_id):
+        """Cancel one queued launch"""
+        if not self.launch_scheduler.cancel(ticket_id):
+            self.log_message('Launch already started; it can no longer be cancelled')
+    
+    def cancel_all_queued_launches(self):
+        """Cancel every queued launch"""
+        cancelled = self.launch_scheduler.cancel_all()
+        self.log_message(f'Cancelled {cancelled} queued launch(es)')
     
     # =========================================================================
     # SANDBOX MANAGEMENT - ROBUST DETECTION
@@ -417,11 +529,40 @@ class InvisVMMainWindow(QMainWindow):
         sandboxes = self.firejail_handler.get_active_sandboxes()
         
         # Update UI
+        self.show_sandboxes(sandboxes)
+    
+    def show_sandboxes(self, sandboxes):
+        """Populate the sandboxes table from a discovery result"""
+        self._shown_registry_version = self.firejail_handler.registry.version
         self.sandboxes_tab.populate_sandboxes(sandboxes)
     
+    def on_sandbox_changed(self, change):
+        """Show registry changes without a full discovery pass"""
+        snapshot = self.firejail_handler.registry.snapshot()
+        # Several queued changes collapse into one repaint
+        if snapshot.version <= self._shown_registry_version:
+            return
+        self._shown_registry_version = snapshot.version
+        self.sandboxes_tab.populate_sandboxes([record.to_dict() for record in snapshot.values()])
+    
     def auto_refresh_sandboxes(self):
-        """Auto-refresh sandboxes (called by timer)"""
-        self.refresh_sandboxes()
+        """
+        Auto-refresh sandboxes (called by timer)
+        Discovery (firejail --list, state file) runs on the asyncio thread
+        """
+        if self._refresh_future is not None and not self._refresh_future.done():
+            return
+        self._refresh_future = self.async_loop.submit(self.async_handler.list())
+        self._refresh_future.add_done_callback(self._on_sandboxes_listed)
+    
+    def _on_sandboxes_listed(self, future):
+        """Runs on the asyncio thread; hand the result to the Qt thread"""
+        try:
+            sandboxes = future.result()
+        except Exception as e:
+            self.firejail_handler.log(f'Background refresh failed: {str(e)}', 'WARNING')
+            return
+        self.sandboxes_listed.emit(sandboxes)
     
     def kill_sandbox_action(self, pid):
         """Kill a specific sandbox"""
@@ -442,6 +583,51 @@ class InvisVMMainWindow(QMainWindow):
             else:
                 QMessageBox.critical(self, '✗ Error', message)
     
+    def freeze_sandbox_action(self, pid):
+        """Freeze a running sandbox, or thaw a frozen one"""
+        record = self.firejail_handler.registry.get(pid)
+        if record is not None and record.frozen:
+            success, message = self.firejail_handler.thaw_sandbox(pid)
+        else:
+            success, message = self.firejail_handler.freeze_sandbox(pid)
+        
+        if success:
+            self.refresh_sandboxes()
+        else:
+            QMessageBox.critical(self, '✗ Error', message)
+    
+    def freeze_all_sandboxes(self):
+        """Freeze all running sandboxes"""
+        results = self.firejail_handler.freeze_sandboxes()
+        self.refresh_sandboxes()
+        failed = [message for _, success, message in results if not success]
+        if failed:
+            QMessageBox.warning(self, 'Freeze All', '\n'.join(failed))
+    
+    def thaw_all_sandboxes(self):
+        """Thaw all frozen sandboxes"""
+        results = self.firejail_handler.thaw_sandboxes()
+        self.refresh_sandboxes()
+        failed = [message for _, success, message in results if not success]
+        if failed:
+            QMessageBox.warning(self, 'Thaw All', '\n'.join(failed))
+    
+    def show_sandbox_output(self, pid):
+        """Open a live view of a sandbox's stdout/stderr"""
+        output = self.firejail_handler.get_sandbox_output(pid)
+        if output is None:
+            QMessageBox.information(
+                self,
+                'No Output',
+                'Output is only captured for sandboxes launched from this window.'
+            )
+            return
+        record = self.firejail_handler.registry.get(pid)
+        name = record.name if record is not None else f'Process {pid}'
+        dialog = OutputViewerDialog(output, name, pid, self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+    
     def kill_all_sandboxes(self):
         """Kill all active sandboxes"""
         sandboxes = self.firejail_handler.get_active_sandboxes()
@@ -518,53 +704,136 @@ class InvisVMMainWindow(QMainWindow):
 # CONTEXT MENU POLICY DIALOG HANDLER (STANDALONE MODE)
 # ============================================================================
 
-def launch_with_policy_dialog(file_path):
+def launch_with_policy_dialog(file_paths, max_parallel=MULTI_LAUNCH_MAX_PARALLEL):
     """
-    Launch file with policy selection dialog (for context menu)
+    Launch one or more files with a single policy selection dialog (for context menu)
+    All files share one process and one policy; launches run concurrently
     CRITICAL: Uses shared state file so main GUI can detect it
     """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    
     app = QApplication(sys.argv)
     
     # Show policy selection dialog
-    dialog = PolicySelectionDialog(file_path)
+    dialog = PolicySelectionDialog(file_paths)
     result = dialog.exec_()
     
     if result == QDialog.Accepted:
         policy = dialog.get_selected_policy()
+        ttl_minutes = dialog.get_selected_ttl()
         
         # Close the dialog first
         dialog.close()
         app.processEvents()
         
         # CRITICAL: Create handler that saves to shared state file
-        handler = FirejailHandler()
+        # (the GUI watches the sandboxes of other processes)
+        handler = FirejailHandler(adopt=False)
         
-        # Launch sandbox - this will save to state file
-        success, pid, message = handler.launch_sandboxed(file_path, policy)
+        # Launch sandboxes through admission control - each launch saves to state file
+        scheduler = LaunchScheduler(handler, max_in_flight=max_parallel)
+        priority = PRIORITY_INTERACTIVE if len(file_paths) == 1 else PRIORITY_BATCH
+        tickets = scheduler.submit_many(file_paths, policy, priority=priority, ttl_minutes=ttl_minutes)
+        _wait_for_tickets(app, scheduler, tickets)
+        results = [(ticket.path, *ticket.result) for ticket in tickets]
         
         # Force immediate state save
-        if success:
+        if any(success for _, success, _, _ in results):
             handler.save_state()
-            
+        
         # Show result dialog
         msg_box = QMessageBox()
         msg_box.setWindowFlags(Qt.WindowStaysOnTopHint)
         
-        if success:
-            msg_box.setIcon(QMessageBox.Information)
-            msg_box.setWindowTitle('✓ Sandbox Started')
-            msg_box.setText(f'{message}\n\nThe application is now running in a secure {policy} sandbox.')
-            msg_box.setInformativeText(f'Process ID: {pid}\n\nOpen InvisVM GUI to monitor this sandbox in the Active Sandboxes tab.')
+        if len(results) > 1:
+            _show_launch_summary(msg_box, results, policy)
         else:
-            msg_box.setIcon(QMessageBox.Critical)
-            msg_box.setWindowTitle('✗ Error')
-            msg_box.setText(f'Failed to start sandbox:\n\n{message}')
+            _, success, pid, message = results[0]
+            _show_launch_result(msg_box, success, pid, message, policy)
         
         msg_box.exec_()
+        
+        # Time limits, watchdog rules and RAM budgets are enforced by this
+        # process; stay in the background until those sandboxes have exited
+        _supervise(handler, [pid for _, success, pid, _ in results if success])
     
     sys.exit(0)
 
 
+def _supervise(handler, pids, interval=1.0):
+    """
+    Keep the context-menu process running, without a window, while a sandbox
+    it launched has limits enforced from here; the handler's monitor threads,
+    watchdog and TTL scheduler do the work
+    """
+    pids = [pid for pid in pids if handler.has_enforced_limits(pid)]
+    while any(pid in handler.registry for pid in pids):
+        time.sleep(interval)
+
+
+def _wait_for_tickets(app, scheduler, tickets):
+    """
+    Keep the context-menu process alive until every launch has started
+    A progress dialog shows what is queued and lets the user cancel the rest
+    """
+    progress = QProgressDialog('Starting sandboxes...', 'Cancel Queued', 0, len(tickets))
+    progress.setWindowTitle('InvisVM')
+    progress.setWindowFlags(progress.windowFlags() | Qt.WindowStaysOnTopHint)
+    progress.setMinimumDuration(500)
+    
+    while True:
+        finished = sum(1 for ticket in tickets if ticket.done())
+        if finished == len(tickets):
+            break
+        if progress.wasCanceled():
+            scheduler.cancel_all()
+        queued = [ticket for ticket in tickets if ticket.state == 'queued']
+        label = f'Started {finished} of {len(tickets)} sandbox(es)'
+        if queued and queued[0].waiting_for:
+            label += f'\n{len(queued)} queued: waiting for {queued[0].waiting_for}'
+        progress.setLabelText(label)
+        progress.setValue(finished)
+        app.processEvents()
+        tickets[-1].wait(0.1)
+    
+    progress.close()
+    scheduler.stop()
+
+
+def _show_launch_result(msg_box, success, pid, message, policy):
+    """Fill result dialog for a single launch"""
+    if success:
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.setWindowTitle('✓ Sandbox Started')
+        msg_box.setText(f'{message}\n\nThe application is now running in a secure {policy} sandbox.')
+        msg_box.setInformativeText(f'Process ID: {pid}\n\nOpen InvisVM GUI to monitor this sandbox in the Active Sandboxes tab.')
+    else:
+        msg_box.setIcon(QMessageBox.Critical)
+        msg_box.setWindowTitle('✗ Error')
+        msg_box.setText(f'Failed to start sandbox:\n\n{message}')
+
+
+def _show_launch_summary(msg_box, results, policy):
+    """Fill result dialog for a multi-file launch"""
+    launched = [r for r in results if r[1]]
+    failed = [r for r in results if not r[1]]
+    
+    if failed:
+        msg_box.setIcon(QMessageBox.Warning if launched else QMessageBox.Critical)
+        msg_box.setWindowTitle('⚠ Some Sandboxes Failed' if launched else '✗ Error')
+    else:
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.setWindowTitle('✓ Sandboxes Started')
+    
+    msg_box.setText(f'Started {len(launched)} of {len(results)} sandbox(es) with the {policy} policy.')
+    msg_box.setInformativeText('Open InvisVM GUI to monitor these sandboxes in the Active Sandboxes tab.')
+    
+    lines = [f'✓ {os.path.basename(path)} (PID: {pid})' for path, _, pid, _ in launched]
+    lines += [f'✗ {os.path.basename(path)}: {message}' for path, _, _, message in failed]
+    msg_box.setDetailedText('\n'.join(lines))
+
+
 # ============================================================================
 # ENTRY POINT
 # ============================================================================
@@ -572,13 +841,22 @@ def launch_with_policy_dialog(file_path):
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description='InvisVM - Security Sandbox Launcher')
-    parser.add_argument('--file', help='File to open in sandbox')
+    parser.add_argument('--file', action='append', help='File to open in sandbox (repeat for several files)')
+    parser.add_argument('--max-parallel', type=int, default=MULTI_LAUNCH_MAX_PARALLEL,
+                        help='Maximum concurrent launches when opening several files')
     parser.add_argument('--install-menu', action='store_true', help='Install context menu')
     parser.add_argument('--uninstall-menu', action='store_true', help='Uninstall context menu')
     parser.add_argument('--select-policy', action='store_true', help='Show policy selection dialog for context menu')
+    parser.add_argument('--prometheus-textfile', default=PROMETHEUS_TEXTFILE,
+                        help='Export fleet metrics to this .prom file (node_exporter textfile collector)')
+    parser.add_argument('--warm-pool', action='store_true', default=SANDBOX_POOL_ENABLED,
+                        help='Keep pre-started sandboxes so launches skip sandbox setup')
     
     args = parser.parse_args()
     
+    # kill -USR1 <pid> writes ~/InvisVM/logs/metrics-<pid>.json
+    install_sigusr1_dump()
+    
     # Handle context menu installation
     if args.install_menu:
         installer = ContextMenuInstaller()
@@ -595,12 +873,13 @@ def main():
     
     # Handle context menu with policy selection
     if args.select_policy and args.file:
-        launch_with_policy_dialog(args.file)
+        launch_with_policy_dialog(args.file, max_parallel=args.max_parallel)
         return
     
     # Launch GUI application
     app = QApplication(sys.argv)
-    window = InvisVMMainWindow(file_path=args.file)
+    window = InvisVMMainWindow(file_path=args.file, prometheus_textfile=args.prometheus_textfile,
+                               warm_pool=args.warm_pool)
     window.show()
     sys.exit(app.exec_())
 
@@ -0,0 +1,228 @@
+"""
+Metrics Module
+Low-overhead, always-on timers and counters for InvisVM operations
+
+Histograms use fixed 1-2-5 buckets (10 µs .. 100 s), so recording is a
+bisect plus a few additions under a per-metric lock. A snapshot of every
+metric is available through METRICS.snapshot(), the Diagnostics tab, and
+a JSON dump on SIGUSR1.
+"""
+
+import os
+import json
+import time
+import signal
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Bucket upper bounds in seconds: 10us, 20us, 50us, ... 50s, 100s
+BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 3) for m in (1, 2, 5))
+
+DUMP_FILE = os.path.expanduser('~/InvisVM/logs/metrics-{pid}.json')
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations (seconds) or other values
+    """
+    __slots__ = ('name', 'bounds', 'counts', 'count', 'total', 'min', 'max', '_lock')
+
+    def __init__(self, name, bounds=BUCKETS):
+        self.name = name
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the matching bucket"""
+        with self._lock:
+            counts = list(self.counts)
+            count, low, high = self.count, self.min, self.max
+        if not count:
+            return 0.0
+        target = q * count
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= target:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else high
+                value = lower + (upper - lower) * ((target - seen) / c)
+                return min(max(value, low), high)
+            seen += c
+        return high
+
+    def cumulative(self):
+        """
+        Prometheus-style view
+        Returns: ([(upper_bound, cumulative_count), ...], count, sum)
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.total
+        running = 0
+        buckets = []
+        for bound, c in zip(self.bounds + (float('inf'),), counts):
+            running += c
+            buckets.append((bound, running))
+        return buckets, count, total
+
+    def snapshot(self):
+        with self._lock:
+            count, total = self.count, self.total
+            low, high = self.min, self.max
+            buckets = [
+                (bound, c) for bound, c in zip(self.bounds + (float('inf'),), self.counts) if c
+            ]
+        return {
+            'type': 'histogram',
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'min': low or 0.0,
+            'max': high or 0.0,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class Counter:
+    """
+    Monotonic counter
+    """
+    __slots__ = ('name', 'value', '_lock')
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {'type': 'counter', 'value': self.value}
+
+
+class MetricsRegistry:
+    """
+    Named histograms and counters, created on first use
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+
+    def _get(self, name, cls):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name)
+                    self._metrics[name] = metric
+        return metric
+
+    def histogram(self, name):
+        return self._get(name, Histogram)
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def observe(self, name, value):
+        self._get(name, Histogram).observe(value)
+
+    def inc(self, name, amount=1):
+        self._get(name, Counter).inc(amount)
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block into histogram `name` (seconds)"""
+        histogram = self._get(name, Histogram)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of timer()"""
+        def decorator(func):
+            histogram = self._get(name, Histogram)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Return {name: snapshot} for every metric"""
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return {name: metric.snapshot() for name, metric in sorted(metrics)}
+
+    def dump_json(self, path=None):
+        """Write a snapshot to a JSON file; returns the path"""
+        path = path or DUMP_FILE.format(pid=os.getpid())
+        data = {
+            'pid': os.getpid(),
+            'started': self.started.isoformat(),
+            'dumped': datetime.now().isoformat(),
+            'metrics': self.snapshot(),
+        }
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+
+# Process-wide registry
+METRICS = MetricsRegistry()
+
+
+def install_sigusr1_dump(registry=None, path=None):
+    """
+    Dump metrics to JSON when the process receives SIGUSR1
+    (kill -USR1 <pid>; file: ~/InvisVM/logs/metrics-<pid>.json)
+    Must be called from the main thread
+    """
+    registry = registry or METRICS
+
+    def handler(signum, frame):
+        try:
+            registry.dump_json(path)
+        except Exception:
+            pass
+
+    try:
+        signal.signal(signal.SIGUSR1, handler)
+        return True
+    except (ValueError, AttributeError, OSError):
+        return False
@@ -0,0 +1,413 @@
+"""
+MIME Handler Resolver
+Host-side lookup of the app that opens a MIME type, as xdg-open would
+
+Launching `xdg-open <file>` inside the sandbox costs a shell script and
+desktop detection per launch, and hides the real app from the D-Bus and
+device decisions. The resolver reads the same data xdg-open/GIO use:
+  - mimeapps.list (user, system and desktop-specific, XDG precedence):
+    [Default Applications], [Added Associations], [Removed Associations]
+  - applications/mimeinfo.cache written by update-desktop-database
+  - mime/subclasses and mime/aliases of shared-mime-info, so text/x-python
+    falls back to text/plain handlers
+into an in-memory index that is rebuilt only when one of those files (or
+an applications directory) changes mtime. .desktop files are parsed on
+demand and cached by mtime, and their Exec line is expanded per the
+Desktop Entry spec (%f %F %u %U %i %c %k).
+
+    handler = default_mime_resolver.resolve('application/pdf')
+    argv = handler.command('/home/me/doc.pdf')   # ['evince', '/home/me/doc.pdf']
+"""
+
+import os
+import re
+import shutil
+import threading
+
+from config import HOME_DIR, MIME_HANDLER_SKIP_EXECUTABLES
+from metrics import METRICS
+
+# A field code in an Exec argument, e.g. the %f of --file=%f
+FIELD_CODE = re.compile(r'%(.)')
+
+
+def xdg_dirs():
+    """(config dirs, data dirs), most important first"""
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(HOME_DIR, '.config')
+    config_dirs = (os.environ.get('XDG_CONFIG_DIRS') or '/etc/xdg').split(':')
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(HOME_DIR, '.local/share')
+    data_dirs = (os.environ.get('XDG_DATA_DIRS') or '/usr/local/share:/usr/share').split(':')
+    return [config_home] + [d for d in config_dirs if d], [data_home] + [d for d in data_dirs if d]
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def parse_ini(path):
+    """
+    Minimal desktop-entry/keyfile parser
+    Returns: {section: {key: value}} (localized keys and comments skipped)
+    """
+    sections = {}
+    current = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                current = sections.setdefault(line[1:-1], {})
+                continue
+            if current is None or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            key = key.strip()
+            if '[' in key:
+                continue
+            current[key] = value.strip()
+    return sections
+
+
+def split_list(value):
+    return [item for item in value.split(';') if item]
+
+
+def _unescape_string(value):
+    """Desktop entry string escapes: \\s \\n \\t \\r \\\\"""
+    out = []
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch == '\\' and i + 1 < len(value):
+            nxt = value[i + 1]
+            out.append({'s': ' ', 'n': '\n', 't': '\t', 'r': '\r', '\\': '\\'}.get(nxt, '\\' + nxt))
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def split_exec(value):
+    """
+    Split an Exec value into arguments (double quotes with \\" \\` \\$ \\\\ escapes)
+    Raises ValueError for unbalanced quotes
+    """
+    value = _unescape_string(value)
+    args = []
+    current = []
+    in_arg = False
+    quoted = False
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if quoted:
+            if ch == '\\' and i + 1 < len(value) and value[i + 1] in '"`$\\':
+                current.append(value[i + 1])
+                i += 2
+                continue
+            if ch == '"':
+                quoted = False
+            else:
+                current.append(ch)
+        elif ch == '"':
+            quoted = True
+            in_arg = True
+        elif ch in ' \t':
+            if in_arg:
+                args.append(''.join(current))
+                current = []
+                in_arg = False
+        else:
+            current.append(ch)
+            in_arg = True
+        i += 1
+    if quoted:
+        raise ValueError(f'Unbalanced quotes in Exec: {value}')
+    if in_arg:
+        args.append(''.join(current))
+    return args
+
+
+class DesktopHandler:
+    """An installed application that can open files"""
+
+    __slots__ = ('desktop_id', 'path', 'name', 'exec_args', 'icon', 'terminal')
+
+    def __init__(self, desktop_id, path, name, exec_args, icon='', terminal=False):
+        self.desktop_id = desktop_id
+        self.path = path
+        self.name = name
+        self.exec_args = exec_args
+        self.icon = icon
+        self.terminal = terminal
+
+    @property
+    def executable(self):
+        """Program name, e.g. 'evince'"""
+        return os.path.basename(self.exec_args[0])
+
+    def command(self, target):
+        """
+        Expand the Exec field codes for one file or URL
+        The target is appended if the Exec line has no %f %F %u %U
+        """
+        argv = []
+        expanded = []
+
+        def field(match):
+            code = match.group(1)
+            if code in 'fFuU':
+                expanded.append(code)
+                return target
+            if code == 'c':
+                return self.name
+            if code == 'k':
+                return self.path
+            if code == 'i':
+                return self.icon
+            if code == '%':
+                return '%'
+            return ''       # deprecated (%d %D %n %N %v %m) or invalid
+
+        for arg in self.exec_args:
+            if arg in ('%f', '%F', '%u', '%U'):
+                argv.append(target)
+                expanded.append(arg)
+            elif arg == '%i':
+                if self.icon:
+                    argv.extend(['--icon', self.icon])
+            elif arg in ('%d', '%D', '%n', '%N', '%v', '%m'):
+                continue    # deprecated, dropped per spec
+            else:
+                argv.append(FIELD_CODE.sub(field, arg))
+        if not expanded:
+            argv.append(target)
+        return argv
+
+    def __repr__(self):
+        return f'DesktopHandler({self.desktop_id!r}, {self.exec_args!r})'
+
+
+class MimeResolver:
+    """
+    MIME type -> DesktopHandler, following mimeapps.list and mimeinfo.cache
+    """
+
+    def __init__(self, skip_executables=MIME_HANDLER_SKIP_EXECUTABLES):
+        self.skip_executables = set(skip_executables)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._defaults = {}         # mime -> [desktop id] from [Default Applications]
+        self._added = {}            # mime -> [desktop id] from [Added Associations]
+        self._removed = {}          # mime -> {desktop id}
+        self._cached = {}           # mime -> [desktop id] from mimeinfo.cache
+        self._parents = {}          # mime -> [parent mime]
+        self._aliases = {}          # alias -> canonical mime
+        self._app_dirs = []
+        self._desktop_files = {}    # path -> (mtime, DesktopHandler or None)
+        self._resolved = {}         # mime -> (DesktopHandler or None, ((desktop file, mtime), ...) read for it)
+        self._by_executable = None  # executable -> app name
+
+    # ---- index ----
+
+    def _sources(self):
+        """Files and directories whose mtimes decide whether the index is current"""
+        config_dirs, data_dirs = xdg_dirs()
+        desktops = [d.lower() for d in os.environ.get('XDG_CURRENT_DESKTOP', '').split(':') if d]
+        mimeapps = []
+        for directory in config_dirs + [os.path.join(d, 'applications') for d in data_dirs]:
+            for desktop in desktops:
+                mimeapps.append(os.path.join(directory, f'{desktop}-mimeapps.list'))
+            mimeapps.append(os.path.join(directory, 'mimeapps.list'))
+        app_dirs = [os.path.join(d, 'applications') for d in data_dirs]
+        mime_dirs = [os.path.join(d, 'mime') for d in data_dirs]
+        return mimeapps, app_dirs, mime_dirs
+
+    def _current(self):
+        """Rebuild the index if any source changed; caller holds the lock"""
+        mimeapps, app_dirs, mime_dirs = self._sources()
+        watched = mimeapps + app_dirs + [os.path.join(d, 'mimeinfo.cache') for d in app_dirs]
+        watched += [os.path.join(d, name) for d in mime_dirs for name in ('subclasses', 'aliases')]
+        signature = tuple(_mtime(path) for path in watched)
+        if signature == self._signature:
+            return
+        with METRICS.timer('mime.index_build'):
+            self._build(mimeapps, app_dirs, mime_dirs)
+        self._signature = signature
+
+    def _build(self, mimeapps, app_dirs, mime_dirs):
+        self._defaults, self._added, self._removed, self._cached = {}, {}, {}, {}
+        self._parents, self._aliases = {}, {}
+        self._resolved = {}
+        self._by_executable = None
+        self._app_dirs = [d for d in app_dirs if os.path.isdir(d)]
+
+        # Earlier files take precedence; later ones only add what is missing
+        for path in mimeapps:
+            try:
+                sections = parse_ini(path)
+            except OSError:
+                continue
+            for mime, value in sections.get('Default Applications', {}).items():
+                self._defaults.setdefault(mime, []).extend(split_list(value))
+            for mime, value in sections.get('Added Associations', {}).items():
+                self._added.setdefault(mime, []).extend(split_list(value))
+            for mime, value in sections.get('Removed Associations', {}).items():
+                self._removed.setdefault(mime, set()).update(split_list(value))
+
+        for directory in self._app_dirs:
+            try:
+                sections = parse_ini(os.path.join(directory, 'mimeinfo.cache'))
+            except OSError:
+                continue
+            for mime, value in sections.get('MIME Cache', {}).items():
+                self._cached.setdefault(mime, []).extend(split_list(value))
+
+        for directory in mime_dirs:
+            for name, target in (('subclasses', self._parents), ('aliases', self._aliases)):
+                try:
+                    with open(os.path.join(directory, name), 'r') as f:
+                        for line in f:
+                            parts = line.split()
+                            if len(parts) != 2:
+                                continue
+                            if name == 'subclasses':
+                                target.setdefault(parts[0], []).append(parts[1])
+                            else:
+                                target.setdefault(parts[0], parts[1])
+                except OSError:
+                    continue
+
+    # ---- desktop files ----
+
+    def _desktop_path(self, desktop_id):
+        """Find a desktop id (foo-bar.desktop may live at foo/bar.desktop)"""
+        candidates = [desktop_id]
+        if '-' in desktop_id:
+            candidates.append(desktop_id.replace('-', '/', 1))
+        for directory in self._app_dirs:
+            for candidate in candidates:
+                path = os.path.join(directory, candidate)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def _load(self, desktop_id, read=None):
+        """
+        Parsed, launchable handler for a desktop id, or None
+        read: list the desktop file's (path, mtime) is appended to
+        """
+        path = self._desktop_path(desktop_id)
+        if path is None:
+            return None
+        mtime = _mtime(path)
+        if read is not None:
+            read.append((path, mtime))
+        cached = self._desktop_files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        handler = None
+        try:
+            entry = parse_ini(path).get('Desktop Entry', {})
+            handler = self._handler_from_entry(desktop_id, path, entry)
+        except (OSError, ValueError):
+            pass
+        self._desktop_files[path] = (mtime, handler)
+        return handler
+
+    def _handler_from_entry(self, desktop_id, path, entry):
+        if entry.get('Type', 'Application') != 'Application' or entry.get('Hidden') == 'true':
+            return None
+        try_exec = entry.get('TryExec')
+        if try_exec and shutil.which(try_exec) is None:
+            return None
+        exec_args = split_exec(entry.get('Exec', ''))
+        if not exec_args or shutil.which(exec_args[0]) is None:
+            return None
+        handler = DesktopHandler(
+            desktop_id, path,
+            name=entry.get('Name', desktop_id[:-len('.desktop')]),
+            exec_args=exec_args,
+            icon=entry.get('Icon', ''),
+            terminal=entry.get('Terminal') == 'true'
+        )
+        # Terminal apps need a terminal; sandbox-in-sandbox launchers cannot run in firejail
+        if handler.terminal or handler.executable in self.skip_executables:
+            return None
+        return handler
+
+    # ---- lookups ----
+
+    def _candidates(self, mime):
+        """Desktop ids for one MIME type, in xdg-open's order"""
+        removed = self._removed.get(mime, set())
+        ordered = self._defaults.get(mime, []) + self._added.get(mime, []) + self._cached.get(mime, [])
+        seen = set()
+        for desktop_id in ordered:
+            if desktop_id not in seen and desktop_id not in removed:
+                seen.add(desktop_id)
+                yield desktop_id
+
+    def _lineage(self, mime):
+        """The MIME type, then its parents breadth-first; text/* ends at text/plain"""
+        queue = [self._aliases.get(mime, mime)]
+        seen = set()
+        while queue:
+            current = queue.pop(0)
+            if current in seen:
+                continue
+            seen.add(current)
+            yield current
+            queue.extend(self._parents.get(current, ()))
+        if mime.startswith('text/') and 'text/plain' not in seen:
+            yield 'text/plain'
+
+    def resolve(self, mime):
+        """
+        Default handler of a MIME type
+        Returns: DesktopHandler or None (leave it to xdg-open)
+        """
+        if not mime:
+            return None
+        with self._lock:
+            self._current()
+            # Desktop files edited in place leave the directory mtimes alone
+            cached = self._resolved.get(mime)
+            if cached is not None and all(_mtime(path) == mtime for path, mtime in cached[1]):
+                METRICS.inc('mime.cache_hit')
+                return cached[0]
+            handler = None
+            read = []
+            for candidate_mime in self._lineage(mime):
+                for desktop_id in self._candidates(candidate_mime):
+                    handler = self._load(desktop_id, read)
+                    if handler is not None:
+                        break
+                if handler is not None:
+                    break
+            self._resolved[mime] = (handler, tuple(read))
+            METRICS.inc('mime.resolved' if handler is not None else 'mime.unresolved')
+            return handler
+
+    def app_name(self, executable):
+        """Desktop name of a handler by program name, e.g. 'evince' -> 'Document Viewer'"""
+        with self._lock:
+            self._current()
+            if self._by_executable is None:
+                names = {}
+                for ids in list(self._defaults.values()) + list(self._added.values()) + list(self._cached.values()):
+                    for desktop_id in ids:
+                        handler = self._load(desktop_id)
+                        if handler is not None:
+                            names.setdefault(handler.executable, handler.name)
+                self._by_executable = names
+            return self._by_executable.get(executable)
+
+
+# Shared by every handler in the process
+default_mime_resolver = MimeResolver()
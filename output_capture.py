@@ -0,0 +1,195 @@
+"""
+Output Capture Module
+Collects stdout/stderr of sandboxed applications without unbounded memory or disk use
+
+One daemon thread services every sandbox pipe through a selector. Each
+sandbox gets an OutputBuffer: a fixed-size ring of its most recent output,
+plus an optional, rate-limited spill of whole lines to its sandbox log.
+"""
+
+import os
+import selectors
+import threading
+import time
+
+from config import OUTPUT_BUFFER_BYTES, OUTPUT_SPILL_RATE, OUTPUT_SPILL_BURST
+from metrics import METRICS
+
+READ_SIZE = 65536
+
+# Longest partial line held back from the spill before it is forced out
+MAX_LINE_BYTES = 4096
+
+
+class OutputBuffer:
+    """
+    Bounded output of one sandbox
+    Keeps the last `capacity` bytes; older output is dropped and counted
+    """
+
+    def __init__(self, capacity=OUTPUT_BUFFER_BYTES, spill=None,
+                 spill_rate=OUTPUT_SPILL_RATE, spill_burst=OUTPUT_SPILL_BURST):
+        self.capacity = capacity
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        self.closed = threading.Event()
+        self._data = bytearray()
+        self._lock = threading.Lock()
+
+        # Spill: spill(text) receives whole lines, at most spill_rate bytes/s
+        self._spill = spill
+        self._spill_rate = spill_rate
+        self._spill_burst = spill_burst
+        self._tokens = float(spill_burst)
+        self._refilled = time.monotonic()
+        self._partial = b''
+        self.suppressed_bytes = 0
+
+    def append(self, data):
+        """Add a chunk read from the pipe"""
+        with self._lock:
+            self._data += data
+            self.total_bytes += len(data)
+            excess = len(self._data) - self.capacity
+            if excess > 0:
+                del self._data[:excess]
+                self.dropped_bytes += excess
+        if self._spill is not None:
+            self._spill_lines(data)
+
+    def _spill_lines(self, data):
+        """Forward complete lines to the spill callback within the rate limit"""
+        data = self._partial + data
+        end = data.rfind(b'\n') + 1
+        if end == 0 and len(data) < MAX_LINE_BYTES:
+            self._partial = data
+            return
+        if end == 0:
+            end = len(data)
+        chunk, self._partial = data[:end], data[end:]
+
+        now = time.monotonic()
+        self._tokens = min(self._spill_burst, self._tokens + (now - self._refilled) * self._spill_rate)
+        self._refilled = now
+
+        if len(chunk) > self._tokens:
+            self.suppressed_bytes += len(chunk)
+            METRICS.inc('output.spill_suppressed_bytes', len(chunk))
+            return
+        self._tokens -= len(chunk)
+
+        text = chunk.decode('utf-8', errors='replace')
+        if self.suppressed_bytes:
+            text = f'[... {self.suppressed_bytes} bytes not logged (rate limit) ...]\n' + text
+            self.suppressed_bytes = 0
+        try:
+            self._spill(text)
+        except Exception:
+            pass
+
+    def close(self):
+        """Pipe reached EOF; flush any held-back partial line"""
+        if self._spill is not None and self._partial:
+            partial, self._partial = self._partial, b''
+            self._spill_lines(partial + b'\n')
+        if self._spill is not None and self.suppressed_bytes:
+            try:
+                self._spill(f'[... {self.suppressed_bytes} bytes not logged (rate limit) ...]\n')
+            except Exception:
+                pass
+            self.suppressed_bytes = 0
+        self.closed.set()
+
+    def wait_closed(self, timeout=None):
+        """Wait for EOF (the app and any children closed their output)"""
+        return self.closed.wait(timeout)
+
+    def tail(self, max_bytes=None):
+        """Most recent output as text"""
+        with self._lock:
+            data = bytes(self._data if max_bytes is None else self._data[-max_bytes:])
+        return data.decode('utf-8', errors='replace')
+
+    def summary(self):
+        """One-line description of what was captured"""
+        text = f'{self.total_bytes} bytes of output'
+        if self.dropped_bytes:
+            text += f' ({self.dropped_bytes} oldest bytes not kept)'
+        return text
+
+
+class OutputCapture:
+    """
+    Single I/O loop reading every attached pipe
+    """
+
+    def __init__(self, capacity=OUTPUT_BUFFER_BYTES):
+        self.capacity = capacity
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._thread = None
+        self._wake_r, self._wake_w = None, None
+
+    def attach(self, pipe, spill=None):
+        """
+        Start capturing a pipe (e.g. Popen.stdout); the capture closes it at EOF
+        Returns: OutputBuffer
+        """
+        buffer = OutputBuffer(self.capacity, spill)
+        os.set_blocking(pipe.fileno(), False)
+        with self._lock:
+            self._ensure_thread()
+            self._pending.append((pipe, buffer))
+        os.write(self._wake_w, b'\0')
+        return buffer
+
+    def _ensure_thread(self):
+        """Start the I/O thread on first use; caller holds the lock"""
+        if self._thread is not None:
+            return
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._thread = threading.Thread(target=self._run, name='output-capture', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._accept_pending()
+                    continue
+                pipe, buffer = key.data
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if data:
+                    buffer.append(data)
+                    METRICS.inc('output.bytes_captured', len(data))
+                else:
+                    self._selector.unregister(key.fd)
+                    try:
+                        pipe.close()
+                    except OSError:
+                        pass
+                    buffer.close()
+
+    def _accept_pending(self):
+        """Register pipes queued by attach()"""
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for pipe, buffer in pending:
+            self._selector.register(pipe.fileno(), selectors.EVENT_READ, (pipe, buffer))
+
+
+# Shared by every handler in the process
+default_capture = OutputCapture()
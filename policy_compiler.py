@@ -0,0 +1,385 @@
+"""
+Policy Compiler Module
+Compiles declarative SECURITY_POLICIES into immutable firejail argv templates
+
+Each policy is compiled once per variant (the capabilities of the app that
+its 'auto' settings depend on) and cached by the SHA-256 of its definition, so building a launch command is a cheap merge of a
+template and the app-specific tail. Policies from POLICY_OVERRIDES_FILE
+are merged over config.SECURITY_POLICIES and hot-reloaded on change.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+import config
+
+# Minimum seconds between checks of the overrides file
+RELOAD_CHECK_INTERVAL = 1.0
+
+NETWORK_ALLOWED_FLAGS = ('--protocol=unix,inet,inet6,netlink',)
+NETWORK_BLOCKED_FLAGS = ('--net=none',)
+
+
+class CompiledPolicy:
+    """
+    Immutable, pre-built firejail arguments for one policy variant
+    """
+    __slots__ = ('name', 'digest', 'needs', 'argv', 'description', 'summary',
+                 'resources', 'resource_argv', 'home', 'home_template', 'tmpfs_action', 'reuse',
+                 'watchdog', 'idle_freeze', 'ttl')
+
+    def __init__(self, name, digest, needs, argv, description, summary, resources=None,
+                 home='real', home_template=None, tmpfs_action='kill', reuse=False, watchdog=(),
+                 idle_freeze=0, ttl=0):
+        self.name = name
+        self.digest = digest
+        self.needs = frozenset(needs)       # app capabilities this variant allows
+        self.argv = tuple(argv)
+        self.description = description
+        self.summary = summary
+        self.resources = dict(resources or {})
+        self.resource_argv = tuple(resource_flags(self.resources))
+        self.home = home
+        self.home_template = home_template
+        self.tmpfs_action = tmpfs_action
+        self.reuse = reuse
+        self.watchdog = tuple(watchdog)     # validated rule dicts
+        self.idle_freeze = idle_freeze      # seconds without I/O before freezing (0 = never)
+        self.ttl = ttl                      # seconds after launch the sandbox is stopped (0 = never)
+
+    def merged_resources(self, overrides=None):
+        """Policy resources with per-launch overrides applied (None removes a limit)"""
+        if not overrides:
+            return dict(self.resources)
+        merged = dict(self.resources)
+        merged.update(validate_resources(self.name, overrides))
+        return {key: value for key, value in merged.items() if value is not None}
+
+    def command(self, tail, resource_overrides=None, extra_argv=()):
+        """
+        Return a full command: template, resource flags, per-launch flags
+        (home, name), then the app-specific tail
+        """
+        if resource_overrides:
+            resource_argv = resource_flags(self.merged_resources(resource_overrides))
+        else:
+            resource_argv = self.resource_argv
+        return [*self.argv, *resource_argv, *extra_argv, *tail]
+
+    @property
+    def needs_dbus(self):
+        return 'dbus' in self.needs
+
+    def __repr__(self):
+        return f'CompiledPolicy({self.name!r}, needs={sorted(self.needs)}, digest={self.digest[:8]})'
+
+
+def policy_digest(definition):
+    """Content hash of a policy definition"""
+    encoded = json.dumps(definition, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def validate_resources(name, resources):
+    """Check resource keys; raises ValueError for unknown ones"""
+    unknown = set(resources) - set(config.RESOURCE_KEYS)
+    if unknown:
+        raise ValueError(f'Policy {name}: unknown resource setting(s) {", ".join(sorted(unknown))}')
+    return resources
+
+
+def resource_flags(resources):
+    """
+    firejail flags for the rlimit/scheduling part of resources
+    (memory_mb, max_pids and cpu_percent are enforced through cgroups.py)
+    """
+    flags = []
+    if resources.get('address_space_mb'):
+        flags.append(f'--rlimit-as={int(resources["address_space_mb"]) * 1024 * 1024}')
+    if resources.get('user_processes'):
+        flags.append(f'--rlimit-nproc={int(resources["user_processes"])}')
+    if resources.get('open_files'):
+        flags.append(f'--rlimit-nofile={int(resources["open_files"])}')
+    if resources.get('cpus'):
+        flags.append('--cpu=' + ','.join(str(int(c)) for c in resources['cpus']))
+    if resources.get('nice') is not None:
+        flags.append(f'--nice={int(resources["nice"])}')
+    return flags
+
+
+def validate_watchdog(name, rules):
+    """
+    Check and normalise watchdog rules
+    Returns: list of {'metric', 'above', 'for', 'action'}; raises ValueError
+    """
+    validated = []
+    for rule in rules or []:
+        metric = rule.get('metric')
+        action = rule.get('action')
+        if metric not in config.WATCHDOG_METRICS:
+            raise ValueError(f'Policy {name}: unknown watchdog metric {metric!r}')
+        if action not in config.WATCHDOG_ACTIONS:
+            raise ValueError(f'Policy {name}: unknown watchdog action {action!r}')
+        try:
+            above = float(rule['above'])
+            duration = float(rule.get('for', 0))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Policy {name}: watchdog rule needs a numeric above/for: {rule!r}')
+        validated.append({'metric': metric, 'above': above, 'for': duration, 'action': action})
+    return validated
+
+
+def describe_resources(resources):
+    """Short human-readable summary of resource ceilings"""
+    parts = []
+    if resources.get('memory_mb'):
+        parts.append(f'memory {resources["memory_mb"]} MB')
+    if resources.get('max_pids'):
+        parts.append(f'{resources["max_pids"]} pids')
+    if resources.get('cpu_percent'):
+        parts.append(f'CPU {resources["cpu_percent"]}%')
+    if resources.get('address_space_mb'):
+        parts.append(f'address space {resources["address_space_mb"]} MB')
+    if resources.get('user_processes'):
+        parts.append(f'{resources["user_processes"]} user processes')
+    if resources.get('open_files'):
+        parts.append(f'{resources["open_files"]} open files')
+    if resources.get('cpus'):
+        parts.append('CPUs ' + ','.join(str(c) for c in resources['cpus']))
+    if resources.get('nice') is not None:
+        parts.append(f'nice {resources["nice"]}')
+    if resources.get('tmpfs_mb'):
+        parts.append(f'RAM disk {resources["tmpfs_mb"]} MB')
+    return ', '.join(parts) or 'none'
+
+
+def _allowed(value, needed):
+    """Resolve True / False / 'auto' against whether the app needs it"""
+    if value == 'auto':
+        return needed
+    return bool(value)
+
+
+def auto_settings(definition):
+    """App capabilities a policy decides per app ('auto' settings)"""
+    defaults = {'dbus': 'auto', 'network': True, 'sound': True, 'video': True}
+    return frozenset(key for key, default in defaults.items() if definition.get(key, default) == 'auto')
+
+
+def compile_policy(name, definition, needs):
+    """
+    Compile one policy definition into a CompiledPolicy
+    needs: capabilities of the app ('dbus', 'sound', 'video', 'network')
+    Raises ValueError for unknown capability sets or D-Bus modes
+    """
+    argv = ['firejail', '--noprofile']
+    summary = []
+
+    # D-Bus
+    dbus_mode = definition.get('dbus', 'auto')
+    if dbus_mode == 'auto':
+        dbus_mode = 'filter' if 'dbus' in needs else 'none'
+    if dbus_mode not in ('filter', 'none'):
+        raise ValueError(f'Policy {name}: unknown dbus mode {dbus_mode!r}')
+    argv.extend([f'--dbus-user={dbus_mode}', '--dbus-system=none'])
+    summary.append('D-Bus filtered' if dbus_mode == 'filter' else 'D-Bus blocked')
+
+    # Network
+    if _allowed(definition.get('network', True), 'network' in needs):
+        argv.extend(NETWORK_ALLOWED_FLAGS)
+        summary.append('network ALLOWED')
+    else:
+        argv.extend(NETWORK_BLOCKED_FLAGS)
+        summary.append('network blocked')
+
+    # Sound and video
+    for key, flag in (('sound', '--nosound'), ('video', '--novideo')):
+        if _allowed(definition.get(key, True), key in needs):
+            summary.append(f'{key} allowed')
+        else:
+            argv.append(flag)
+            summary.append(f'{key} blocked')
+
+    # Devices
+    if not definition.get('devices', True):
+        argv.extend(config.DEVICE_BLOCK_FLAGS)
+        summary.append('devices blocked')
+
+    # Capabilities
+    for cap_set in definition.get('capabilities', []):
+        if cap_set not in config.CAPABILITY_FLAGS:
+            raise ValueError(f'Policy {name}: unknown capability set {cap_set!r}')
+        argv.extend(config.CAPABILITY_FLAGS[cap_set])
+    if definition.get('capabilities'):
+        summary.append('caps ' + '/'.join(definition['capabilities']))
+
+    # Home directory (the --private* home flag is added per command)
+    home = definition.get('home', 'real')
+    if home not in ('real', 'template', 'tmpfs'):
+        raise ValueError(f'Policy {name}: unknown home mode {home!r}')
+    if home == 'template':
+        summary.append('private home')
+    elif home == 'tmpfs':
+        argv.append('--private-tmp')
+        if definition.get('overlay_tmpfs'):
+            argv.append('--overlay-tmpfs')
+            summary.append('writes in RAM only')
+        else:
+            summary.append('home and /tmp in RAM')
+    tmpfs_action = definition.get('on_tmpfs_exceeded', 'kill')
+    if tmpfs_action not in ('kill', 'freeze'):
+        raise ValueError(f'Policy {name}: unknown on_tmpfs_exceeded action {tmpfs_action!r}')
+
+    # Sandbox reuse needs a home that opened files can be copied into later
+    reuse = bool(definition.get('reuse', False))
+    if reuse and home == 'tmpfs':
+        raise ValueError(f'Policy {name}: reuse is not supported with a tmpfs home')
+    if reuse:
+        summary.append('shared by files of one app')
+
+    # Runaway sandboxes (enforced by sandbox_watchdog.py)
+    watchdog = validate_watchdog(name, definition.get('watchdog'))
+    if watchdog:
+        summary.append('watchdog ' + '/'.join(dict.fromkeys(rule['action'] for rule in watchdog)))
+    try:
+        idle_freeze = float(definition.get('idle_freeze_minutes') or 0) * 60
+    except (TypeError, ValueError):
+        raise ValueError(f'Policy {name}: idle_freeze_minutes must be a number')
+    if idle_freeze:
+        summary.append(f'frozen after {idle_freeze / 60:g} min idle')
+    try:
+        ttl = float(definition.get('ttl_minutes') or 0) * 60
+    except (TypeError, ValueError):
+        raise ValueError(f'Policy {name}: ttl_minutes must be a number')
+    if ttl < 0:
+        raise ValueError(f'Policy {name}: ttl_minutes must not be negative')
+    if ttl:
+        summary.append(f'stopped after {ttl / 60:g} min')
+
+    argv.extend(definition.get('extra_args', []))
+
+    # Resource ceilings (flags are added per command, see CompiledPolicy.command)
+    resources = validate_resources(name, definition.get('resources') or {})
+    resources = {key: value for key, value in resources.items() if value is not None}
+    if resources:
+        summary.append('limits ' + describe_resources(resources))
+
+    return CompiledPolicy(
+        name=name,
+        digest=policy_digest(definition),
+        needs=needs,
+        argv=argv,
+        description=definition.get('description', name),
+        summary=', '.join(summary),
+        resources=resources,
+        home=home,
+        home_template=definition.get('home_template'),
+        tmpfs_action=tmpfs_action,
+        reuse=reuse,
+        watchdog=watchdog,
+        idle_freeze=idle_freeze,
+        ttl=ttl,
+    )
+
+
+class PolicyCompiler:
+    """
+    Merges built-in and user policies and caches their compiled templates
+    """
+
+    def __init__(self, base_policies=None, overrides_file=None):
+        self.base_policies = base_policies if base_policies is not None else config.SECURITY_POLICIES
+        self.overrides_file = overrides_file or config.POLICY_OVERRIDES_FILE
+        self.logger = logging.getLogger('FirejailHandler')
+        self._lock = threading.Lock()
+        self._policies = dict(self.base_policies)
+        self._digests = {name: policy_digest(d) for name, d in self._policies.items()}
+        self._compiled = {}
+        self._overrides_mtime = None
+        self._last_check = 0.0
+        self.reload(force=True)
+
+    def reload(self, force=False):
+        """Re-read the overrides file if it changed; returns True if policies changed"""
+        now = time.monotonic()
+        if not force and now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return False
+        self._last_check = now
+
+        try:
+            mtime = os.stat(self.overrides_file).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if not force and mtime == self._overrides_mtime:
+            return False
+
+        policies = dict(self.base_policies)
+        if mtime is not None:
+            try:
+                with open(self.overrides_file, 'r') as f:
+                    overrides = json.load(f)
+                for name, definition in overrides.items():
+                    merged = dict(policies.get(name, {}))
+                    merged.update(definition)
+                    policies[name] = merged
+            except Exception as e:
+                self.logger.warning(f'Could not load policy overrides: {str(e)}')
+                return False
+
+        digests = {name: policy_digest(d) for name, d in policies.items()}
+        with self._lock:
+            self._overrides_mtime = mtime
+            changed = digests != self._digests
+            self._policies = policies
+            self._digests = digests
+            # Templates are keyed by digest, so only stale entries are dropped
+            live = set(digests.values())
+            self._compiled = {k: v for k, v in self._compiled.items() if k[1] in live}
+
+        if changed and not force:
+            self.logger.info('Security policies reloaded')
+        return changed
+
+    def policies(self):
+        """Return the merged policy definitions"""
+        self.reload()
+        return self._policies
+
+    def get(self, name, needs=frozenset()):
+        """
+        Return the CompiledPolicy for a policy name and the app's capabilities;
+        only capabilities the policy sets to 'auto' make a separate variant
+        Raises ValueError for unknown policies
+        """
+        self.reload()
+        # Digest and definition must come from the same reload
+        with self._lock:
+            digest = self._digests.get(name)
+            definition = self._policies.get(name)
+        if digest is None:
+            raise ValueError(f'Unknown security policy: {name}')
+
+        needs = frozenset(needs) & auto_settings(definition)
+        key = (name, digest, needs)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = compile_policy(name, definition, needs)
+            with self._lock:
+                # Skip caching if a reload replaced the policy meanwhile
+                if self._digests.get(name) == digest:
+                    self._compiled[key] = compiled
+        return compiled
+
+
+# Shared compiler used by FirejailHandler and the UI
+default_compiler = PolicyCompiler()
+
+
+def get_security_policies():
+    """Return the current (built-in + user) security policies"""
+    return default_compiler.policies()
@@ -0,0 +1,232 @@
+"""
+/proc Helpers
+Cheap reads of process statistics and sandbox process trees
+"""
+
+import os
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def read_stat(pid):
+    """
+    Parse /proc/<pid>/stat
+    Returns: dict (ppid, state, utime, stime, cutime, cstime, minflt,
+    majflt, cminflt, cmajflt, starttime, rss_bytes in seconds/bytes/counts)
+    or None if the process is gone
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    # comm may contain spaces and parentheses; fields follow the last ')'
+    end = data.rfind(b')')
+    fields = data[end + 2:].split()
+    try:
+        return {
+            'state': fields[0].decode(),
+            'ppid': int(fields[1]),
+            'minflt': int(fields[7]),
+            'cminflt': int(fields[8]),
+            'majflt': int(fields[9]),
+            'cmajflt': int(fields[10]),
+            'utime': int(fields[11]) / CLK_TCK,
+            'stime': int(fields[12]) / CLK_TCK,
+            'cutime': int(fields[13]) / CLK_TCK,
+            'cstime': int(fields[14]) / CLK_TCK,
+            'starttime': int(fields[19]),
+            'rss_bytes': int(fields[21]) * PAGE_SIZE,
+        }
+    except (IndexError, ValueError):
+        return None
+
+
+def list_pids():
+    """All numeric entries in /proc"""
+    try:
+        return [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return []
+
+
+def scan_processes():
+    """
+    Read /proc/<pid>/stat for every process once
+    Returns: (stats {pid: stat}, children {ppid: [pid, ...]})
+    """
+    stats = {}
+    children = {}
+    for pid in list_pids():
+        stat = read_stat(pid)
+        if stat is None:
+            continue
+        stats[pid] = stat
+        children.setdefault(stat['ppid'], []).append(pid)
+    return stats, children
+
+
+def process_tree(pid, children):
+    """pid and all of its descendants, given a children map"""
+    tree = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def children_of(pid):
+    """
+    Direct children of a process from /proc/<pid>/task/*/children
+    Returns: list of pids, or None if the kernel does not provide the file
+    """
+    found = []
+    try:
+        tids = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return []
+    for tid in tids:
+        try:
+            with open(f'/proc/{pid}/task/{tid}/children', 'r') as f:
+                found.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            if not os.path.exists(f'/proc/{pid}/task/{tid}'):
+                continue    # thread exited
+            return None
+        except (OSError, ValueError):
+            continue
+    return found
+
+
+def descendants(pid):
+    """
+    pid and all of its descendants, following child lists from pid down
+    instead of reading every process in /proc (falls back to that scan on
+    kernels without /proc/<pid>/task/*/children)
+    """
+    tree = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        found = children_of(current)
+        if found is None:
+            _, children = scan_processes()
+            return process_tree(pid, children)
+        stack.extend(found)
+    return tree
+
+
+def tree_usage(pid, stats=None, children=None):
+    """
+    Total CPU seconds and RSS of a process tree
+    Pass stats/children from scan_processes() when measuring many trees
+    Returns: dict (cpu_seconds, rss_bytes, processes) or None if pid is gone
+    """
+    if stats is None or children is None:
+        stats, children = scan_processes()
+    if pid not in stats:
+        return None
+
+    cpu = 0.0
+    rss = 0
+    count = 0
+    for member in process_tree(pid, children):
+        stat = stats.get(member)
+        if stat is None:
+            continue
+        cpu += stat['utime'] + stat['stime']
+        rss += stat['rss_bytes']
+        count += 1
+    return {'cpu_seconds': cpu, 'rss_bytes': rss, 'processes': count}
+
+
+def read_io(pid):
+    """
+    Counters of /proc/<pid>/io (rchar, wchar, read_bytes, write_bytes, ...)
+    Returns: dict or None if unreadable (gone, or another user's process)
+    """
+    try:
+        with open(f'/proc/{pid}/io', 'r') as f:
+            io = {}
+            for line in f:
+                key, _, value = line.partition(':')
+                io[key] = int(value)
+            return io
+    except (OSError, ValueError):
+        return None
+
+
+def read_io_bytes(pid):
+    """
+    rchar + wchar from /proc/<pid>/io: bytes read and written through any
+    file descriptor (files, sockets, pipes)
+    Returns: int or None if unreadable
+    """
+    io = read_io(pid)
+    if io is None:
+        return None
+    return io.get('rchar', 0) + io.get('wchar', 0)
+
+
+def read_context_switches(pid):
+    """
+    Voluntary and involuntary context switches from /proc/<pid>/status
+    Returns: (voluntary, involuntary) or None if the process is gone
+    """
+    voluntary = involuntary = 0
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('voluntary_ctxt_switches:'):
+                    voluntary = int(line.split()[1])
+                elif line.startswith('nonvoluntary_ctxt_switches:'):
+                    involuntary = int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return voluntary, involuntary
+
+
+def tree_io_bytes(pid, children):
+    """I/O bytes of a process tree (readable members only), or None if none are readable"""
+    total = None
+    for member in process_tree(pid, children):
+        io = read_io_bytes(member)
+        if io is not None:
+            total = (total or 0) + io
+    return total
+
+
+def mem_available_bytes():
+    """MemAvailable from /proc/meminfo, or None if unavailable"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def pressure(resource):
+    """
+    'some avg10' from /proc/pressure/<resource> (cpu, memory, io): the
+    percentage of the last 10 s in which at least one task was stalled
+    Returns: float or None without PSI support
+    """
+    try:
+        with open(f'/proc/pressure/{resource}', 'r') as f:
+            for line in f:
+                if line.startswith('some '):
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition('=')
+                        if key == 'avg10':
+                            return float(value)
+    except (OSError, ValueError):
+        pass
+    return None
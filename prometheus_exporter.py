@@ -0,0 +1,178 @@
+"""
+Prometheus Exporter
+Writes sandbox fleet metrics in the Prometheus text format for the
+node_exporter textfile collector
+
+    node_exporter --collector.textfile.directory=/var/lib/node_exporter/textfile_collector
+    python3 main.py --prometheus-textfile /var/lib/node_exporter/textfile_collector/invisvm.prom
+
+The file is rewritten every PROMETHEUS_EXPORT_INTERVAL seconds through a
+temporary file and rename, so the collector never reads a partial file.
+"""
+
+import os
+import threading
+
+import procfs
+from config import PROMETHEUS_TEXTFILE, PROMETHEUS_EXPORT_INTERVAL
+from metrics import METRICS
+
+# Histograms exported as Prometheus histograms: metric name -> (name, help)
+EXPORTED_HISTOGRAMS = {
+    'launch.total': ('invisvm_launch_duration_seconds', 'Time to launch a sandbox'),
+    'launch.pooled': ('invisvm_launch_pooled_duration_seconds', 'Time to launch into a warm pool sandbox'),
+    'launch.cold': ('invisvm_launch_cold_duration_seconds', 'Time to launch a sandbox of its own'),
+    'launch.joined': ('invisvm_launch_joined_duration_seconds', 'Time to open a file in a running sandbox'),
+    'pool.startup': ('invisvm_pool_startup_seconds', 'Time for a warm pool sandbox to become ready'),
+    'kill.duration': ('invisvm_kill_duration_seconds', 'Time to kill a sandbox'),
+    'monitor.loop_lag': ('invisvm_monitor_loop_lag_seconds', 'Monitor thread wake-up delay past its interval'),
+}
+
+
+def escape_label(value):
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items()) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusExporter:
+    """
+    Background thread that renders handler and METRICS state to a .prom file
+    """
+
+    def __init__(self, handler, path=PROMETHEUS_TEXTFILE, interval=PROMETHEUS_EXPORT_INTERVAL):
+        self.handler = handler
+        self.path = os.path.expanduser(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start exporting; writes once immediately"""
+        if self._thread is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='prometheus-exporter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread after one final write"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._write_safely()
+
+    def _run(self):
+        while True:
+            self._write_safely()
+            if self._stop.wait(self.interval):
+                break
+
+    def _write_safely(self):
+        try:
+            with METRICS.timer('export.prometheus'):
+                self.write()
+        except Exception as e:
+            self.handler.log(f'Prometheus export failed: {str(e)}', 'WARNING')
+
+    def write(self):
+        """Render and atomically replace the textfile"""
+        text = self.render()
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, self.path)
+
+    def render(self):
+        """Return the full exposition text"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def sample(name, value, labels=None):
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+        sandboxes = list(self.handler.registry.snapshot().items())
+
+        # Active sandboxes by policy
+        family('invisvm_active_sandboxes', 'gauge', 'Sandboxes currently tracked')
+        by_policy = {}
+        for pid, record in sandboxes:
+            policy = record.policy
+            by_policy[policy] = by_policy.get(policy, 0) + 1
+        for policy, count in sorted(by_policy.items()):
+            sample('invisvm_active_sandboxes', count, {'policy': policy})
+
+        # Launch outcomes per policy (launch.success.<policy> / launch.failure.<policy>)
+        counters = {name: m['value'] for name, m in METRICS.snapshot().items() if m['type'] == 'counter'}
+        family('invisvm_launches_total', 'counter', 'Sandbox launch attempts')
+        for name, value in sorted(counters.items()):
+            parts = name.split('.', 2)
+            if len(parts) == 3 and parts[0] == 'launch' and parts[1] in ('success', 'failure'):
+                sample('invisvm_launches_total', value, {'policy': parts[2], 'outcome': parts[1]})
+
+        family('invisvm_kills_total', 'counter', 'Sandboxes killed')
+        sample('invisvm_kills_total', counters.get('kill.count', 0))
+
+        family('invisvm_log_bytes_written_total', 'counter', 'Bytes written to InvisVM log files')
+        sample('invisvm_log_bytes_written_total', counters.get('log.bytes_written', 0))
+
+        # Warm pool (pool.hit.<policy> / pool.miss.<policy>)
+        family('invisvm_pool_launches_total', 'counter', 'Launches that found / missed a warm pool sandbox')
+        for name, value in sorted(counters.items()):
+            parts = name.split('.', 2)
+            if len(parts) == 3 and parts[0] == 'pool' and parts[1] in ('hit', 'miss'):
+                sample('invisvm_pool_launches_total', value, {'policy': parts[2], 'outcome': parts[1]})
+        family('invisvm_pool_idle_sandboxes', 'gauge', 'Ready warm pool sandboxes')
+        pool = getattr(self.handler, 'pool', None)
+        if pool is not None:
+            for policy, count in sorted(pool.idle_counts().items()):
+                sample('invisvm_pool_idle_sandboxes', count, {'policy': policy})
+
+        # Latency histograms
+        for metric, (name, help_text) in EXPORTED_HISTOGRAMS.items():
+            buckets, count, total = METRICS.histogram(metric).cumulative()
+            family(name, 'histogram', help_text)
+            for bound, cumulative in buckets:
+                sample(f'{name}_bucket', cumulative, {'le': format_value(bound)})
+            sample(f'{name}_sum', total)
+            sample(f'{name}_count', count)
+
+        # Per-sandbox resource usage (whole process tree)
+        stats, children = procfs.scan_processes()
+        cpu_lines = []
+        rss_lines = []
+        for pid, record in sandboxes:
+            usage = procfs.tree_usage(pid, stats, children)
+            if usage is None:
+                continue
+            labels = format_labels({
+                'pid': pid,
+                'sandbox_id': record.sandbox_id,
+                'app': record.name,
+                'policy': record.policy,
+            })
+            cpu_lines.append(f'invisvm_sandbox_cpu_seconds_total{labels} {format_value(usage["cpu_seconds"])}')
+            rss_lines.append(f'invisvm_sandbox_rss_bytes{labels} {usage["rss_bytes"]}')
+
+        family('invisvm_sandbox_cpu_seconds_total', 'counter', 'CPU time used by the sandbox process tree')
+        lines.extend(cpu_lines)
+        family('invisvm_sandbox_rss_bytes', 'gauge', 'Resident memory of the sandbox process tree')
+        lines.extend(rss_lines)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,129 @@
+"""
+Resource Summary
+What a sandbox cost over its whole life, recorded when it exits
+
+Sandboxes launched by this process are reaped with os.wait4(), whose
+rusage covers the firejail process and every descendant it waited for:
+
+    {'source': 'wait4', 'exit_code': 0, 'signal': '',
+     'user_cpu': 12.4, 'system_cpu': 1.9, 'max_rss_bytes': 412090368,
+     'minor_faults': 98211, 'major_faults': 14,
+     'voluntary_switches': 20931, 'involuntary_switches': 1877,
+     'read_bytes': 5341184, 'write_bytes': 1056768}
+
+Adopted sandboxes (and pooled apps, whose processes belong to the pool
+sandbox) cannot be waited for; their summary is the last /proc sample the
+watchdog took of the tree (source 'proc'), with the largest value each
+counter reached, since counters of processes that exit unreaped vanish
+from the tree. Exit status is unknown (None) unless the caller has it.
+"""
+
+import os
+import signal
+
+import procfs
+
+MB = 1024 * 1024
+
+# 512-byte blocks of rusage ru_inblock / ru_oublock
+BLOCK_SIZE = 512
+
+COUNTERS = (
+    'user_cpu', 'system_cpu', 'max_rss_bytes', 'minor_faults', 'major_faults',
+    'voluntary_switches', 'involuntary_switches', 'read_bytes', 'write_bytes',
+)
+
+
+def _exit_fields(exit_code):
+    """exit_code as os.waitstatus_to_exitcode() returns it (negative for a signal)"""
+    if exit_code is not None and exit_code < 0:
+        try:
+            name = signal.Signals(-exit_code).name
+        except ValueError:
+            name = f'signal {-exit_code}'
+        return {'exit_code': exit_code, 'signal': name}
+    return {'exit_code': exit_code, 'signal': ''}
+
+
+def from_rusage(status, rusage):
+    """Summary of a child reaped with os.wait4()"""
+    summary = {
+        'source': 'wait4',
+        'user_cpu': rusage.ru_utime,
+        'system_cpu': rusage.ru_stime,
+        'max_rss_bytes': rusage.ru_maxrss * 1024,   # KiB on Linux
+        'minor_faults': rusage.ru_minflt,
+        'major_faults': rusage.ru_majflt,
+        'voluntary_switches': rusage.ru_nvcsw,
+        'involuntary_switches': rusage.ru_nivcsw,
+        'read_bytes': rusage.ru_inblock * BLOCK_SIZE,
+        'write_bytes': rusage.ru_oublock * BLOCK_SIZE,
+    }
+    summary.update(_exit_fields(os.waitstatus_to_exitcode(status)))
+    return summary
+
+
+def sample(pid, stats, children):
+    """
+    Counters of a live process tree from a scan_processes() result
+    Returns: dict of COUNTERS (max_rss_bytes is the current tree RSS) or
+    None if pid is gone
+    """
+    if pid not in stats:
+        return None
+    totals = dict.fromkeys(COUNTERS, 0)
+    for member in procfs.process_tree(pid, children):
+        stat = stats.get(member)
+        if stat is None:
+            continue
+        totals['user_cpu'] += stat['utime'] + stat['cutime']
+        totals['system_cpu'] += stat['stime'] + stat['cstime']
+        totals['max_rss_bytes'] += stat['rss_bytes']
+        totals['minor_faults'] += stat['minflt'] + stat['cminflt']
+        totals['major_faults'] += stat['majflt'] + stat['cmajflt']
+        switches = procfs.read_context_switches(member)
+        if switches is not None:
+            totals['voluntary_switches'] += switches[0]
+            totals['involuntary_switches'] += switches[1]
+        io = procfs.read_io(member)
+        if io is not None:
+            totals['read_bytes'] += io.get('read_bytes', 0)
+            totals['write_bytes'] += io.get('write_bytes', 0)
+    return totals
+
+
+def merge(previous, current):
+    """Largest value of each counter over two samples"""
+    if previous is None:
+        return current
+    return {key: max(previous[key], current[key]) for key in COUNTERS}
+
+
+def from_sample(last_sample, exit_code=None):
+    """Summary of a sandbox that could not be waited for"""
+    summary = {'source': 'proc' if last_sample is not None else 'none'}
+    summary.update(last_sample or dict.fromkeys(COUNTERS))
+    summary.update(_exit_fields(exit_code))
+    return summary
+
+
+def describe(summary):
+    """e.g. 'exit 0; CPU 12.4s user + 1.9s system; peak RSS 393 MB; ...'"""
+    if summary['signal']:
+        parts = [f"killed by {summary['signal']}"]
+    elif summary['exit_code'] is None:
+        parts = ['exit status unknown']
+    else:
+        parts = [f"exit {summary['exit_code']}"]
+    if summary['user_cpu'] is None:
+        return f'{parts[0]}; no resource usage recorded'
+    parts.append(f"CPU {summary['user_cpu']:.1f}s user + {summary['system_cpu']:.1f}s system")
+    parts.append(f"peak RSS {summary['max_rss_bytes'] / MB:.0f} MB")
+    parts.append(f"page faults {summary['major_faults']} major / {summary['minor_faults']} minor")
+    parts.append(f"context switches {summary['voluntary_switches']} voluntary / "
+                 f"{summary['involuntary_switches']} involuntary")
+    parts.append(f"block I/O {summary['read_bytes'] / MB:.1f} MB read / "
+                 f"{summary['write_bytes'] / MB:.1f} MB written")
+    if summary['source'] == 'proc':
+        parts.append('from the last /proc sample')
+    return '; '.join(parts)
@@ -0,0 +1,398 @@
+"""
+Warm Sandbox Pool
+Pre-started idle sandboxes that launches join instead of building their own
+
+Most of a launch is firejail creating namespaces, mounts and seccomp
+filters, plus the D-Bus proxy for --dbus-user=filter. The pool keeps up
+to SANDBOX_POOL_SIZE[policy] sandboxes per policy variant (the app
+capabilities its 'auto' settings allow: no D-Bus and D-Bus at first,
+then the variants launches missed, up to MAX_VARIANTS per policy)
+running a placeholder (`sleep infinity`) under
+--name=invisvm-pool-<owner pid>-<id>. A launch takes a ready one and runs
+the app in it with `firejail --join=<name>`. The pool sandbox is shut
+down once nothing but the placeholder runs in it any more (apps opened
+through xdg-open outlive the join process), so sandboxes are never shared. A background
+thread refills the pool while the idle sandboxes stay within
+SANDBOX_POOL_MEMORY_MB.
+
+Launches with per-launch resource overrides, and policies with a
+RAM-backed home ('home': 'tmpfs'), always start a sandbox of their own.
+Pool sandboxes are hidden from sandbox discovery.
+"""
+
+import os
+import time
+import uuid
+import atexit
+import threading
+import subprocess
+
+import procfs
+from config import SANDBOX_POOL_SIZE, SANDBOX_POOL_MEMORY_MB, SANDBOX_POOL_PLACEHOLDER
+from metrics import METRICS
+
+POOL_NAME_PREFIX = 'invisvm-pool-'
+
+# Refill loop wake-up while pool sandboxes are starting / when all are ready
+STARTING_CHECK_INTERVAL = 0.1
+IDLE_CHECK_INTERVAL = 5.0
+
+# Policy variants kept warm per policy (the most recently missed ones)
+MAX_VARIANTS = 4
+INITIAL_VARIANTS = (frozenset(), frozenset({'dbus'}))
+
+
+def is_pool_sandbox(list_line):
+    """True for a `firejail --list` line describing a pool sandbox"""
+    return POOL_NAME_PREFIX in list_line
+
+
+def _argv0(pid):
+    """Program name of a process ('' if it is gone)"""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            argv0 = f.read().split(b'\0', 1)[0]
+    except OSError:
+        return ''
+    return os.path.basename(argv0).decode(errors='replace')
+
+
+def sandbox_in_use(pool_pid, cgroup=None, placeholder=SANDBOX_POOL_PLACEHOLDER):
+    """
+    True while a pool sandbox runs anything besides firejail and its placeholder
+    Reads the members of the sandbox's cgroup if it has one, else its process tree
+    """
+    pids = cgroup.procs() if cgroup is not None else None
+    if pids is None:
+        pids = procfs.descendants(pool_pid)
+    for pid in pids:
+        if _argv0(pid) not in ('', 'firejail', placeholder[0]):
+            return True
+    return False
+
+
+def shutdown_sandbox(pid):
+    """Ask firejail to stop a sandbox and everything in it"""
+    try:
+        subprocess.run(
+            ['firejail', f'--shutdown={pid}'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+
+class PoolMember:
+    """One pre-started sandbox"""
+
+    def __init__(self, key, name, sandbox_id, process, home=None, cgroup=None):
+        self.key = key              # (policy, capabilities of the variant)
+        self.name = name
+        self.sandbox_id = sandbox_id
+        self.process = process
+        self.home = home
+        self.cgroup = cgroup
+        self.started = time.monotonic()
+        self.ready = False
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def alive(self):
+        return self.process.poll() is None
+
+
+class SandboxPool:
+    """
+    Idle sandboxes per (policy, variant), refilled in the background
+    """
+
+    def __init__(self, handler, sizes=None, memory_mb=SANDBOX_POOL_MEMORY_MB,
+                 placeholder=SANDBOX_POOL_PLACEHOLDER):
+        self.handler = handler
+        self.sizes = dict(SANDBOX_POOL_SIZE if sizes is None else sizes)
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.placeholder = list(placeholder)
+        self.owner = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = {}             # key -> [PoolMember]
+        self._variants = {}         # policy -> [capabilities], most recently missed last
+        self._handed_out = {}       # pid -> PoolMember (reaped after release)
+        self._thread = None
+        self._stopped = False
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Shut down pools left by exited InvisVM processes and start filling"""
+        if self._thread is not None:
+            return
+        self.shutdown_orphans()
+        self._thread = threading.Thread(target=self._run, name='sandbox-pool', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Shut down all idle pool sandboxes"""
+        with self._cond:
+            self._stopped = True
+            members = [m for members in self._idle.values() for m in members]
+            self._idle = {}
+            self._cond.notify_all()
+        for member in members:
+            self._discard(member)
+
+    def shutdown_orphans(self):
+        """Stop pool sandboxes whose owning InvisVM process is gone"""
+        try:
+            result = subprocess.run(
+                ['firejail', '--list'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=5
+            )
+        except (OSError, subprocess.SubprocessError):
+            return 0
+        count = 0
+        for line in result.stdout.splitlines():
+            if not is_pool_sandbox(line):
+                continue
+            pid, _, rest = line.partition(':')
+            owner = rest.split(POOL_NAME_PREFIX, 1)[1].split('-', 1)[0]
+            if pid.strip().isdigit() and owner.isdigit() and not os.path.exists(f'/proc/{owner}'):
+                shutdown_sandbox(int(pid))
+                count += 1
+        return count
+
+    # ---- use ----
+
+    def take(self, policy, needs):
+        """
+        Hand out a ready idle sandbox for a launch
+        needs: the app's capabilities (selects the policy variant)
+        Returns: PoolMember or None (pool miss)
+        """
+        key = (policy, self.handler.policy_compiler.get(policy, needs).needs)
+        member = None
+        with self._cond:
+            self._want(key)
+            members = self._idle.get(key, [])
+            for candidate in members:
+                if candidate.ready and candidate.alive():
+                    member = candidate
+                    break
+            if member is not None:
+                members.remove(member)
+                self._handed_out[member.pid] = member
+            self._cond.notify_all()
+
+        outcome = 'hit' if member is not None else 'miss'
+        METRICS.inc(f'pool.{outcome}')
+        METRICS.inc(f'pool.{outcome}.{policy}')
+        return member
+
+    def release(self, pid):
+        """
+        Shut down a handed-out pool sandbox once the apps in it have exited
+        Runs in the background; safe to call from an event loop
+        """
+        with self._cond:
+            member = self._handed_out.pop(pid, None)
+        if member is None:
+            threading.Thread(target=shutdown_sandbox, args=(pid,), daemon=True).start()
+        else:
+            threading.Thread(target=self._discard, args=(member,), daemon=True).start()
+
+    def sandbox_ids(self):
+        """Sandbox ids of idle and handed-out members (their homes are in use)"""
+        with self._cond:
+            members = [m for ms in self._idle.values() for m in ms]
+            members.extend(self._handed_out.values())
+        return {m.sandbox_id for m in members}
+
+    def idle_counts(self):
+        """Ready idle sandboxes per policy"""
+        counts = {}
+        with self._cond:
+            for (policy, _), members in self._idle.items():
+                counts[policy] = counts.get(policy, 0) + sum(1 for m in members if m.ready)
+        return counts
+
+    # ---- refilling ----
+
+    def _variants_of(self, policy):
+        """Variants kept warm for a policy; caller holds the lock"""
+        if policy not in self._variants:
+            compiler = self.handler.policy_compiler
+            variants = []
+            for needs in INITIAL_VARIANTS:
+                variant = compiler.get(policy, needs).needs
+                if variant not in variants:
+                    variants.append(variant)
+            self._variants[policy] = variants
+        return self._variants[policy]
+
+    def _want(self, key):
+        """Keep a variant launches asked for warm; caller holds the lock"""
+        policy, variant = key
+        if policy not in self.sizes:
+            return
+        variants = self._variants_of(policy)
+        if variant in variants:
+            return
+        variants.append(variant)
+        if len(variants) > MAX_VARIANTS:
+            dropped = variants.pop(0)
+            for member in self._idle.pop((policy, dropped), []):
+                threading.Thread(target=self._discard, args=(member,), daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+            try:
+                starting = self._refill()
+            except Exception as e:
+                self.handler.log(f'Sandbox pool refill failed: {str(e)}', 'WARNING')
+                starting = False
+            with self._cond:
+                if self._stopped:
+                    return
+                self._cond.wait(STARTING_CHECK_INTERVAL if starting else IDLE_CHECK_INTERVAL)
+
+    def _refill(self):
+        """
+        Drop dead members, mark started ones ready, start new ones within budget
+        Returns: True while any member is still starting
+        """
+        stats, children = procfs.scan_processes()
+        with self._cond:
+            members = [m for ms in self._idle.values() for m in ms]
+        dead = [m for m in members if not m.alive()]
+        for member in members:
+            if not member.ready and member.alive() and self._placeholder_running(member, children):
+                member.ready = True
+                METRICS.observe('pool.startup', time.monotonic() - member.started)
+        with self._cond:
+            for key in self._idle:
+                self._idle[key] = [m for m in self._idle[key] if m not in dead]
+            # Reap handed-out sandboxes that ended on their own
+            for pid, member in list(self._handed_out.items()):
+                if not member.alive():
+                    del self._handed_out[pid]
+                    dead.append(member)
+        for member in dead:
+            self._release_resources(member)
+
+        used = 0
+        ready_used = []
+        for member in members:
+            usage = procfs.tree_usage(member.pid, stats, children)
+            if usage is not None:
+                used += usage['rss_bytes']
+                if member.ready:
+                    ready_used.append(usage['rss_bytes'])
+        measured = sum(ready_used) / len(ready_used) if ready_used else None
+
+        for policy, size in self.sizes.items():
+            with self._cond:
+                variants = list(self._variants_of(policy))
+            # Until a ready member has been measured, assume one may use the
+            # policy's memory ceiling (within the budget, so one can start)
+            per_member = measured if measured is not None else self._estimate(policy)
+            for variant in variants:
+                key = (policy, variant)
+                with self._cond:
+                    have = len(self._idle.get(key, []))
+                while have < size and used + per_member <= self.memory_bytes:
+                    member = self._spawn(key)
+                    if member is None:
+                        break
+                    with self._cond:
+                        stopped = self._stopped
+                        if not stopped:
+                            self._idle.setdefault(key, []).append(member)
+                    if stopped:
+                        self._discard(member)
+                        return False
+                    have += 1
+                    used += per_member
+
+        with self._cond:
+            return any(not m.ready for ms in self._idle.values() for m in ms)
+
+    def _estimate(self, policy):
+        """Memory an unmeasured pool sandbox of a policy is assumed to use"""
+        try:
+            memory_mb = self.handler.policy_compiler.get(policy).resources.get('memory_mb')
+        except ValueError:
+            memory_mb = None
+        if not memory_mb:
+            return self.memory_bytes
+        return min(memory_mb * 1024 * 1024, self.memory_bytes)
+
+    def _placeholder_running(self, member, children):
+        """The sandbox is set up once the placeholder runs inside it"""
+        return any(_argv0(pid) == self.placeholder[0]
+                   for pid in procfs.process_tree(member.pid, children))
+
+    def _spawn(self, key):
+        """Start one idle sandbox"""
+        policy, variant = key
+        handler = self.handler
+        sandbox_id = uuid.uuid4().hex[:8]
+        name = f'{POOL_NAME_PREFIX}{self.owner}-{sandbox_id}'
+        home = None
+        cgroup = None
+        try:
+            compiled = handler.policy_compiler.get(policy, variant)
+            extra_argv = [f'--name={name}']
+            if compiled.home == 'tmpfs':
+                return None     # documents cannot be added to a tmpfs home later
+            if compiled.home == 'template':
+                # No app is known yet, so only policy and default templates apply
+                home, _ = handler.home_templates.materialize(
+                    sandbox_id, [compiled.home_template, compiled.name, 'default'])
+                extra_argv.append(f'--private={home}')
+            cmd = compiled.command(self.placeholder, None, extra_argv)
+            if handler.cgroups is not None and handler.cgroups.available:
+                cgroup = handler.cgroups.create(sandbox_id, compiled.resources)
+            if cgroup is not None:
+                cmd = cgroup.wrap(cmd)
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+        except Exception as e:
+            handler.log(f'Could not start pool sandbox for {policy}: {str(e)}', 'WARNING')
+            if cgroup is not None:
+                cgroup.remove()
+            if home:
+                handler.home_templates.discard(home)
+            return None
+        METRICS.inc('pool.started')
+        return PoolMember(key, name, sandbox_id, process, home, cgroup)
+
+    def _discard(self, member):
+        """Stop a member and release its cgroup and home"""
+        shutdown_sandbox(member.pid)
+        try:
+            member.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            member.process.kill()
+        self._release_resources(member)
+
+    def _release_resources(self, member):
+        if member.cgroup is not None and not member.cgroup.remove():
+            member.cgroup.kill()
+        if member.home:
+            self.handler.home_templates.discard(member.home)
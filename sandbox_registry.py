@@ -0,0 +1,255 @@
+"""
+Sandbox Registry
+Thread-safe record of tracked sandboxes
+
+Writers (launches, monitor threads, discovery, kills) go through a lock
+and publish a new immutable snapshot on every change (copy-on-write).
+Readers (GUI, exporters, triage) take registry.snapshot(), which is a
+single attribute read and never blocks or changes under them.
+Listeners receive a SandboxChange describing exactly what changed.
+"""
+
+import threading
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from types import MappingProxyType
+
+
+@dataclass(frozen=True, slots=True)
+class SandboxRecord:
+    """One tracked sandbox"""
+    pid: int
+    name: str
+    app: str = ''           # name without the opened file ('' = unknown)
+    path: str = 'Unknown'
+    policy: str = 'unknown'
+    timestamp: datetime = field(default_factory=datetime.now)
+    sandbox_id: str = ''
+    home: str = ''          # private home directory ('' = real home)
+    tmpfs_mb: int = 0       # RAM budget of a throwaway sandbox (0 = none)
+    tmpfs_action: str = ''  # 'kill' or 'freeze' when tmpfs_mb is exceeded
+    pool_pid: int = 0       # warm pool sandbox the app joined (0 = its own sandbox)
+    affinity: str = ''      # handler app key for reuse ('' = not reusable)
+    files: tuple = ()       # paths opened in this sandbox, in order
+    watchdog: str = ''      # last watchdog action, e.g. 'Reniced: CPU 98% for 60s'
+    frozen: bool = False    # suspended with freeze_sandbox()
+    deadline: float = 0.0   # time.time() at which the sandbox expires (0 = never)
+    # Runtime handles, only present for sandboxes launched by this process
+    process: object = field(default=None, compare=False, repr=False)
+    logger: object = field(default=None, compare=False, repr=False)
+    output: object = field(default=None, compare=False, repr=False)
+    cgroup: object = field(default=None, compare=False, repr=False)
+    usage: object = field(default=None, compare=False, repr=False)   # throwaway.TmpfsUsage
+    # resource_summary dict, set when the sandbox has exited
+    summary: object = field(default=None, compare=False, repr=False)
+
+    def to_state(self):
+        """Fields persisted in sandboxes.json"""
+        return {
+            'name': self.name,
+            'app': self.app,
+            'path': self.path,
+            'policy': self.policy,
+            'timestamp': self.timestamp.isoformat(),
+            'sandbox_id': self.sandbox_id,
+            'home': self.home,
+            'tmpfs_mb': self.tmpfs_mb,
+            'tmpfs_action': self.tmpfs_action,
+            'pool_pid': self.pool_pid,
+            'affinity': self.affinity,
+            'files': list(self.files),
+            'watchdog': self.watchdog,
+            'frozen': self.frozen,
+            'deadline': self.deadline,
+        }
+
+    @classmethod
+    def from_state(cls, pid, data):
+        """Build a record from a sandboxes.json entry"""
+        return cls(
+            pid=pid,
+            name=data['name'],
+            app=data.get('app', ''),
+            path=data.get('path', 'Unknown'),
+            policy=data.get('policy', 'unknown'),
+            timestamp=datetime.fromisoformat(data['timestamp']),
+            sandbox_id=data.get('sandbox_id', ''),
+            home=data.get('home', ''),
+            tmpfs_mb=data.get('tmpfs_mb', 0),
+            tmpfs_action=data.get('tmpfs_action', ''),
+            pool_pid=data.get('pool_pid', 0),
+            affinity=data.get('affinity', ''),
+            files=tuple(data.get('files', ())),
+            watchdog=data.get('watchdog', ''),
+            frozen=data.get('frozen', False),
+            deadline=data.get('deadline', 0.0),
+        )
+
+    def to_dict(self):
+        """Plain dict for UI tables"""
+        return {
+            'pid': self.pid,
+            'name': self.name,
+            'policy': self.policy,
+            'path': self.path,
+            'timestamp': self.timestamp,
+            'has_output': self.output is not None,
+            'tmpfs': self.usage.describe() if self.usage is not None else '',
+            'files': list(self.files),
+            'watchdog': self.watchdog,
+            'frozen': self.frozen,
+            'deadline': self.deadline,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class SandboxChange:
+    """
+    A registry change delivered to listeners
+    kind: 'added', 'updated' or 'removed'; record is the new record
+    (or the removed one); previous is the record before an update
+    """
+    kind: str
+    pid: int
+    record: SandboxRecord
+    version: int
+    previous: SandboxRecord = None
+
+
+class RegistrySnapshot:
+    """
+    Immutable, versioned view of the registry
+    Behaves like a read-only {pid: SandboxRecord} mapping
+    """
+    __slots__ = ('version', 'records')
+
+    def __init__(self, version, records):
+        self.version = version
+        self.records = MappingProxyType(records)
+
+    def __contains__(self, pid):
+        return pid in self.records
+
+    def __getitem__(self, pid):
+        return self.records[pid]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, pid, default=None):
+        return self.records.get(pid, default)
+
+    def items(self):
+        return self.records.items()
+
+    def values(self):
+        return self.records.values()
+
+
+class SandboxRegistry:
+    """
+    Tracked sandboxes keyed by PID
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._snapshot = RegistrySnapshot(0, {})
+        self._listeners = []
+
+    # ---- readers (lock-free) ----
+
+    def snapshot(self):
+        """Current immutable snapshot"""
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def get(self, pid, default=None):
+        return self._snapshot.get(pid, default)
+
+    def __contains__(self, pid):
+        return pid in self._snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    # ---- writers ----
+
+    def add(self, record, replace_existing=False):
+        """
+        Track a sandbox
+        Returns: True if added, False if the PID was already tracked
+        (unless replace_existing)
+        """
+        with self._lock:
+            previous = self._snapshot.get(record.pid)
+            if previous is not None and not replace_existing:
+                return False
+            kind = 'updated' if previous is not None else 'added'
+            change = self._commit({record.pid: record}, (), kind, record, previous)
+        self._notify(change)
+        return True
+
+    def update(self, pid, **changes):
+        """
+        Replace fields of a tracked record
+        Returns: the new record, or None if the PID is not tracked
+        """
+        with self._lock:
+            previous = self._snapshot.get(pid)
+            if previous is None:
+                return None
+            record = replace(previous, **changes)
+            change = self._commit({pid: record}, (), 'updated', record, previous)
+        self._notify(change)
+        return record
+
+    def remove(self, pid):
+        """
+        Stop tracking a sandbox
+        Returns: the removed record, or None if it was not tracked, so
+        only one of several racing callers sees the removal
+        """
+        with self._lock:
+            record = self._snapshot.get(pid)
+            if record is None:
+                return None
+            change = self._commit({}, (pid,), 'removed', record)
+        self._notify(change)
+        return record
+
+    def _commit(self, upserts, removals, kind, record, previous=None):
+        """Publish a new snapshot; caller holds the lock"""
+        records = dict(self._snapshot.records)
+        records.update(upserts)
+        for pid in removals:
+            records.pop(pid, None)
+        version = self._snapshot.version + 1
+        self._snapshot = RegistrySnapshot(version, records)
+        return SandboxChange(kind, record.pid, record, version, previous)
+
+    # ---- notifications ----
+
+    def subscribe(self, callback):
+        """
+        Call callback(change) after every change
+        Runs on the writer's thread, outside the registry lock; keep it short
+        """
+        with self._lock:
+            self._listeners = self._listeners + [callback]
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._listeners = [cb for cb in self._listeners if cb is not callback]
+
+    def _notify(self, change):
+        for callback in self._listeners:
+            try:
+                callback(change)
+            except Exception:
+                pass
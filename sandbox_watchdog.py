@@ -0,0 +1,238 @@
+"""
+Sandbox Watchdog
+Throttles, freezes or kills runaway sandboxes by per-policy rules
+
+Every WATCHDOG_INTERVAL seconds one scan of /proc gives the CPU time and
+RSS of every tracked sandbox's process tree (for a pooled app, the pool
+sandbox it joined). Each policy's 'watchdog' rules (see config.py) are
+checked against these samples:
+
+    {'metric': 'cpu_percent', 'above': 90, 'for': 60, 'action': 'renice'}
+
+fires once the tree has used more than 90% of a core in every sample for
+60 s. A rule fires once per excursion: it is re-armed when the metric
+drops back below the threshold. Actions are written to the sandbox log
+and the runtime log, counted in metrics (watchdog.<action>) and shown in
+the Active Sandboxes tab through the record's 'watchdog' field.
+
+Policies with 'idle_freeze_minutes' also have sandboxes frozen that did
+less than IDLE_IO_BYTES of I/O (rchar + wchar of the tree, which includes
+user input read from the display socket) in every sample for that long.
+Frozen sandboxes are not sampled; after a thaw their timers start again.
+
+The same scan keeps the resource counters of every tracked sandbox (see
+resource_summary.py), so sandboxes that cannot be waited for still get a
+post-mortem summary from their last sample. Sampling runs even when
+WATCHDOG_ENABLED is off; only the rules are skipped then.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import procfs
+import resource_summary
+from config import WATCHDOG_INTERVAL, WATCHDOG_RENICE_NICE, IDLE_IO_BYTES
+from metrics import METRICS
+
+MB = 1024 * 1024
+
+# Counters of untracked sandboxes kept for a late exit handler (killed ones)
+ENDED_KEPT = 64
+
+
+def renice_tree(pids, nice=WATCHDOG_RENICE_NICE):
+    """Lower the priority of processes (children started later inherit it)"""
+    changed = False
+    for pid in pids:
+        try:
+            if os.getpriority(os.PRIO_PROCESS, pid) < nice:
+                os.setpriority(os.PRIO_PROCESS, pid, nice)
+            changed = True
+        except OSError:
+            pass    # gone, or the firejail process itself (runs as root)
+    return changed
+
+
+def describe(rule, value, duration):
+    """e.g. 'CPU 98% for 60s' / 'RSS 3150 MB'"""
+    if rule['metric'] == 'cpu_percent':
+        text = f'CPU {value:.0f}%'
+    else:
+        text = f'RSS {value:.0f} MB'
+    return f'{text} for {duration:.0f}s' if duration >= 1 else text
+
+
+class SandboxWatch:
+    """Samples and rule timers of one sandbox"""
+
+    __slots__ = ('cpu_seconds', 'sampled', 'over_since', 'fired', 'io_bytes', 'active_at', 'frozen',
+                 'counters')
+
+    def __init__(self, now):
+        self.cpu_seconds = None
+        self.sampled = None
+        self.over_since = {}    # rule index -> monotonic time it went above
+        self.fired = set()      # rule indexes fired in the current excursion
+        self.io_bytes = None
+        self.active_at = now    # last sample with I/O above IDLE_IO_BYTES
+        self.frozen = False
+        self.counters = None    # resource_summary counters, largest values seen
+
+
+class Watchdog:
+    """
+    Background checker for the sandboxes of one FirejailHandler
+    """
+
+    ACTION_LABELS = {'renice': 'Reniced', 'freeze': 'Frozen', 'kill': 'Killed'}
+
+    def __init__(self, handler, interval=WATCHDOG_INTERVAL, renice_to=WATCHDOG_RENICE_NICE, enforce=True):
+        self.handler = handler
+        self.interval = interval
+        self.renice_to = renice_to
+        self.enforce = enforce  # False: only sample, never act
+        self._watches = {}      # pid -> SandboxWatch
+        self._ended = OrderedDict()     # pid -> counters of sandboxes no longer tracked
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.handler.log(f'Watchdog check failed: {str(e)}', 'WARNING')
+
+    def last_sample(self, pid):
+        """Resource counters of a sandbox from the samples so far, or None"""
+        watch = self._watches.get(pid)
+        if watch is not None:
+            return watch.counters
+        return self._ended.get(pid)
+
+    def enforces(self, policy):
+        """True if sandboxes of a policy have rules this watchdog applies"""
+        return self._policy(policy) is not None
+
+    def _policy(self, name):
+        """Compiled policy if it has watchdog rules or an idle timeout, else None"""
+        if not self.enforce:
+            return None
+        try:
+            compiled = self.handler.policy_compiler.get(name)
+        except ValueError:
+            return None     # adopted sandbox of an unknown policy
+        return compiled if compiled.watchdog or compiled.idle_freeze else None
+
+    def check(self, now=None):
+        """
+        Sample every sandbox the handler watches once and apply rules that fire
+        Returns: list of (pid, action) taken
+        """
+        now = time.monotonic() if now is None else now
+        records = [(pid, record, self._policy(record.policy))
+                   for pid, record in self.handler.registry.snapshot().items()
+                   if self.handler.watches(pid)]
+        for pid in set(self._watches) - {pid for pid, _, _ in records}:
+            counters = self._watches.pop(pid).counters
+            if counters is not None:
+                self._ended[pid] = counters
+                if len(self._ended) > ENDED_KEPT:
+                    self._ended.popitem(last=False)
+        if not records:
+            return []
+
+        with METRICS.timer('watchdog.check'):
+            stats, children = procfs.scan_processes()
+            taken = []
+            for pid, record, compiled in records:
+                watch = self._watches.get(pid)
+                if watch is None:
+                    watch = self._watches[pid] = SandboxWatch(now)
+                if record.frozen:
+                    watch.frozen = True
+                    continue
+                if watch.frozen:
+                    # Thawed: start over, keeping the resource counters
+                    counters = watch.counters
+                    self._watches[pid] = watch = SandboxWatch(now)
+                    watch.counters = counters
+
+                root = record.pool_pid or pid
+                counters = resource_summary.sample(root, stats, children)
+                if counters is None:
+                    continue
+                watch.counters = resource_summary.merge(watch.counters, counters)
+                if compiled is None:
+                    continue
+                usage = procfs.tree_usage(root, stats, children)
+                values = {'rss_mb': usage['rss_bytes'] / MB, 'cpu_percent': None}
+                if watch.sampled is not None and now > watch.sampled:
+                    values['cpu_percent'] = 100 * (usage['cpu_seconds'] - watch.cpu_seconds) / (now - watch.sampled)
+                watch.cpu_seconds = usage['cpu_seconds']
+                watch.sampled = now
+
+                if compiled.idle_freeze and self._idle(watch, root, children, now) >= compiled.idle_freeze:
+                    idle = now - watch.active_at
+                    duration = f'{idle / 60:.0f} min' if idle >= 60 else f'{idle:.0f}s'
+                    self._act(pid, record, 'freeze', f'no I/O for {duration}', ())
+                    taken.append((pid, 'idle'))
+                    continue
+
+                for index, rule in enumerate(compiled.watchdog):
+                    value = values[rule['metric']]
+                    if value is None:
+                        continue
+                    if value <= rule['above']:
+                        watch.over_since.pop(index, None)
+                        watch.fired.discard(index)
+                        continue
+                    since = watch.over_since.setdefault(index, now)
+                    if index in watch.fired or now - since < rule['for']:
+                        continue
+                    watch.fired.add(index)
+                    tree = procfs.process_tree(root, children)
+                    self._act(pid, record, rule['action'], describe(rule, value, now - since), tree)
+                    taken.append((pid, rule['action']))
+                    if rule['action'] == 'kill':
+                        break
+        return taken
+
+    def _idle(self, watch, root, children, now):
+        """Seconds since the sandbox last did more than IDLE_IO_BYTES of I/O in a sample"""
+        io = procfs.tree_io_bytes(root, children)
+        if io is None:
+            return 0
+        if watch.io_bytes is not None and io - watch.io_bytes > IDLE_IO_BYTES:
+            watch.active_at = now
+        watch.io_bytes = io
+        return now - watch.active_at
+
+    def _act(self, pid, record, action, reason, tree):
+        """Apply a watchdog action and report it"""
+        handler = self.handler
+        label = self.ACTION_LABELS[action]
+        if record.logger:
+            record.logger.log_event('watchdog', reason, f'Sandbox {label.lower()}')
+        handler.log(f'Watchdog: {record.name} (PID: {pid}) {reason}, sandbox {label.lower()}', 'WARNING')
+        METRICS.inc(f'watchdog.{action}')
+
+        if action == 'renice':
+            renice_tree(tree, self.renice_to)
+        elif action == 'freeze':
+            handler.freeze_sandbox(pid, 'by the watchdog')
+        if action != 'kill':
+            if handler.registry.update(pid, watchdog=f'{label}: {reason}') is not None:
+                handler.save_state()
+        else:
+            handler.kill_sandbox(pid, 'by the watchdog')
@@ -0,0 +1,251 @@
+"""
+Session History
+Every ended sandbox in an indexed SQLite database, with aggregate queries
+
+One row per session: sandbox id, app, path, policy, start and end time,
+outcome, exit status, resource summary (see resource_summary.py) and the
+number of network events. Aggregates group by app and/or policy over a
+time range:
+
+    default_history.stats(since=time.time() - 7 * 86400)
+    # [{'app': 'Document Viewer', 'policy': 'standard', 'launches': 412,
+    #   'median_runtime': 184.2, 'failure_rate': 0.012, ...}, ...]
+
+A sandbox watched by two InvisVM processes (the GUI and the right-click
+launcher that started it) is recorded by both; rows are unique per
+sandbox id and the second one is merged in: the summary with the better
+source (wait4 over a /proc sample) wins, and a kill seen by either
+process makes the outcome 'killed'.
+
+Times are Unix timestamps. Sessions are indexed by start time (time
+ranges, recent sessions) and by app and/or policy followed by runtime:
+totals read a covering index in group order, and each group's median
+is a LIMIT/OFFSET seek into its runtime-ordered index range rather than
+a sort, so a query over hundreds of thousands of sessions takes well
+under a second. Writers and readers share one connection in WAL mode.
+
+Outcomes:
+  ok        exited with status 0
+  failed    non-zero status, or ended by a signal InvisVM did not send
+  killed    stopped from InvisVM (kill button, watchdog, RAM budget)
+  unknown   exit status not known (adopted sandboxes)
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+from config import SESSION_HISTORY_DB
+from metrics import METRICS
+
+SCHEMA_VERSION = 1
+
+SUMMARY_COLUMNS = (
+    'user_cpu', 'system_cpu', 'max_rss_bytes', 'minor_faults', 'major_faults',
+    'voluntary_switches', 'involuntary_switches', 'read_bytes', 'write_bytes',
+)
+
+COLUMNS = (
+    'sandbox_id', 'pid', 'app', 'name', 'path', 'policy', 'started', 'ended', 'runtime',
+    'outcome', 'exit_code', 'signal', 'files', 'network_events', 'watchdog', 'source',
+) + SUMMARY_COLUMNS
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    sandbox_id TEXT,
+    pid INTEGER,
+    app TEXT NOT NULL,
+    name TEXT,
+    path TEXT,
+    policy TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL NOT NULL,
+    runtime REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    exit_code INTEGER,
+    signal TEXT,
+    files INTEGER,
+    network_events INTEGER,
+    watchdog TEXT,
+    source TEXT,
+    {', '.join(f'{column} REAL' for column in SUMMARY_COLUMNS)}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_sandbox ON sessions (sandbox_id) WHERE sandbox_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started);
+CREATE INDEX IF NOT EXISTS sessions_group ON sessions (
+    app, policy, runtime, started, outcome, user_cpu, system_cpu, max_rss_bytes, network_events
+);
+CREATE INDEX IF NOT EXISTS sessions_app ON sessions (app, runtime, started);
+CREATE INDEX IF NOT EXISTS sessions_policy ON sessions (
+    policy, runtime, started, outcome, user_cpu, system_cpu, max_rss_bytes, network_events
+);
+"""
+
+INSERT_SQL = f'INSERT INTO sessions ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})'
+
+# The new row's summary is better: (source rank, exit status known) is higher
+_SOURCE_RANK = "CASE {0}source WHEN 'wait4' THEN 2 WHEN 'proc' THEN 1 ELSE 0 END"
+_BETTER = (f"({_SOURCE_RANK.format('excluded.')}, excluded.exit_code IS NOT NULL) > "
+           f"({_SOURCE_RANK.format('')}, exit_code IS NOT NULL)")
+_MERGED = ('exit_code', 'signal', 'source') + SUMMARY_COLUMNS
+
+UPSERT_SQL = INSERT_SQL + f"""
+ON CONFLICT (sandbox_id) WHERE sandbox_id IS NOT NULL DO UPDATE SET
+    outcome = CASE WHEN 'killed' IN (outcome, excluded.outcome) THEN 'killed'
+                   WHEN {_BETTER} THEN excluded.outcome ELSE outcome END,
+    {', '.join(f'{column} = CASE WHEN {_BETTER} THEN excluded.{column} ELSE {column} END' for column in _MERGED)},
+    network_events = MAX(network_events, excluded.network_events),
+    watchdog = COALESCE(watchdog, excluded.watchdog)
+"""
+
+GROUPINGS = {
+    ('app', 'policy'): ('app', 'policy'),
+    ('app',): ('app',),
+    ('policy',): ('policy',),
+}
+
+OUTCOMES = ('ok', 'failed', 'killed', 'unknown')
+
+
+def outcome_of(exit_code, killed=False):
+    """Outcome of a session from its exit status"""
+    if killed:
+        return 'killed'
+    if exit_code is None:
+        return 'unknown'
+    return 'ok' if exit_code == 0 else 'failed'
+
+
+class SessionHistory:
+    """
+    Ended sandboxes, stored in db_file
+    """
+
+    def __init__(self, db_file=SESSION_HISTORY_DB):
+        self.db_file = db_file
+        self.logger = logging.getLogger('FirejailHandler')
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        """Open (and create) the database on first use; caller holds the lock"""
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+            db = sqlite3.connect(self.db_file, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            with db:
+                db.executescript(SCHEMA)
+                db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            # Refresh the planner's statistics so medians seek the runtime indexes
+            db.execute('PRAGMA optimize')
+            self._db = db
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- writing ----
+
+    def add(self, session):
+        """
+        Record one ended session
+        session: dict with COLUMNS keys (missing ones are stored as NULL);
+                 'started'/'ended' may be datetimes
+        """
+        row = dict(session)
+        for key in ('started', 'ended'):
+            if isinstance(row.get(key), datetime):
+                row[key] = row[key].timestamp()
+        values = [row.get(column) for column in COLUMNS]
+        with METRICS.timer('history.add'):
+            with self._lock:
+                db = self._connect()
+                with db:
+                    db.execute(UPSERT_SQL, values)
+
+    # ---- queries ----
+
+    @staticmethod
+    def _where(since, until, app, policy):
+        clauses, params = [], []
+        for column, op, value in (('started', '>=', since), ('started', '<', until),
+                                  ('app', '=', app), ('policy', '=', policy)):
+            if value is not None:
+                clauses.append(f'{column} {op} ?')
+                params.append(value)
+        return (f'WHERE {" AND ".join(clauses)}' if clauses else ''), params
+
+    def stats(self, since=None, until=None, by=('app', 'policy'), app=None, policy=None):
+        """
+        Aggregates per group of sessions started in [since, until)
+        by: ('app', 'policy'), ('app',) or ('policy',)
+        Returns: list of dicts (group columns, launches, ok, failed, killed,
+        unknown, failure_rate, median_runtime, mean_runtime, mean_cpu,
+        mean_peak_rss_bytes, network_events), most launched first
+        """
+        try:
+            group = GROUPINGS[tuple(by)]
+        except KeyError:
+            raise ValueError(f'Cannot group sessions by {by!r}')
+        where, params = self._where(since, until, app, policy)
+        columns = ', '.join(group)
+        outcome_sums = ', '.join(f"SUM(outcome = '{o}') AS {o}" for o in OUTCOMES)
+        totals_sql = f"""
+            SELECT {columns}, COUNT(*) AS launches, {outcome_sums},
+                   AVG(runtime) AS mean_runtime,
+                   AVG(user_cpu + system_cpu) AS mean_cpu,
+                   AVG(max_rss_bytes) AS mean_peak_rss_bytes,
+                   SUM(network_events) AS network_events
+            FROM sessions {where}
+            GROUP BY {columns}
+        """
+        results = []
+        with METRICS.timer('history.stats'):
+            with self._lock:
+                db = self._connect()
+                for row in db.execute(totals_sql, params).fetchall():
+                    entry = dict(row)
+                    entry['median_runtime'] = self._median(
+                        db, since, until, entry.get('app', app), entry.get('policy', policy), entry['launches'])
+                    entry['failure_rate'] = entry['failed'] / entry['launches']
+                    results.append(entry)
+        results.sort(key=lambda entry: entry['launches'], reverse=True)
+        return results
+
+    def _median(self, db, since, until, app, policy, count):
+        """Median runtime of one group of `count` sessions: its middle row(s) by runtime"""
+        where, params = self._where(since, until, app, policy)
+        row = db.execute(
+            f'SELECT AVG(runtime) FROM (SELECT runtime FROM sessions {where} '
+            f'ORDER BY runtime LIMIT ? OFFSET ?)',
+            params + [2 - count % 2, (count - 1) // 2]
+        ).fetchone()
+        return row[0]
+
+    def sessions(self, since=None, until=None, app=None, policy=None, limit=100):
+        """Most recent sessions started in [since, until), newest first, as dicts"""
+        where, params = self._where(since, until, app, policy)
+        with self._lock:
+            db = self._connect()
+            rows = db.execute(
+                f'SELECT * FROM sessions {where} ORDER BY started DESC LIMIT ?',
+                params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        """Number of recorded sessions"""
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+# Shared by every handler in the process
+default_history = SessionHistory()
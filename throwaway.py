@@ -0,0 +1,111 @@
+"""
+Throwaway Sandboxes
+RAM-backed writable filesystems with a per-sandbox budget
+
+Policies with 'home': 'tmpfs' give the sandbox a tmpfs home (--private, or
+--private-home=<file> to bring the opened document along) and a tmpfs /tmp
+(--private-tmp), which the kernel frees when the sandbox's mount namespace
+goes away. Writes elsewhere (other writable host paths such as /var/tmp or
+mounted drives) still reach the disk unless 'overlay_tmpfs': True sends
+them to a tmpfs overlay too (--overlay-tmpfs, only on firejail builds with
+overlayfs support, which is why the shipped throwaway policy leaves it off).
+
+Usage is measured from outside through /proc/<pid>/root of a process in
+the sandbox: every tmpfs/overlay mount that is not the host's is
+statvfs'd. The monitors compare it with the 'tmpfs_mb' resource.
+"""
+
+import os
+
+import procfs
+
+MB = 1024 * 1024
+
+
+def _inner_pids(pid):
+    """Descendants of a firejail process"""
+    _, children = procfs.scan_processes()
+    return [p for p in procfs.process_tree(pid, children) if p != pid]
+
+
+def private_mounts(inner_pid):
+    """
+    Mount points inside a sandbox that are RAM-backed and not shared with the host
+    Returns: list of (mount point, st_dev)
+    """
+    root = f'/proc/{inner_pid}/root'
+    mounts = []
+    seen = set()
+    with open(f'/proc/{inner_pid}/mounts', 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 3 or fields[2] not in ('tmpfs', 'overlay'):
+                continue
+            mount_point = fields[1].replace('\\040', ' ')
+            try:
+                dev = os.stat(root + mount_point).st_dev
+            except OSError:
+                continue
+            try:
+                host_dev = os.stat(mount_point).st_dev
+            except OSError:
+                host_dev = None
+            if dev != host_dev and dev not in seen:
+                seen.add(dev)
+                mounts.append((mount_point, dev))
+    return mounts
+
+
+def measure(inner_pid):
+    """Bytes used in a sandbox's private RAM-backed mounts, or None if unreadable"""
+    root = f'/proc/{inner_pid}/root'
+    try:
+        used = 0
+        for mount_point, _ in private_mounts(inner_pid):
+            st = os.statvfs(root + mount_point)
+            used += (st.f_blocks - st.f_bfree) * st.f_frsize
+        return used
+    except OSError:
+        return None
+
+
+class TmpfsUsage:
+    """
+    Live RAM-backed write usage of one throwaway sandbox
+    Mutable; held by the sandbox's registry record
+    """
+
+    def __init__(self, budget_mb=0, action='kill'):
+        self.budget_bytes = int(budget_mb or 0) * MB
+        self.action = action
+        self.used_bytes = None
+        self.exceeded = False
+        self._inner_pid = None
+
+    def refresh(self, pid):
+        """
+        Measure again (pid: the firejail process)
+        Returns: True if this measurement first exceeded the budget
+        """
+        used = measure(self._inner_pid) if self._inner_pid else None
+        if used is None:
+            self._inner_pid = None
+            for inner in _inner_pids(pid):
+                used = measure(inner)
+                if used is not None:
+                    self._inner_pid = inner
+                    break
+        if used is None:
+            return False
+        self.used_bytes = used
+        if self.budget_bytes and used > self.budget_bytes and not self.exceeded:
+            self.exceeded = True
+            return True
+        return False
+
+    def describe(self):
+        """e.g. '37 / 512 MB'"""
+        used = '?' if self.used_bytes is None else f'{self.used_bytes / MB:.0f}'
+        if self.budget_bytes:
+            return f'{used} / {self.budget_bytes // MB} MB'
+        return f'{used} MB'
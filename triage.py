@@ -0,0 +1,294 @@
+"""
+InvisVM Headless Triage (triage.py)
+Bulk-detonates untrusted files in restrictive sandboxes without the GUI
+
+Usage:
+    python3 triage.py ~/suspicious/ extra_file.odt --timeout 60 --workers 8
+    find ~/mail -name '*.pdf' | python3 triage.py --from-file -
+
+Every file is hashed, skipped if its SHA-256 already has a verdict under
+the same policy and timeout, and otherwise launched through the launch scheduler (batch priority), which
+holds launches back while the host is short of memory or overloaded.
+Results are appended to a JSONL report as soon as each file finishes.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from firejail_handler import FirejailHandler
+from launch_scheduler import LaunchScheduler, PRIORITY_BATCH
+from metrics import install_sigusr1_dump
+from config import PROMETHEUS_TEXTFILE, OUTPUT_TAIL_IN_LOG
+from prometheus_exporter import PrometheusExporter
+
+TRIAGE_DIR = os.path.expanduser('~/InvisVM/triage')
+VERDICT_CACHE_FILE = os.path.join(TRIAGE_DIR, 'verdicts.json')
+
+# Save the verdict cache after this many new verdicts
+CACHE_SAVE_EVERY = 25
+
+# Seconds to wait for a killed sandbox's exit to be handled
+KILL_WAIT = 10
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    """Stream a file through SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_targets(paths):
+    """
+    Yield regular files from files and directory trees, lazily
+    Symlinks are skipped so a hostile tree cannot point triage at host files
+    """
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.islink(path):
+            continue
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    full = os.path.join(dirpath, name)
+                    if not os.path.islink(full) and os.path.isfile(full):
+                        yield full
+        elif os.path.isfile(path):
+            yield path
+
+
+def iter_list_file(list_path):
+    """Yield paths from a file (or '-' for stdin), one per line"""
+    stream = sys.stdin if list_path == '-' else open(list_path, 'r')
+    try:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class TriageRunner:
+    """
+    Streams files through a bounded pool of sandboxes and records verdicts
+    """
+
+    def __init__(self, handler=None, policy='restrictive', timeout=60, workers=None,
+                 report_path=None, cache_file=VERDICT_CACHE_FILE, rescan=False):
+        self.handler = handler or FirejailHandler(adopt=False)
+        # Verdicts and timeouts are per file, so every file gets its own sandbox
+        self.handler.reuse_sandboxes = False
+        self.policy = policy
+        self.timeout = timeout
+        self.workers = workers or os.cpu_count() or 2
+        self.cache_file = cache_file
+        self.rescan = rescan
+        self.scheduler = LaunchScheduler(self.handler, max_sandboxes=self.workers, max_in_flight=self.workers)
+
+        os.makedirs(TRIAGE_DIR, exist_ok=True)
+        if report_path is None:
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            report_path = os.path.join(TRIAGE_DIR, f'report-{stamp}.jsonl')
+        self.report_path = report_path
+
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.verdicts = self._load_cache()
+        self.counts = {}
+
+    def _cache_key(self, sha256):
+        """Verdicts depend on the policy and timeout a file was detonated with"""
+        return f'{sha256}:{self.policy}:{self.timeout:g}'
+
+    def _load_cache(self):
+        """Load (hash, policy, timeout) -> verdict cache"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        """Atomically write the verdict cache"""
+        with self._lock:
+            data = dict(self.verdicts)
+            self._unsaved = 0
+        tmp = f'{self.cache_file}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.cache_file)
+
+    def run(self, targets):
+        """
+        Triage an iterable of file paths
+        At most 2 x workers files are queued at any time, so memory stays
+        bounded however large the input is
+        Returns: dict of verdict -> count
+        """
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+
+        with open(self.report_path, 'a') as report, \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+
+            def done(future):
+                in_flight.release()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'verdict': 'error', 'error': str(e)}
+                self._record(report, result)
+
+            for path in targets:
+                in_flight.acquire()
+                pool.submit(self.triage_file, path).add_done_callback(done)
+
+        self._save_cache()
+        return dict(self.counts)
+
+    def _record(self, report, result):
+        """Append one result to the report and update counters"""
+        line = json.dumps(result, default=str)
+        save = False
+        with self._lock:
+            report.write(line + '\n')
+            report.flush()
+            verdict = result.get('verdict', 'error')
+            self.counts[verdict] = self.counts.get(verdict, 0) + 1
+            if result.get('sha256') and not result.get('cached') and verdict != 'error':
+                self.verdicts[self._cache_key(result['sha256'])] = {
+                    k: result[k] for k in ('verdict', 'exit_code', 'network_events', 'runtime', 'triaged_at',
+                                           'policy', 'timeout')
+                    if k in result
+                }
+                self._unsaved += 1
+                save = self._unsaved >= CACHE_SAVE_EVERY
+        if save:
+            self._save_cache()
+
+    def triage_file(self, path):
+        """Detonate one file and return its result record"""
+        result = {'path': path, 'policy': self.policy, 'timeout': self.timeout}
+
+        try:
+            result['size'] = os.path.getsize(path)
+            result['sha256'] = sha256_file(path)
+        except OSError as e:
+            result.update(verdict='unreadable', error=str(e))
+            return result
+
+        cached = self.verdicts.get(self._cache_key(result['sha256']))
+        if cached and not self.rescan:
+            result.update(cached)
+            result['cached'] = True
+            return result
+
+        ticket = self.scheduler.submit(path, self.policy, priority=PRIORITY_BATCH)
+        success, pid, message = ticket.wait()
+        started = time.monotonic()
+        result['triaged_at'] = datetime.now().isoformat()
+        if not success:
+            result.update(verdict='launch_failed', error=message)
+            return result
+
+        # Records are immutable, so this stays valid after the sandbox is untracked
+        record = self.handler.registry.get(pid)
+        sandbox_logger = record.logger if record else None
+        output = record.output if record else None
+        result['pid'] = pid
+        result['sandbox_id'] = record.sandbox_id if record else None
+
+        # The handler's monitor reaps the sandbox (with its rusage); only
+        # wait for it to finish, so the exit status is never lost to a race
+        summary = self.handler.wait_exit(pid, self.timeout)
+        timed_out = summary is None
+        if timed_out:
+            self.handler.kill_sandbox(pid, 'after the triage timeout')
+            summary = self.handler.wait_exit(pid, KILL_WAIT)
+
+        result['runtime'] = round(time.monotonic() - started, 3)
+        result['exit_code'] = summary['exit_code'] if summary else None
+
+        if output is not None:
+            output.wait_closed(timeout=1)
+            result['output_bytes'] = output.total_bytes
+            result['output_tail'] = output.tail(OUTPUT_TAIL_IN_LOG)
+
+        events = sandbox_logger.events if sandbox_logger else []
+        result['network_events'] = sum(1 for e in events if e['type'] == 'network')
+        result['events'] = [
+            {'type': e['type'], 'message': e['message']}
+            for e in events
+        ]
+
+        if timed_out:
+            result['verdict'] = 'timeout'
+        elif result['network_events']:
+            result['verdict'] = 'network_activity'
+        elif result['exit_code'] not in (0, None):
+            result['verdict'] = 'crashed'
+        else:
+            result['verdict'] = 'exited'
+        return result
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description='InvisVM - Headless bulk triage of untrusted files')
+    parser.add_argument('paths', nargs='*', help='Files or directories to triage')
+    parser.add_argument('--from-file', help="Read paths from a file, one per line ('-' for stdin)")
+    parser.add_argument('--policy', default='restrictive', help='Security policy (default: restrictive)')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds each file may run (default: 60)')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent sandboxes (default: CPU count)')
+    parser.add_argument('--report', help='JSONL report path (default: ~/InvisVM/triage/report-<time>.jsonl)')
+    parser.add_argument('--rescan', action='store_true', help='Ignore cached verdicts')
+    parser.add_argument('--prometheus-textfile', default=PROMETHEUS_TEXTFILE,
+                        help='Export fleet metrics to this .prom file while triaging')
+    args = parser.parse_args()
+
+    if not args.paths and not args.from_file:
+        parser.error('no paths given')
+
+    install_sigusr1_dump()
+
+    targets = iter_targets(args.paths)
+    if args.from_file:
+        listed = iter_targets(iter_list_file(args.from_file))
+        targets = (p for source in (targets, listed) for p in source)
+
+    runner = TriageRunner(
+        policy=args.policy,
+        timeout=args.timeout,
+        workers=args.workers,
+        report_path=args.report,
+        rescan=args.rescan,
+    )
+
+    exporter = None
+    if args.prometheus_textfile:
+        exporter = PrometheusExporter(runner.handler, args.prometheus_textfile)
+        exporter.start()
+    try:
+        counts = runner.run(targets)
+    finally:
+        if exporter:
+            exporter.stop()
+
+    print(f'Report: {runner.report_path}')
+    for verdict, count in sorted(counts.items()):
+        print(f'  {verdict}: {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+TTL Scheduler
+Sandboxes that expire: one thread for every deadline
+
+A sandbox launched with a time limit (launch_sandboxed(ttl_minutes=...)
+or a policy's 'ttl_minutes') gets a wall-clock deadline in its record,
+which the state file keeps across restarts. The scheduler follows the
+registry: records with a deadline are pushed onto a heap, removed ones
+are forgotten, and a single thread sleeps on a condition variable until
+the earliest deadline (or until an earlier one is added). Expired
+sandboxes are handed to the expire callback, which runs the graceful
+kill path.
+
+Cancelled and rescheduled entries stay on the heap and are skipped when
+they come up (lazy deletion), so schedule() and cancel() are O(log n)
+and O(1) and never rebuild the heap.
+"""
+
+import time
+import heapq
+import itertools
+import threading
+
+# Longest single sleep, so a wall-clock change is noticed within this time
+MAX_WAIT = 60.0
+
+
+class TTLScheduler:
+    """
+    Deadlines of many sandboxes, enforced by one thread
+    expire(pid): called on the scheduler thread for each expired sandbox
+    """
+
+    def __init__(self, expire):
+        self.expire = expire
+        self._cond = threading.Condition()
+        self._heap = []             # (deadline, seq, pid)
+        self._deadlines = {}        # pid -> current deadline
+        self._seq = itertools.count()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, pid, deadline):
+        """Expire pid at deadline (time.time() seconds); replaces an earlier deadline"""
+        with self._cond:
+            if self._deadlines.get(pid) == deadline:
+                return
+            self._deadlines[pid] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._seq), pid))
+            self._ensure_thread()
+            self._cond.notify()
+
+    def cancel(self, pid):
+        """Forget a sandbox's deadline"""
+        with self._cond:
+            self._deadlines.pop(pid, None)
+
+    def remaining(self, pid):
+        """Seconds until pid expires, or None without a deadline"""
+        deadline = self._deadlines.get(pid)
+        return None if deadline is None else max(0.0, deadline - time.time())
+
+    def on_registry_change(self, change):
+        """SandboxRegistry listener: track deadlines of added, updated and removed records"""
+        if change.kind == 'removed' or not change.record.deadline:
+            self.cancel(change.pid)
+        else:
+            self.schedule(change.pid, change.record.deadline)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _ensure_thread(self):
+        """Start the thread on the first deadline; caller holds the lock"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ttl-scheduler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                expired = []
+                while not expired:
+                    if self._stopped:
+                        return
+                    now = time.time()
+                    while self._heap and self._heap[0][0] <= now:
+                        deadline, _, pid = heapq.heappop(self._heap)
+                        if self._deadlines.get(pid) == deadline:
+                            del self._deadlines[pid]
+                            expired.append(pid)
+                    if not expired:
+                        timeout = min(self._heap[0][0] - now, MAX_WAIT) if self._heap else None
+                        self._cond.wait(timeout)
+            for pid in expired:
+                try:
+                    self.expire(pid)
+                except Exception:
+                    pass
@@ -7,6 +7,9 @@ from .search_tab import AppSearchLauncher
 from .policies_tab import PoliciesTab
 from .sandboxes_tab import SandboxesTab
 from .about_tab import AboutTab
+from .diagnostics_tab import DiagnosticsTab
+from .history_tab import HistoryTab
+from .output_viewer import OutputViewerDialog
 from .theme import COLORS, FONTS
 
 __all__ = [
@@ -15,6 +18,9 @@ __all__ = [
     'PoliciesTab',
     'SandboxesTab',
     'AboutTab',
+    'DiagnosticsTab',
+    'HistoryTab',
+    'OutputViewerDialog',
     'COLORS',
     'FONTS',
 ]
@@ -0,0 +1,123 @@
+"""
+Diagnostics Tab
+"""
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
+from metrics import METRICS
+from .theme import COLORS, FONTS, get_button_style, get_table_style
+
+class DiagnosticsTab(QWidget):
+    """Operation timings and counters from FirejailHandler"""
+
+    COLUMNS = ['Operation', 'Count', 'Mean (ms)', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Max (ms)']
+
+    def __init__(self, firejail_handler):
+        super().__init__()
+        self.firejail_handler = firejail_handler
+        self.setStyleSheet(f'background-color: {COLORS["tab_bg"]};')
+        self.setup_ui()
+
+        # Refresh only while the tab is visible
+        self.refresh_timer = QTimer()
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def setup_ui(self):
+        """Setup diagnostics tab"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(14)
+
+        # Header
+        logo = QLabel('InvisVM')
+        logo.setFont(QFont(*FONTS['logo']))
+        logo.setStyleSheet(f'color: {COLORS["primary"]}; letter-spacing: 1px;')
+        header = QHBoxLayout()
+        header.addWidget(logo)
+        header.addStretch()
+        layout.addLayout(header)
+
+        # Title
+        title = QLabel('Diagnostics')
+        title.setFont(QFont(*FONTS['title']))
+        title.setStyleSheet(f'color: {COLORS["text_primary"]};')
+        layout.addWidget(title)
+
+        # Timings table
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for col in range(1, len(self.COLUMNS)):
+            header.setSectionResizeMode(col, QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        self.table.setStyleSheet(get_table_style())
+        layout.addWidget(self.table)
+
+        # Buttons
+        btn_layout = QHBoxLayout()
+        refresh = QPushButton('🔄  Refresh')
+        refresh.setStyleSheet(get_button_style())
+        refresh.clicked.connect(self.refresh)
+        btn_layout.addWidget(refresh)
+
+        dump = QPushButton('💾  Dump JSON')
+        dump.setStyleSheet(get_button_style())
+        dump.clicked.connect(self.dump_json)
+        btn_layout.addWidget(dump)
+        btn_layout.addStretch()
+        layout.addLayout(btn_layout)
+
+        self.counters = QLabel()
+        self.counters.setWordWrap(True)
+        self.counters.setStyleSheet(f'color: {COLORS["text_secondary"]}; font-size: 9pt;')
+        layout.addWidget(self.counters)
+
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        """Start refreshing when shown"""
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start(2000)
+
+    def hideEvent(self, event):
+        """Stop refreshing when hidden"""
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def refresh(self):
+        """Reload metrics into the table"""
+        metrics = self.firejail_handler.get_metrics()
+        histograms = [(n, m) for n, m in metrics.items() if m['type'] == 'histogram']
+        counters = [(n, m) for n, m in metrics.items() if m['type'] == 'counter']
+
+        # Hottest paths first
+        histograms.sort(key=lambda item: item[1]['sum'], reverse=True)
+
+        self.table.setRowCount(len(histograms))
+        for row, (name, m) in enumerate(histograms):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            values = [m['count'], m['mean'], m['p50'], m['p95'], m['p99'], m['max']]
+            for col, value in enumerate(values, start=1):
+                text = str(value) if col == 1 else f'{value * 1000:.2f}'
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, item)
+
+        self.counters.setText('   '.join(f'{name}: {m["value"]}' for name, m in counters)
+                              or 'No counters recorded yet')
+
+    def dump_json(self):
+        """Write metrics snapshot to a JSON file"""
+        try:
+            path = METRICS.dump_json()
+            QMessageBox.information(self, 'Metrics Saved', f'Metrics written to:\n{path}')
+        except Exception as e:
+            QMessageBox.critical(self, '✗ Error', f'Could not write metrics: {str(e)}')
@@ -0,0 +1,192 @@
+"""
+Session History Tab
+"""
+
+import time
+from datetime import datetime
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont
+from .theme import COLORS, FONTS, get_button_style, get_table_style
+
+MB = 1024 * 1024
+
+
+def _duration(seconds):
+    """e.g. '45s', '12.5 min', '3.2 h'"""
+    if seconds is None:
+        return '-'
+    if seconds < 60:
+        return f'{seconds:.0f}s'
+    if seconds < 3600:
+        return f'{seconds / 60:.1f} min'
+    return f'{seconds / 3600:.1f} h'
+
+
+class HistoryTab(QWidget):
+    """Aggregates and recent entries of the session history"""
+
+    RANGES = [
+        ('Last 24 hours', 86400),
+        ('Last 7 days', 7 * 86400),
+        ('Last 30 days', 30 * 86400),
+        ('All time', None),
+    ]
+    GROUPINGS = [
+        ('App and policy', ('app', 'policy')),
+        ('App', ('app',)),
+        ('Policy', ('policy',)),
+    ]
+    STATS_COLUMNS = ['App', 'Policy', 'Launches', 'Median Runtime', 'Failure Rate',
+                     'Killed', 'Mean CPU', 'Mean Peak RSS', 'Network Events']
+    SESSION_COLUMNS = ['Started', 'Application', 'Policy', 'Runtime', 'Outcome', 'CPU', 'Peak RSS']
+    RECENT_LIMIT = 100
+
+    def __init__(self, firejail_handler):
+        super().__init__()
+        self.firejail_handler = firejail_handler
+        self.setStyleSheet(f'background-color: {COLORS["tab_bg"]};')
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Setup history tab"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(14)
+
+        # Header
+        logo = QLabel('InvisVM')
+        logo.setFont(QFont(*FONTS['logo']))
+        logo.setStyleSheet(f'color: {COLORS["primary"]}; letter-spacing: 1px;')
+        header = QHBoxLayout()
+        header.addWidget(logo)
+        header.addStretch()
+        layout.addLayout(header)
+
+        # Title
+        title = QLabel('Session History')
+        title.setFont(QFont(*FONTS['title']))
+        title.setStyleSheet(f'color: {COLORS["text_primary"]};')
+        layout.addWidget(title)
+
+        # Controls
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel('Range:'))
+        self.range_combo = QComboBox()
+        self.range_combo.addItems([label for label, _ in self.RANGES])
+        self.range_combo.setCurrentIndex(1)
+        self.range_combo.currentIndexChanged.connect(self.refresh)
+        controls.addWidget(self.range_combo)
+
+        controls.addWidget(QLabel('Group by:'))
+        self.group_combo = QComboBox()
+        self.group_combo.addItems([label for label, _ in self.GROUPINGS])
+        self.group_combo.currentIndexChanged.connect(self.refresh)
+        controls.addWidget(self.group_combo)
+        controls.addStretch()
+
+        refresh = QPushButton('🔄  Refresh')
+        refresh.setStyleSheet(get_button_style())
+        refresh.clicked.connect(self.refresh)
+        controls.addWidget(refresh)
+        layout.addLayout(controls)
+
+        # Aggregates
+        self.stats_table = self._make_table(self.STATS_COLUMNS)
+        layout.addWidget(self.stats_table, 3)
+
+        recent = QLabel('Recent Sessions')
+        recent.setStyleSheet(f'color: {COLORS["text_secondary"]}; font-weight: bold;')
+        layout.addWidget(recent)
+        self.sessions_table = self._make_table(self.SESSION_COLUMNS)
+        layout.addWidget(self.sessions_table, 2)
+
+        self.status = QLabel()
+        self.status.setStyleSheet(f'color: {COLORS["text_secondary"]}; font-size: 9pt;')
+        layout.addWidget(self.status)
+
+        self.setLayout(layout)
+
+    def _make_table(self, columns):
+        table = QTableWidget()
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        header = table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setStretchLastSection(True)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.setAlternatingRowColors(True)
+        table.setStyleSheet(get_table_style())
+        return table
+
+    def showEvent(self, event):
+        """Reload when shown"""
+        super().showEvent(event)
+        self.refresh()
+
+    def refresh(self):
+        """Run the aggregate and recent-session queries for the selected range"""
+        span = self.RANGES[self.range_combo.currentIndex()][1]
+        by = self.GROUPINGS[self.group_combo.currentIndex()][1]
+        since = time.time() - span if span else None
+        started = time.perf_counter()
+        try:
+            stats = self.firejail_handler.get_session_stats(since=since, by=by)
+            sessions = self.firejail_handler.get_sessions(since=since, limit=self.RECENT_LIMIT)
+        except Exception as e:
+            QMessageBox.critical(self, '✗ Error', f'Could not read session history: {str(e)}')
+            return
+        elapsed = time.perf_counter() - started
+
+        self.stats_table.setColumnHidden(0, 'app' not in by)
+        self.stats_table.setColumnHidden(1, 'policy' not in by)
+        self.stats_table.setRowCount(len(stats))
+        for row, entry in enumerate(stats):
+            cpu = entry['mean_cpu']
+            rss = entry['mean_peak_rss_bytes']
+            values = [
+                entry.get('app', ''),
+                entry.get('policy', ''),
+                str(entry['launches']),
+                _duration(entry['median_runtime']),
+                f'{entry["failure_rate"] * 100:.1f}%',
+                str(entry['killed']),
+                '-' if cpu is None else f'{cpu:.1f}s',
+                '-' if rss is None else f'{rss / MB:.0f} MB',
+                str(entry['network_events'] or 0),
+            ]
+            self._fill_row(self.stats_table, row, values, numeric={2, 3, 4, 5, 6, 7, 8})
+
+        self.sessions_table.setRowCount(len(sessions))
+        for row, session in enumerate(sessions):
+            cpu = None
+            if session['user_cpu'] is not None:
+                cpu = session['user_cpu'] + session['system_cpu']
+            outcome = session['outcome']
+            if outcome == 'failed':
+                outcome = f'failed ({session["signal"] or session["exit_code"]})'
+            values = [
+                datetime.fromtimestamp(session['started']).strftime('%Y-%m-%d %H:%M'),
+                session['name'],
+                session['policy'],
+                _duration(session['runtime']),
+                outcome,
+                '-' if cpu is None else f'{cpu:.1f}s',
+                '-' if session['max_rss_bytes'] is None else f'{session["max_rss_bytes"] / MB:.0f} MB',
+            ]
+            self._fill_row(self.sessions_table, row, values, numeric={3, 5, 6})
+
+        launches = sum(entry['launches'] for entry in stats)
+        self.status.setText(f'{launches} sessions in range  •  queried in {elapsed * 1000:.0f} ms')
+
+    @staticmethod
+    def _fill_row(table, row, values, numeric):
+        for col, text in enumerate(values):
+            item = QTableWidgetItem(text)
+            if col in numeric:
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            table.setItem(row, col, item)
@@ -5,7 +5,7 @@ Application Launcher Tab
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-from config import SECURITY_POLICIES
+from policy_compiler import get_security_policies
 from .theme import COLORS, FONTS, get_button_style, get_card_style
 
 class LauncherTab(QWidget):
@@ -122,7 +122,7 @@ class LauncherTab(QWidget):
         
         policy_layout = QHBoxLayout()
         self.policy_combo = QComboBox()
-        self.policy_combo.addItems(SECURITY_POLICIES.keys())
+        self.policy_combo.addItems(get_security_policies().keys())
         self.policy_combo.setStyleSheet(f"""
             QComboBox {{
                 background-color: {COLORS['bg_white']};
@@ -175,7 +175,7 @@ class LauncherTab(QWidget):
     def update_policy_description(self):
         """Update policy description"""
         policy = self.policy_combo.currentText()
-        desc = SECURITY_POLICIES[policy]['description']
+        desc = get_security_policies()[policy].get('description', policy)
         self.policy_desc.setText(desc)
     
     def set_file_path(self, file_name):
@@ -0,0 +1,79 @@
+"""
+Sandbox Output Viewer
+"""
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QPlainTextEdit
+)
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QFont
+from .theme import COLORS, FONTS, get_button_style
+
+class OutputViewerDialog(QDialog):
+    """Live view of a sandbox's captured stdout/stderr"""
+
+    def __init__(self, output, app_name, pid, parent=None):
+        super().__init__(parent)
+        # Hold the buffer itself so the view survives the sandbox exiting
+        self.output = output
+        self.shown_bytes = -1
+        self.setWindowTitle(f'Output - {app_name} (PID {pid})')
+        self.resize(760, 480)
+        self.setStyleSheet(f'background-color: {COLORS["bg_white"]};')
+        self.setup_ui(app_name)
+
+        self.refresh_timer = QTimer()
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(1000)
+        self.refresh()
+
+    def setup_ui(self, app_name):
+        """Setup dialog layout"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(16, 16, 16, 16)
+        layout.setSpacing(10)
+
+        title = QLabel(app_name)
+        title.setFont(QFont(*FONTS['title']))
+        title.setStyleSheet(f'color: {COLORS["text_primary"]};')
+        layout.addWidget(title)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont('Monospace', 9))
+        self.text.setStyleSheet(f'border: 1px solid {COLORS["border"]}; border-radius: 6px;')
+        layout.addWidget(self.text)
+
+        bottom = QHBoxLayout()
+        self.status = QLabel()
+        self.status.setStyleSheet(f'color: {COLORS["text_secondary"]}; font-size: 9pt;')
+        bottom.addWidget(self.status)
+        bottom.addStretch()
+        close = QPushButton('Close')
+        close.setStyleSheet(get_button_style())
+        close.clicked.connect(self.accept)
+        bottom.addWidget(close)
+        layout.addLayout(bottom)
+
+        self.setLayout(layout)
+
+    def refresh(self):
+        """Reload the buffer if it changed"""
+        total = self.output.total_bytes
+        if total != self.shown_bytes:
+            self.shown_bytes = total
+            bar = self.text.verticalScrollBar()
+            at_bottom = bar.value() >= bar.maximum() - 2
+            self.text.setPlainText(self.output.tail())
+            if at_bottom:
+                bar.setValue(bar.maximum())
+
+        state = 'exited' if self.output.closed.is_set() else 'running'
+        self.status.setText(f'{self.output.summary()} - {state}')
+        if self.output.closed.is_set():
+            self.refresh_timer.stop()
+
+    def done(self, result):
+        """Stop refreshing when closed"""
+        self.refresh_timer.stop()
+        super().done(result)
@@ -42,11 +42,13 @@ class PoliciesTab(QWidget):
         text.setHtml("""
 <h3 style="color: #212121; margin-top: 8px;">🔒 Security Policies</h3>
 <p><b style="color: #f44336;">■ Restrictive (Maximum Security)</b></p>
-<ul><li>Network: BLOCKED</li><li>Devices: BLOCKED</li><li>Sound: BLOCKED</li></ul>
+<ul><li>Network: BLOCKED</li><li>Devices: BLOCKED</li><li>Sound: BLOCKED</li><li>Home: throwaway private copy</li><li>Limits: 2 GB RAM, 256 processes, 1 CPU core</li></ul>
+<p><b style="color: #8E24AA;">■ Throwaway (Untrusted Files)</b></p>
+<ul><li>As Restrictive, but the home and /tmp are in RAM and discarded on exit</li><li>RAM budget: 512 MB of written files, then the sandbox is killed</li></ul>
 <p><b style="color: #2196F3;">■ Standard (Balanced)</b></p>
-<ul><li>Network: ALLOWED</li><li>Devices: BLOCKED</li><li>Sound: BLOCKED</li></ul>
+<ul><li>Network: ALLOWED</li><li>Devices: BLOCKED</li><li>Sound: BLOCKED</li><li>Limits: 4 GB RAM, 512 processes, 2 CPU cores</li></ul>
 <p><b style="color: #4CAF50;">■ Permissive (Maximum Compatibility)</b></p>
-<ul><li>Network: ALLOWED</li><li>Devices: ALLOWED</li><li>Sound: ALLOWED</li></ul>
+<ul><li>Network: ALLOWED</li><li>Devices: ALLOWED</li><li>Sound: ALLOWED</li><li>Limits: 8 GB RAM, 2048 processes</li></ul>
 <h3 style="color: #212121; margin-top: 16px;">📋 Application Types</h3>
 <ul><li>📋 Desktop</li><li>📦 Snap</li><li>🏠 Flatpak</li><li>⚙️ Executable</li><li>🖼️ AppImage</li></ul>
         """)
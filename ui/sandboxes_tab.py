@@ -2,6 +2,9 @@
 Active Sandboxes Tab
 """
 
+import os
+import time
+
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
     QTableWidget, QTableWidgetItem, QHeaderView
@@ -42,13 +45,19 @@ class SandboxesTab(QWidget):
         
         # Table
         self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(['Application', 'PID', 'Policy', 'Actions'])
+        self.table.setColumnCount(9)
+        self.table.setHorizontalHeaderLabels(['Application', 'PID', 'Policy', 'Files', 'RAM Disk', 'Watchdog',
+                                              'Time Left', 'State', 'Actions'])
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Stretch)
         header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(3, QHeaderView.Stretch)
+        header.setSectionResizeMode(4, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(5, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(6, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(7, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(8, QHeaderView.ResizeToContents)
         
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.table.setSelectionBehavior(QTableWidget.SelectRows)
@@ -97,6 +106,16 @@ class SandboxesTab(QWidget):
             }}
         """)
         btn_layout.addWidget(self.kill_all)
+        
+        self.freeze_all = QPushButton('❄  Freeze All')
+        self.freeze_all.setToolTip('Suspend every running sandbox')
+        self.freeze_all.clicked.connect(self.main_window.freeze_all_sandboxes)
+        btn_layout.addWidget(self.freeze_all)
+        
+        self.thaw_all = QPushButton('▶  Thaw All')
+        self.thaw_all.setToolTip('Resume every frozen sandbox')
+        self.thaw_all.clicked.connect(self.main_window.thaw_all_sandboxes)
+        btn_layout.addWidget(self.thaw_all)
         btn_layout.addStretch()
         layout.addLayout(btn_layout)
         
@@ -104,19 +123,51 @@ class SandboxesTab(QWidget):
         self.status.setStyleSheet(f'color: {COLORS["text_secondary"]}; font-style: italic;')
         layout.addWidget(self.status)
         
+        # Launches held back by the launch scheduler (hidden while empty)
+        self.queue_title = QLabel('Queued Launches')
+        self.queue_title.setFont(QFont(*FONTS['subtitle']))
+        self.queue_title.setStyleSheet(f'color: {COLORS["text_primary"]}; font-weight: 600;')
+        layout.addWidget(self.queue_title)
+        
+        self.queue_table = QTableWidget()
+        self.queue_table.setColumnCount(5)
+        self.queue_table.setHorizontalHeaderLabels(['Application', 'Policy', 'Priority', 'Waiting For', ''])
+        queue_header = self.queue_table.horizontalHeader()
+        queue_header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for column in (1, 2, 4):
+            queue_header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        queue_header.setSectionResizeMode(3, QHeaderView.Stretch)
+        self.queue_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.queue_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.setMaximumHeight(180)
+        self.queue_table.setStyleSheet(self.table.styleSheet())
+        layout.addWidget(self.queue_table)
+        
+        queue_buttons = QHBoxLayout()
+        self.cancel_queued = QPushButton('✖  Cancel All Queued')
+        self.cancel_queued.clicked.connect(self.main_window.cancel_all_queued_launches)
+        queue_buttons.addWidget(self.cancel_queued)
+        queue_buttons.addStretch()
+        layout.addLayout(queue_buttons)
+        
+        self.populate_queue([])
+        
         self.setLayout(layout)
     
     def populate_sandboxes(self, sandboxes):
         """Populate sandboxes table"""
         self.table.setRowCount(0)
         self.kill_all.setEnabled(len(sandboxes) > 0)
+        self.freeze_all.setEnabled(any(not s.get('frozen') for s in sandboxes))
+        self.thaw_all.setEnabled(any(s.get('frozen') for s in sandboxes))
         
         if not sandboxes:
             self.table.setRowCount(1)
             item = QTableWidgetItem('No active sandboxes')
             item.setTextAlignment(Qt.AlignCenter)
             self.table.setItem(0, 0, item)
-            self.table.setSpan(0, 0, 1, 4)
+            self.table.setSpan(0, 0, 1, 9)
             self.status.setText('All sandboxes inactive')
         else:
             self.table.setRowCount(len(sandboxes))
@@ -130,10 +181,47 @@ class SandboxesTab(QWidget):
                 
                 policy = QTableWidgetItem(sandbox['policy'].capitalize())
                 policy.setTextAlignment(Qt.AlignCenter)
-                color_map = {'restrictive': Qt.red, 'standard': Qt.blue, 'permissive': Qt.darkGreen}
+                color_map = {'restrictive': Qt.red, 'throwaway': Qt.darkMagenta, 'standard': Qt.blue, 'permissive': Qt.darkGreen}
                 policy.setForeground(color_map.get(sandbox['policy'], Qt.black))
                 self.table.setItem(row, 2, policy)
                 
+                # Files opened in this sandbox (several when the policy reuses sandboxes)
+                paths = sandbox.get('files', [])
+                names = [os.path.basename(p.rstrip('/')) or p for p in paths]
+                text = names[0] if names else ''
+                if len(names) > 1:
+                    text += f'  +{len(names) - 1} more'
+                files = QTableWidgetItem(text)
+                files.setToolTip('\n'.join(paths))
+                self.table.setItem(row, 3, files)
+                
+                # Writes held in RAM by throwaway sandboxes (used / budget)
+                tmpfs = QTableWidgetItem(sandbox.get('tmpfs', ''))
+                tmpfs.setTextAlignment(Qt.AlignCenter)
+                tmpfs.setToolTip('RAM used by files the sandbox has written; discarded on exit')
+                self.table.setItem(row, 4, tmpfs)
+                
+                # Last action the resource watchdog took (renice / freeze)
+                watchdog = QTableWidgetItem(sandbox.get('watchdog', ''))
+                watchdog.setTextAlignment(Qt.AlignCenter)
+                watchdog.setForeground(Qt.darkRed)
+                watchdog.setToolTip('Runaway-sandbox rules of the policy; see the sandbox log')
+                self.table.setItem(row, 5, watchdog)
+                
+                # Time until the sandbox is stopped (launch or policy time limit)
+                deadline = sandbox.get('deadline', 0)
+                ttl = QTableWidgetItem(self._time_left(deadline) if deadline else '')
+                ttl.setTextAlignment(Qt.AlignCenter)
+                if deadline:
+                    ttl.setToolTip('Stopped at ' + time.strftime('%H:%M:%S', time.localtime(deadline)))
+                self.table.setItem(row, 6, ttl)
+                
+                frozen = sandbox.get('frozen', False)
+                state = QTableWidgetItem('Frozen' if frozen else 'Running')
+                state.setTextAlignment(Qt.AlignCenter)
+                state.setForeground(Qt.darkCyan if frozen else Qt.darkGreen)
+                self.table.setItem(row, 7, state)
+                
                 kill = QPushButton('❌ Kill')
                 kill.setMaximumWidth(80)
                 kill.setMinimumHeight(36)
@@ -152,7 +240,73 @@ class SandboxesTab(QWidget):
                 """)
                 pid_val = sandbox['pid']
                 kill.clicked.connect(lambda checked, p=pid_val: self.main_window.kill_sandbox_action(p))
-                self.table.setCellWidget(row, 3, kill)
+                
+                output = QPushButton('📄 Output')
+                output.setMaximumWidth(100)
+                output.setMinimumHeight(36)
+                output.setToolTip('Live stdout/stderr of this sandbox')
+                # Only sandboxes launched by this InvisVM window have captured output
+                output.setEnabled(sandbox.get('has_output', False))
+                output.clicked.connect(lambda checked, p=pid_val: self.main_window.show_sandbox_output(p))
+                
+                freeze = QPushButton('▶ Thaw' if frozen else '❄ Freeze')
+                freeze.setMaximumWidth(100)
+                freeze.setMinimumHeight(36)
+                freeze.setToolTip('Resume this sandbox' if frozen else 'Suspend this sandbox (no CPU use until thawed)')
+                freeze.clicked.connect(lambda checked, p=pid_val: self.main_window.freeze_sandbox_action(p))
+                
+                actions = QWidget()
+                actions_layout = QHBoxLayout()
+                actions_layout.setContentsMargins(4, 0, 4, 0)
+                actions_layout.setSpacing(6)
+                actions_layout.addWidget(output)
+                actions_layout.addWidget(freeze)
+                actions_layout.addWidget(kill)
+                actions.setLayout(actions_layout)
+                self.table.setCellWidget(row, 8, actions)
                 self.table.setRowHeight(row, 48)
             
             self.status.setText(f'{len(sandboxes)} sandbox(es) running')
+    
+    @staticmethod
+    def _time_left(deadline):
+        """e.g. '1:05:00', '12:30', 'stopping'"""
+        left = int(deadline - time.time())
+        if left <= 0:
+            return 'stopping'
+        hours, rest = divmod(left, 3600)
+        minutes, seconds = divmod(rest, 60)
+        return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+    
+    def populate_queue(self, tickets):
+        """Populate the queued launches table"""
+        visible = len(tickets) > 0
+        self.queue_title.setVisible(visible)
+        self.queue_table.setVisible(visible)
+        self.cancel_queued.setVisible(visible)
+        if visible:
+            self.queue_title.setText(f'Queued Launches ({len(tickets)})')
+        
+        self.queue_table.setRowCount(len(tickets))
+        for row, ticket in enumerate(tickets):
+            name = QTableWidgetItem(ticket['name'])
+            name.setToolTip(ticket['path'])
+            self.queue_table.setItem(row, 0, name)
+            
+            policy = QTableWidgetItem(ticket['policy'].capitalize())
+            policy.setTextAlignment(Qt.AlignCenter)
+            self.queue_table.setItem(row, 1, policy)
+            
+            priority = QTableWidgetItem(ticket['priority'].capitalize())
+            priority.setTextAlignment(Qt.AlignCenter)
+            self.queue_table.setItem(row, 2, priority)
+            
+            waiting = QTableWidgetItem(ticket['waiting_for'] or 'Starting soon')
+            waiting.setForeground(Qt.darkGray)
+            self.queue_table.setItem(row, 3, waiting)
+            
+            cancel = QPushButton('Cancel')
+            cancel.setMaximumWidth(80)
+            ticket_id = ticket['id']
+            cancel.clicked.connect(lambda checked, t=ticket_id: self.main_window.cancel_queued_launch(t))
+            self.queue_table.setCellWidget(row, 4, cancel)
@@ -8,7 +8,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-from config import SECURITY_POLICIES
+from policy_compiler import get_security_policies
 from .theme import COLORS, FONTS, get_search_style
 import os
 import subprocess
@@ -85,7 +85,7 @@ class AppSearchLauncher(QWidget):
         controls = QHBoxLayout()
         controls.addWidget(QLabel('Policy:'))
         self.policy_combo = QComboBox()
-        self.policy_combo.addItems(SECURITY_POLICIES.keys())
+        self.policy_combo.addItems(get_security_policies().keys())
         self.policy_combo.setCurrentText('permissive')
         self.policy_combo.setMaximumWidth(150)
         controls.addWidget(self.policy_combo)